@@ -1,16 +1,229 @@
 """
 Consultation API エンドポイント
 """
-from fastapi import APIRouter, HTTPException
-from pydantic import BaseModel
-from typing import Dict, Any, Optional
+from fastapi import APIRouter, HTTPException, Header
+from fastapi.responses import JSONResponse, Response
+from pydantic import BaseModel, Field
+from typing import Dict, Any, List, Optional
+from backend.logging_config import session_id_var
+from backend.metrics import ACTIVE_SESSIONS, ENGINE_PHASE_DURATION, engine_metrics_paused
+from backend.profiling import profiled
 from backend.models.consultation import Consultation
+from backend.models.interview_tree import InterviewSession, InterviewTree
+from backend.models.session_manager import SessionManager
 from backend.rules.visa_rules import get_rules_by_visa_type
+import json
+import logging
+import os
+import threading
+import time
 
 router = APIRouter(prefix="/api/consultation", tags=["consultation"])
 
-# グローバルな診断セッション（本番環境ではセッション管理が必要）
-consultation_session: Optional[Consultation] = None
+logger = logging.getLogger(__name__)
+
+# 診断セッションの管理（セッションIDは /start で発行し、X-Session-ID ヘッダーで受け取る）
+session_manager = SessionManager(
+    max_sessions=int(os.getenv("CONSULTATION_MAX_SESSIONS", "1000")),
+    ttl_seconds=float(os.getenv("CONSULTATION_SESSION_TTL", "1800"))
+)
+ACTIVE_SESSIONS.set_function(lambda: len(session_manager))
+
+# 競合集合の生成方式（"rete" または "naive"。naive は回答ごとに全ルールの条件をチェックする）
+MATCH_ENGINE = os.getenv("CONSULTATION_MATCH_ENGINE", "rete")
+
+# 「前の質問に戻る」で戻れるステップ数の上限（未設定の場合は無制限）
+HISTORY_LIMIT = int(os.getenv("CONSULTATION_HISTORY_LIMIT", "0")) or None
+
+# 次の質問の選び方（"rule_order" または "information_gain"）
+QUESTION_STRATEGY = os.getenv("CONSULTATION_QUESTION_STRATEGY", "rule_order")
+
+
+def load_answer_frequencies(path: Optional[str]) -> Optional[Dict[str, float]]:
+    """
+    質問ごとの「はい」と回答される割合を JSON ファイル（{"質問": 0.8, ...}）から読み込む
+
+    Args:
+        path: JSON ファイルのパス（未設定の場合は読み込まない）
+
+    Returns:
+        質問 -> 割合、未設定の場合は None
+    """
+    if not path:
+        return None
+    with open(path, encoding="utf-8") as f:
+        return {question: float(ratio) for question, ratio in json.load(f).items()}
+
+
+# information_gain 戦略で使う回答の頻度（未設定の場合はすべて 0.5 とみなす）
+ANSWER_FREQUENCIES = load_answer_frequencies(os.getenv("CONSULTATION_ANSWER_FREQUENCIES"))
+
+# 事前展開した決定木から /answer に応答するか（木にない状態は推論エンジンで処理）
+USE_INTERVIEW_TREE = os.getenv("CONSULTATION_INTERVIEW_TREE", "true").lower() == "true"
+
+# 決定木の節点数の上限（超えた部分は推論エンジンで処理）
+INTERVIEW_TREE_MAX_NODES = int(os.getenv("CONSULTATION_INTERVIEW_TREE_MAX_NODES", "50000"))
+
+class _InterviewTreeBuild:
+    """
+    1つのルール集合の決定木の作成（バックグラウンドのスレッドで実行）
+    """
+
+    __slots__ = ("rule_set", "done", "tree")
+
+    def __init__(self, rule_set):
+        self.rule_set = rule_set
+        self.done = threading.Event()  # 作成が終わった（失敗した場合も含む）
+        self.tree: Optional[InterviewTree] = None  # 作成した決定木（失敗した場合は None）
+
+
+# ビザタイプ -> 最新のルール集合の決定木の作成（ルール集合が置き換わった場合は作り直す）
+_interview_tree_builds: Dict[str, _InterviewTreeBuild] = {}
+# _interview_tree_builds の更新だけに使う（決定木の作成中は取らないため、他のビザタイプを待たせない）
+_interview_trees_lock = threading.Lock()
+
+
+def _build_interview_tree(visa_type: str, build: _InterviewTreeBuild) -> None:
+    """
+    決定木を作成する（schedule_interview_tree が起動したスレッドで実行）
+
+    Args:
+        visa_type: ビザタイプ
+        build: 作成の状態
+    """
+    try:
+        # 展開中の大量の推論はセッションの推論のメトリクスに含めず、展開全体の時間だけ記録
+        started = time.perf_counter()
+        with engine_metrics_paused():
+            tree = InterviewTree.compile(
+                build.rule_set,
+                max_nodes=INTERVIEW_TREE_MAX_NODES,
+                match_engine=MATCH_ENGINE,
+                question_strategy=QUESTION_STRATEGY,
+                answer_frequencies=ANSWER_FREQUENCIES
+            )
+        elapsed = time.perf_counter() - started
+        ENGINE_PHASE_DURATION.labels(phase="interview_tree_compile").observe(elapsed)
+        build.tree = tree
+        logger.info(
+            "interview tree %s built: %d nodes", visa_type, tree.node_count,
+            extra={"event": "interview_tree_built", "visa_type": visa_type, "duration_ms": round(elapsed * 1000, 2)}
+        )
+    except Exception:
+        # 決定木なしでも推論エンジンで応答できる
+        logger.exception("interview tree build failed", extra={"event": "interview_tree_failed", "visa_type": visa_type})
+    finally:
+        build.done.set()
+
+
+def schedule_interview_tree(visa_type: str, rule_set) -> _InterviewTreeBuild:
+    """
+    ビザタイプの決定木の作成をバックグラウンドで開始
+    同じルール集合の決定木を作成済み・作成中の場合は新たに作成しない
+
+    Args:
+        visa_type: ビザタイプ
+        rule_set: コンパイル済みルール集合
+
+    Returns:
+        作成の状態
+    """
+    with _interview_trees_lock:
+        build = _interview_tree_builds.get(visa_type)
+        if build is not None and build.rule_set is rule_set:
+            return build
+        build = _InterviewTreeBuild(rule_set)
+        _interview_tree_builds[visa_type] = build
+
+    threading.Thread(
+        target=_build_interview_tree, args=(visa_type, build), name=f"interview-tree-{visa_type}", daemon=True
+    ).start()
+    return build
+
+
+def get_interview_tree(visa_type: str, rule_set, wait: bool = True) -> Optional[InterviewTree]:
+    """
+    ビザタイプの決定木を取得（作成前の場合は作成を開始する）
+
+    Args:
+        visa_type: ビザタイプ
+        rule_set: コンパイル済みルール集合
+        wait: 作成中の場合に完成を待つか（False の場合は None を返す）
+
+    Returns:
+        決定木。作成中（wait=False の場合）・作成に失敗した場合は None
+    """
+    build = _interview_tree_builds.get(visa_type)
+    if build is None or build.rule_set is not rule_set:
+        build = schedule_interview_tree(visa_type, rule_set)
+    if wait:
+        build.done.wait()
+    return build.tree
+
+
+def on_rule_set_compiled(visa_type: str, rule_set) -> None:
+    """
+    ルール集合のコンパイル後に決定木の作成を開始（RuleRegistry の on_compiled）
+    起動時の読み込み・ルールの変更後の再読み込みのどちらでも、最初の /start を待たずに作成する
+
+    Args:
+        visa_type: ビザタイプ
+        rule_set: コンパイル済みルール集合
+    """
+    if USE_INTERVIEW_TREE:
+        schedule_interview_tree(visa_type, rule_set)
+
+
+def warm_up_interview_trees(rules_cache) -> None:
+    """
+    読み込み済みのビザタイプの決定木の完成を待つ（作成を開始していない場合は開始する。起動時の事前読み込み用）
+
+    Args:
+        rules_cache: ビザタイプ -> コンパイル済みルール集合（RuleRegistry）
+    """
+    if not USE_INTERVIEW_TREE:
+        return
+    for visa_type in rules_cache.loaded:
+        rule_set = rules_cache.get(visa_type)
+        if rule_set is not None:
+            get_interview_tree(visa_type, rule_set)
+
+
+def get_session(session_id: Optional[str]):
+    """
+    セッションIDから診断セッション（Consultation または InterviewSession）を取得
+
+    Args:
+        session_id: X-Session-ID ヘッダーの値
+
+    Returns:
+        診断セッション
+    """
+    if not session_id:
+        raise HTTPException(status_code=400, detail="診断セッションが開始されていません")
+
+    consultation_session = session_manager.get(session_id)
+    if consultation_session is None:
+        raise HTTPException(status_code=404, detail="診断セッションが見つかりません（期限切れの可能性があります）")
+
+    return consultation_session
+
+
+def get_consultation_session(session_id: Optional[str]) -> Consultation:
+    """
+    セッションIDから診断セッションを取得
+    決定木をたどっているセッションは、推論エンジンに切り替えてから返す
+
+    Args:
+        session_id: X-Session-ID ヘッダーの値
+
+    Returns:
+        診断セッション
+    """
+    consultation_session = get_session(session_id)
+    if isinstance(consultation_session, InterviewSession):
+        return consultation_session.consultation()
+    return consultation_session
 
 
 class StartRequest(BaseModel):
@@ -24,10 +237,17 @@ class AnswerRequest(BaseModel):
     value: Any
 
 
+class BatchAnswerRequest(BaseModel):
+    """一括回答リクエスト"""
+    # 記録する順に並べた回答（空の場合はセッションを取得する前に 422 で拒否する）
+    answers: List[AnswerRequest] = Field(..., min_length=1)
+
+
 class ConsultationResponse(BaseModel):
     """診断レスポンス"""
     status: str
     message: str
+    session_id: Optional[str] = None  # 診断開始時に発行されるセッションID
     results: Optional[Dict[str, Any]] = None
     need_input: bool
     applied_rule: Optional[str] = None
@@ -42,6 +262,7 @@ class ConsultationResponse(BaseModel):
 
 
 @router.post("/start", response_model=ConsultationResponse)
+@profiled
 def start_consultation(request: StartRequest):
     """
     新しい診断セッションを開始
@@ -52,126 +273,142 @@ def start_consultation(request: StartRequest):
     Returns:
         診断開始レスポンス
     """
-    global consultation_session
-
     # main.py のキャッシュからルールを取得（高速化）
     from backend.main import RULES_CACHE
 
     # キャッシュに存在しない場合は動的に生成（フォールバック）
-    if request.visa_type in RULES_CACHE:
-        rules = RULES_CACHE[request.visa_type]
-    else:
+    # セッションは開始時点のバージョンのルール集合を使い続ける（ルールが再読み込みされても変わらない）
+    rules, rules_version = RULES_CACHE.lookup(request.visa_type)
+    cached = rules is not None
+    if not cached:
         rules = get_rules_by_visa_type(request.visa_type)
 
     # 新しい診断セッションを作成（フローチャートモード有効）
-    consultation_session = Consultation(rules, flowchart_mode=True)
+    # キャッシュ済みのルール集合は決定木から応答する（作成中の場合は待たずに推論エンジンで応答する）
+    tree = get_interview_tree(request.visa_type, rules, wait=False) if USE_INTERVIEW_TREE and cached else None
+    if tree is not None:
+        consultation_session = tree.new_session(match_engine=MATCH_ENGINE, history_limit=HISTORY_LIMIT)
+    else:
+        consultation_session = Consultation(
+            rules,
+            flowchart_mode=True,
+            match_engine=MATCH_ENGINE,
+            history_limit=HISTORY_LIMIT,
+            question_strategy=QUESTION_STRATEGY,
+            answer_frequencies=ANSWER_FREQUENCIES
+        )
 
     # 推論を開始
     result = consultation_session.start_up()
 
-    return ConsultationResponse(**result)
+    # セッションを登録してIDを発行
+    session_id = session_manager.create(consultation_session)
+
+    # 以降のログには発行したセッションIDを相関IDとして付ける
+    session_id_var.set(session_id)
+    logger.info(
+        "consultation started",
+        extra={"event": "session_start", "visa_type": request.visa_type, "rules_version": rules_version}
+    )
+
+    return ConsultationResponse(session_id=session_id, **result)
 
 
 @router.post("/answer", response_model=ConsultationResponse)
-def submit_answer(request: AnswerRequest):
+@profiled
+def submit_answer(request: AnswerRequest, x_session_id: Optional[str] = Header(None)):
     """
     ユーザーの回答を記録して推論を進める
 
     Args:
         request: 回答リクエスト
+        x_session_id: セッションID
 
     Returns:
         推論結果
     """
-    global consultation_session
+    consultation_session = get_session(x_session_id)
 
-    if consultation_session is None:
-        raise HTTPException(status_code=400, detail="診断セッションが開始されていません")
+    # 回答を記録して推論を進める（回答前の状態には go_back で戻れる）
+    result = consultation_session.submit_answer(request.key, request.value)
 
-    # 回答を記録する前に現在の状態をスナップショットとして保存
-    consultation_session.save_snapshot()
+    return ConsultationResponse(**result)
 
-    # ユーザーの回答を作業記憶に記録
-    consultation_session.status.set_finding(request.key, request.value)
 
-    # 推論を進める
-    result = consultation_session.start_deduce()
+@router.post("/answers:batch", response_model=ConsultationResponse)
+@profiled
+def submit_answers_batch(request: BatchAnswerRequest, x_session_id: Optional[str] = Header(None)):
+    """
+    複数の回答をまとめて記録し、推論を1回だけ実行する
+    会社情報などの既知の回答を事前入力する場合に使用する
+
+    Args:
+        request: 一括回答リクエスト
+        x_session_id: セッションID
+
+    Returns:
+        次の質問または推論結果
+    """
+    consultation_session = get_consultation_session(x_session_id)
+
+    # まとめて記録した回答は1ステップとして扱われ、go_back で一度に取り消される
+    result = consultation_session.submit_answers(
+        [(answer.key, answer.value) for answer in request.answers]
+    )
 
     return ConsultationResponse(**result)
 
 
 @router.get("/status", response_model=Dict[str, Any])
-def get_status():
+@profiled
+def get_status(x_session_id: Optional[str] = Header(None)):
     """
     現在の診断状態を取得
 
+    Args:
+        x_session_id: セッションID
+
     Returns:
         現在の作業記憶（findings と hypotheses）と適用されたルール
     """
-    global consultation_session
+    consultation_session = get_session(x_session_id)
 
-    if consultation_session is None:
-        raise HTTPException(status_code=400, detail="診断セッションが開始されていません")
-
-    # 評価中のルールを決定（conflict_set または pending_rules）
-    rules_to_show = consultation_session.conflict_set if consultation_session.conflict_set else consultation_session.pending_rules
-
-    # 評価中のルールの情報を構築
-    conflict_set_info = []
-    for rule in rules_to_show:
-        rule_info = {
-            "rule_name": rule.name,
-            "rule_type": rule.type,
-            "conditions": rule.conditions.copy(),
-            "actions": rule.actions.copy(),
-            "condition_logic": rule.condition_logic,
-            "satisfied_conditions": {}
-        }
-
-        # 各条件の現在の状態を記録
-        for condition in rule.conditions:
-            if consultation_session.status.has_key(condition):
-                value = consultation_session.status.get_value(condition)
-                rule_info["satisfied_conditions"][condition] = value
-
-        conflict_set_info.append(rule_info)
-
-    return {
-        "findings": consultation_session.status.findings,
-        "hypotheses": consultation_session.status.hypotheses,
-        "conflict_set": conflict_set_info,  # 評価中のルール
-        "applied_rules": consultation_session.applied_rules  # 確定したルール（適用済みの全ルール）
-    }
+    # 決定木をたどっているセッションは、展開時に記録した状態を返す
+    return consultation_session.get_status()
 
 
 @router.post("/reset")
-def reset_consultation():
+@profiled
+def reset_consultation(x_session_id: Optional[str] = Header(None)):
     """
     診断をリセット
 
+    Args:
+        x_session_id: セッションID
+
     Returns:
         リセット完了メッセージ
     """
-    global consultation_session
-
-    if consultation_session is not None:
-        consultation_session.reset()
+    # クライアントはリセット後に新しいセッションを開始するため、リセットしたセッションは破棄する
+    if x_session_id:
+        session_manager.remove(x_session_id)
 
     return {"message": "診断がリセットされました"}
 
 
 @router.post("/go_back", response_model=ConsultationResponse)
-def go_back():
+@profiled
+def go_back(x_session_id: Optional[str] = Header(None)):
     """
     前の質問に戻る
 
+    Args:
+        x_session_id: セッションID
+
     Returns:
         前の質問の情報
     """
-    global consultation_session
-
-    if consultation_session is None:
-        raise HTTPException(status_code=400, detail="診断セッションが開始されていません")
+    consultation_session = get_consultation_session(x_session_id)
 
     # 前の状態に戻る
     result = consultation_session.go_back()
@@ -180,6 +417,7 @@ def go_back():
 
 
 @router.get("/questions")
+@profiled
 def get_all_questions():
     """
     各ビザタイプの質問一覧を取得
@@ -222,17 +460,18 @@ def get_all_questions():
 
 
 @router.get("/available-questions")
-def get_available_questions():
+@profiled
+def get_available_questions(x_session_id: Optional[str] = Header(None)):
     """
     現在回答可能な質問のリストを取得
 
+    Args:
+        x_session_id: セッションID
+
     Returns:
         回答可能な質問のリスト
     """
-    global consultation_session
-
-    if consultation_session is None:
-        raise HTTPException(status_code=400, detail="診断セッションが開始されていません")
+    consultation_session = get_consultation_session(x_session_id)
 
     available_questions = consultation_session.get_available_questions()
 
@@ -242,26 +481,56 @@ def get_available_questions():
     }
 
 
+@router.get("/interview-tree/{visa_type}")
+@profiled
+def get_interview_tree_artifact(visa_type: str, if_none_match: Optional[str] = Header(None)):
+    """
+    ビザタイプの決定木を書き出し形式で取得
+    フロントエンドはこれを使ってサーバーに問い合わせずに診断を進められる
+    ETag はルール集合の content_hash で、ルールが変わらない間は 304 を返す
+
+    Args:
+        visa_type: ビザタイプ
+        if_none_match: 取得済みの決定木の ETag
+
+    Returns:
+        決定木（形式は backend/models/interview_artifact.py を参照）
+    """
+    from backend.main import RULES_CACHE
+
+    rule_set = RULES_CACHE.get(visa_type)
+    if rule_set is None:
+        raise HTTPException(status_code=404, detail=f"ビザタイプ {visa_type} のルールが見つかりません")
+
+    tree = get_interview_tree(visa_type, rule_set)
+    if tree is None:
+        raise HTTPException(status_code=503, detail=f"ビザタイプ {visa_type} の決定木を作成できませんでした")
+    etag = f'"{tree.rule_set.content_hash}"'
+    if if_none_match == etag:
+        return Response(status_code=304, headers={"ETag": etag})
+
+    return JSONResponse(tree.to_artifact(), headers={"ETag": etag})
+
+
 class SkipQuestionRequest(BaseModel):
     """質問スキップリクエスト"""
     question: str
 
 
 @router.post("/skip-question", response_model=ConsultationResponse)
-def skip_question(request: SkipQuestionRequest):
+@profiled
+def skip_question(request: SkipQuestionRequest, x_session_id: Optional[str] = Header(None)):
     """
     現在の質問をスキップして次の質問に進む
 
     Args:
         request: スキップする質問
+        x_session_id: セッションID
 
     Returns:
         次の質問または推論結果
     """
-    global consultation_session
-
-    if consultation_session is None:
-        raise HTTPException(status_code=400, detail="診断セッションが開始されていません")
+    consultation_session = get_consultation_session(x_session_id)
 
     # 質問をスキップ
     result = consultation_session.skip_question(request.question)
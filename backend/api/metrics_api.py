@@ -0,0 +1,20 @@
+"""
+メトリクス API エンドポイント
+"""
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+from backend.metrics import REGISTRY
+
+router = APIRouter(prefix="/api", tags=["metrics"])
+
+# Prometheus のテキスト形式
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4"
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+def get_metrics():
+    """
+    APIのルート・推論エンジンの処理段階ごとの処理時間、ルールの評価回数、セッション数を
+    Prometheus のテキスト形式で取得
+    """
+    return PlainTextResponse(REGISTRY.render(), media_type=PROMETHEUS_CONTENT_TYPE)
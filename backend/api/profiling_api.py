@@ -0,0 +1,62 @@
+"""
+プロファイル API エンドポイント
+"""
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import FileResponse, PlainTextResponse
+from backend.profiling import PROFILE_MODE, profile_store
+import io
+import os
+import pstats
+
+router = APIRouter(prefix="/api/profiles", tags=["profiles"])
+
+# pstats の並び順として指定できる項目
+SORT_KEYS = ("cumulative", "tottime", "ncalls")
+
+
+def _require_enabled() -> None:
+    # プロファイリングが無効な場合はエンドポイント自体を公開しない
+    if PROFILE_MODE == "off":
+        raise HTTPException(status_code=404, detail="プロファイリングは無効です（PROFILE_REQUESTS）")
+
+
+@router.get("")
+def list_profiles():
+    """
+    保存しているプロファイルの一覧を新しい順に取得
+
+    Returns:
+        プロファイルの情報（ID・メソッド・パス・ステータス・処理時間・作成日時）のリスト
+    """
+    _require_enabled()
+    return {"mode": PROFILE_MODE, "profiles": profile_store.list()}
+
+
+@router.get("/{profile_id}")
+def get_profile(profile_id: str, format: str = "pstats", sort: str = "cumulative", limit: int = 40):
+    """
+    プロファイルを取得
+
+    Args:
+        profile_id: プロファイルID（レスポンスの X-Profile-ID ヘッダー）
+        format: "pstats"（pstats 形式のファイル）または "text"（上位の関数の表）
+        sort: text の場合の並び順（cumulative, tottime, ncalls）
+        limit: text の場合に出力する関数の数
+
+    Returns:
+        プロファイル
+    """
+    _require_enabled()
+    path = profile_store.path(profile_id)
+    if path is None or not os.path.exists(path):
+        raise HTTPException(status_code=404, detail="プロファイルが見つかりません")
+
+    if format == "text":
+        if sort not in SORT_KEYS:
+            raise HTTPException(status_code=400, detail=f"sort は {', '.join(SORT_KEYS)} のいずれかです")
+        output = io.StringIO()
+        stats = pstats.Stats(path, stream=output)
+        stats.sort_stats(sort).print_stats(limit)
+        return PlainTextResponse(output.getvalue())
+
+    return FileResponse(path, media_type="application/octet-stream", filename=f"{profile_id}.prof")
@@ -7,6 +7,7 @@ from typing import List, Optional
 from sqlalchemy.orm import Session
 from backend.database import get_db
 from backend.models.rule_db import RuleDB
+from backend.rules.rule_registry import invalidate_rules_cache
 from datetime import datetime
 import json
 
@@ -128,6 +129,7 @@ def create_rule(request: RuleCreateRequest, db: Session = Depends(get_db)):
     db.add(rule)
     db.commit()
     db.refresh(rule)
+    invalidate_rules_cache(f"create rule {rule.name}")
 
     return rule.to_dict()
 
@@ -185,6 +187,7 @@ def update_rule(
 
     db.commit()
     db.refresh(rule)
+    invalidate_rules_cache(f"update rule {rule.name}")
 
     return rule.to_dict()
 
@@ -208,6 +211,7 @@ def delete_rule(rule_id: int, db: Session = Depends(get_db)):
 
     db.delete(rule)
     db.commit()
+    invalidate_rules_cache(f"delete rule {rule.name}")
 
     return {"message": f"ルール{rule.name}を削除しました"}
 
@@ -230,6 +234,7 @@ def reorder_rules(rule_ids: List[int], db: Session = Depends(get_db)):
             rule.priority = index
 
     db.commit()
+    invalidate_rules_cache("reorder rules")
 
     return {"message": f"{len(rule_ids)}個のルールの順序を更新しました"}
 
@@ -345,6 +350,7 @@ def import_rules(request: ImportRequest, db: Session = Depends(get_db)):
             errors.append(f"ルール {rule_data.get('name', 'unknown')}: {str(e)}")
 
     db.commit()
+    invalidate_rules_cache("import rules")
 
     return {
         "message": "インポートが完了しました",
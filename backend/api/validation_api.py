@@ -5,6 +5,7 @@ from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 from backend.database import get_db
 from backend.models.rule_db import RuleDB
+from backend.rules.rule_registry import invalidate_rules_cache
 from typing import List, Dict, Set
 from pydantic import BaseModel
 
@@ -343,6 +344,7 @@ def fix_dependency_order(violations: List[Dict], visa_type: str, db: Session) ->
 
     # 変更をコミット
     db.commit()
+    invalidate_rules_cache("auto-fix dependency order")
 
     return {
         "success": True,
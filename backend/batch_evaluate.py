@@ -0,0 +1,253 @@
+"""
+保存済みの回答（申請者プロファイル）を現在のルールで一括評価するスクリプト
+
+使い方:
+    python -m backend.batch_evaluate profiles.jsonl results.jsonl --visa-type E
+    python -m backend.batch_evaluate profiles.csv - --source db
+    python -m backend.batch_evaluate profiles.jsonl results.jsonl --engine numpy  # NumPy による一括評価
+
+入力形式:
+    JSONL: 1行に1プロファイル {"id": "...", "visa_type": "E", "answers": {"質問": true, ...}}
+          true / false 以外の値（null など）は推論エンジンと同じく条件の真偽だけに使い、申請不可の判定には使わない
+    CSV:   id, visa_type（省略可）列と、質問文を列名とする回答列（true/false, yes/no, 1/0, はい/いいえ。空欄は未回答）
+
+出力形式（JSONL、1行に1プロファイル）:
+    {"id": "...", "visa_type": "E", "status": "completed" | "impossible" | "incomplete",
+     "results": {...}, "fired_rules": [...], "missing_facts": [...]}
+    --engine numpy の場合、missing_facts は出力されない（NumPy が必要: pip install -r backend/requirements-dev.txt）
+"""
+from typing import Any, Dict, Iterator, List, Optional
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+
+from backend.models.consultation import Consultation
+from backend.models.rule_set import CompiledRuleSet
+
+
+# --engine numpy で一度に評価するプロファイル数
+NUMPY_CHUNK_SIZE = 10000
+
+# CSV の回答値の解釈
+TRUE_VALUES = {"true", "yes", "y", "1", "はい", "t"}
+FALSE_VALUES = {"false", "no", "n", "0", "いいえ", "f"}
+
+
+def parse_answer(value: str) -> Optional[bool]:
+    """
+    CSV の回答値を真偽値に変換
+
+    Args:
+        value: CSV のセルの値
+
+    Returns:
+        True / False、空欄の場合は None
+    """
+    normalized = value.strip().lower()
+    if not normalized:
+        return None
+    if normalized in TRUE_VALUES:
+        return True
+    if normalized in FALSE_VALUES:
+        return False
+    raise ValueError(f"回答値を解釈できません: {value}")
+
+
+def read_profiles(path: str) -> Iterator[Dict[str, Any]]:
+    """
+    プロファイルを1件ずつ読み込む（拡張子 .csv の場合は CSV、それ以外は JSONL）
+
+    Args:
+        path: 入力ファイルのパス（"-" の場合は標準入力）
+
+    Yields:
+        プロファイル（id, visa_type, answers）
+    """
+    stream = sys.stdin if path == "-" else open(path, encoding="utf-8", newline="")
+    try:
+        if path.lower().endswith(".csv"):
+            for line_number, row in enumerate(csv.DictReader(stream), 1):
+                answers = {}
+                for key, value in row.items():
+                    if key in ("id", "visa_type") or value is None:
+                        continue
+                    answer = parse_answer(value)
+                    if answer is not None:
+                        answers[key] = answer
+                yield {
+                    "id": row.get("id") or str(line_number),
+                    "visa_type": row.get("visa_type") or None,
+                    "answers": answers
+                }
+        else:
+            for line_number, line in enumerate(stream, 1):
+                line = line.strip()
+                if not line:
+                    continue
+                profile = json.loads(line)
+                profile.setdefault("id", str(line_number))
+                yield profile
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+
+
+def load_rule_loader(source: str):
+    """
+    ルールの読み込み関数を取得
+
+    Args:
+        source: "db"（データベース）または "hardcoded"（visa_rules.py）
+
+    Returns:
+        ビザタイプを受け取りルールのリストを返す関数
+    """
+    if source == "db":
+        from backend.rules.rule_loader import get_rules_by_visa_type_from_db
+        return get_rules_by_visa_type_from_db
+
+    from backend.rules.visa_rules import get_rules_by_visa_type
+    return get_rules_by_visa_type
+
+
+def evaluate_profile(rule_set: CompiledRuleSet, answers: Dict[str, Any], match_engine: str = "rete") -> Dict[str, Any]:
+    """
+    1件のプロファイルを評価
+
+    Args:
+        rule_set: コンパイル済みルール集合
+        answers: 質問 -> 回答 の辞書
+        match_engine: 競合集合の生成方式
+
+    Returns:
+        評価結果（status, results, fired_rules, missing_facts）
+    """
+    consultation = Consultation(rule_set, flowchart_mode=False, match_engine=match_engine, history_limit=0)
+    for key, value in answers.items():
+        consultation.status.set_finding(key, value)
+    return consultation.run_to_fixed_point()
+
+
+def evaluate_chunk_vectorized(vectorized_sets: Dict[str, Any], get_rules, chunk: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    プロファイルのまとまりをビザタイプごとに NumPy でまとめて評価
+
+    Args:
+        vectorized_sets: ビザタイプ -> ベクトル化されたルール集合（未登録のビザタイプは追加される）
+        get_rules: ルールの読み込み関数
+        chunk: ビザタイプ解決済みのプロファイルのリスト
+
+    Returns:
+        入力と同じ順序の評価結果のリスト
+    """
+    from backend.models.vectorized_engine import VectorizedRuleSet
+
+    records: List[Optional[Dict[str, Any]]] = [None] * len(chunk)
+    groups: Dict[str, List[int]] = {}
+    for position, profile in enumerate(chunk):
+        groups.setdefault(profile["visa_type"], []).append(position)
+
+    for visa_type, positions in groups.items():
+        vectorized = vectorized_sets.get(visa_type)
+        if vectorized is None:
+            vectorized = VectorizedRuleSet(CompiledRuleSet(get_rules(visa_type)))
+            vectorized_sets[visa_type] = vectorized
+
+        encoded = vectorized.encode([chunk[p].get("answers", {}) for p in positions])
+        result = vectorized.evaluate(*encoded)
+        for row, position in enumerate(positions):
+            profile = chunk[position]
+            records[position] = {"id": profile["id"], "visa_type": visa_type, **vectorized.decode(result, row)}
+
+    return records
+
+
+def evaluate_file(
+    input_path: str,
+    output_path: str,
+    default_visa_type: Optional[str],
+    source: str,
+    match_engine: str
+) -> int:
+    """
+    入力ファイルのプロファイルを評価し、結果を出力ファイルに書き出す
+
+    Args:
+        input_path: 入力ファイルのパス
+        output_path: 出力ファイルのパス（"-" の場合は標準出力）
+        default_visa_type: プロファイルにビザタイプがない場合に使うビザタイプ
+        source: ルールの読み込み元（"db" または "hardcoded"）
+        match_engine: 競合集合の生成方式（"numpy" の場合は NumPy による一括評価）
+
+    Returns:
+        評価したプロファイル数
+    """
+    get_rules = load_rule_loader(source)
+    rule_sets: Dict[str, Any] = {}  # ビザタイプごとにコンパイルは1回だけ
+    chunk: List[Dict[str, Any]] = []
+    count = 0
+
+    def write_records(records) -> None:
+        for record in records:
+            output.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    output = sys.stdout if output_path == "-" else open(output_path, "w", encoding="utf-8")
+    try:
+        for profile in read_profiles(input_path):
+            visa_type = profile.get("visa_type") or default_visa_type
+            if not visa_type:
+                raise ValueError(f"プロファイル {profile['id']}: ビザタイプが指定されていません")
+            count += 1
+
+            if match_engine == "numpy":
+                profile["visa_type"] = visa_type
+                chunk.append(profile)
+                if len(chunk) >= NUMPY_CHUNK_SIZE:
+                    write_records(evaluate_chunk_vectorized(rule_sets, get_rules, chunk))
+                    chunk = []
+                continue
+
+            rule_set = rule_sets.get(visa_type)
+            if rule_set is None:
+                rule_set = CompiledRuleSet(get_rules(visa_type))
+                rule_sets[visa_type] = rule_set
+
+            result = evaluate_profile(rule_set, profile.get("answers", {}), match_engine)
+            write_records([{"id": profile["id"], "visa_type": visa_type, **result}])
+
+        if chunk:
+            write_records(evaluate_chunk_vectorized(rule_sets, get_rules, chunk))
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+    return count
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="申請者プロファイルを現在のルールで一括評価します")
+    parser.add_argument("input", help="入力ファイル（.jsonl または .csv、- で標準入力）")
+    parser.add_argument("output", help="出力ファイル（JSONL、- で標準出力）")
+    parser.add_argument("--visa-type", help="プロファイルにビザタイプがない場合に使うビザタイプ（E, L, B）")
+    parser.add_argument(
+        "--source",
+        choices=["db", "hardcoded"],
+        default="db" if os.getenv("USE_DATABASE_RULES", "false").lower() == "true" else "hardcoded",
+        help="ルールの読み込み元（デフォルトは USE_DATABASE_RULES に従う）"
+    )
+    parser.add_argument("--engine", choices=["naive", "rete", "numpy"], default="rete", help="競合集合の生成方式（numpy は NumPy による一括評価）")
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    count = evaluate_file(args.input, args.output, args.visa_type, args.source, args.engine)
+    elapsed = time.perf_counter() - started
+
+    rate = count / elapsed if elapsed > 0 else 0.0
+    print(f"✅ {count}件のプロファイルを評価しました（{elapsed:.2f}秒、{rate:.0f}件/秒）", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
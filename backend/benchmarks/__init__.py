@@ -0,0 +1,7 @@
+"""
+推論エンジンのベンチマーク
+
+    python -m backend.benchmarks.run                     # 30, 1k, 10k, 100k ルールで計測し基準値と比較
+    python -m backend.benchmarks.load_test --users 20 --duration 30  # 診断APIの負荷試験
+    python -m backend.benchmarks.synthetic_rules rules.json --rule-count 1000  # 合成ルールを出力
+"""
@@ -0,0 +1,170 @@
+"""
+台本どおりの診断で推論エンジンの処理時間とメモリを計測
+
+1回の診断は、シードで決まる回答（はい/いいえ）を終了まで（または max_answers 件まで）送り、
+go_back_every 件ごとに go_back で戻って同じ回答を送り直す
+"""
+from statistics import mean, median
+from typing import Any, Dict, List, Optional
+import gc
+import random
+import time
+import tracemalloc
+
+from backend.models.consultation import Consultation
+from backend.models.rule_set import CompiledRuleSet
+
+
+def percentile(values: List[float], ratio: float) -> float:
+    """
+    値のパーセンタイル（最近傍法）
+
+    Args:
+        values: 値のリスト
+        ratio: 0〜1 の割合（0.99 の場合 p99）
+
+    Returns:
+        パーセンタイル、値がない場合は 0
+    """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * ratio))]
+
+
+def run_interview(
+    rule_set: CompiledRuleSet,
+    seed: int,
+    max_answers: int = 40,
+    go_back_every: int = 5,
+    true_ratio: float = 0.6,
+    flowchart_mode: bool = True,
+    match_engine: str = "naive"
+) -> Dict[str, Any]:
+    """
+    1回の診断を実行して処理時間を計測
+
+    Args:
+        rule_set: コンパイル済みルール集合
+        seed: 回答を決める乱数のシード
+        max_answers: 送る回答の最大数
+        go_back_every: 何件の回答ごとに go_back するか（0 の場合はしない）
+        true_ratio: 「はい」と回答する割合
+        flowchart_mode: フローチャートモードを使用するか
+        match_engine: 競合集合の生成方式
+
+    Returns:
+        計測結果（start, answers, go_backs は秒、consultation は診断）
+    """
+    rng = random.Random(seed)
+
+    started = time.perf_counter()
+    consultation = Consultation(rule_set, flowchart_mode=flowchart_mode, match_engine=match_engine)
+    response = consultation.start_up()
+    start = time.perf_counter() - started
+
+    answers: List[float] = []
+    go_backs: List[float] = []
+
+    while response.get("need_input") and len(answers) < max_answers:
+        question = response["question"]
+        value = rng.random() < true_ratio
+
+        started = time.perf_counter()
+        response = consultation.submit_answer(question, value)
+        answers.append(time.perf_counter() - started)
+
+        if go_back_every and len(answers) % go_back_every == 0:
+            started = time.perf_counter()
+            consultation.go_back()
+            go_backs.append(time.perf_counter() - started)
+            response = consultation.submit_answer(question, value)
+
+    return {
+        "start": start,
+        "answers": answers,
+        "go_backs": go_backs,
+        "completed": not response.get("need_input"),
+        "consultation": consultation
+    }
+
+
+def measure_session_memory(rule_set: CompiledRuleSet, seed: int, **options) -> int:
+    """
+    1回の診断を終えた時点でセッションが保持しているメモリを計測
+    （共有するルール集合は含めない。tracemalloc で遅くなるため処理時間の計測とは別に実行）
+
+    Args:
+        rule_set: コンパイル済みルール集合
+        seed: 回答を決める乱数のシード
+        options: run_interview のその他の引数
+
+    Returns:
+        バイト数
+    """
+    # 循環参照のまま残っている一時オブジェクトを含めないよう、計測の前後で回収する
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before, _ = tracemalloc.get_traced_memory()
+        result = run_interview(rule_set, seed, **options)
+        gc.collect()
+        after, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del result
+    return after - before
+
+
+def benchmark_rule_set(
+    rules,
+    interviews: int = 20,
+    memory_samples: int = 3,
+    **options
+) -> Dict[str, Any]:
+    """
+    ルール集合で台本どおりの診断を繰り返して計測結果を集計
+
+    Args:
+        rules: ルールのリスト
+        interviews: 処理時間を計測する診断の回数
+        memory_samples: メモリを計測する診断の回数
+        options: run_interview のその他の引数
+
+    Returns:
+        計測結果（時間はミリ秒、メモリはキロバイト）
+    """
+    started = time.perf_counter()
+    rule_set = CompiledRuleSet(rules)
+    compile_time = time.perf_counter() - started
+
+    starts: List[float] = []
+    answers: List[float] = []
+    go_backs: List[float] = []
+    answer_counts: List[int] = []
+    completed = 0
+
+    for seed in range(interviews):
+        result = run_interview(rule_set, seed, **options)
+        starts.append(result["start"])
+        answers.extend(result["answers"])
+        go_backs.extend(result["go_backs"])
+        answer_counts.append(len(result["answers"]))
+        completed += result["completed"]
+
+    memory = [measure_session_memory(rule_set, seed, **options) for seed in range(memory_samples)]
+
+    def ms(value: Optional[float]) -> float:
+        return round((value or 0.0) * 1000, 4)
+
+    return {
+        "rules": len(rule_set),
+        "compile_ms": ms(compile_time),
+        "start_ms": ms(median(starts)),
+        "answer_p50_ms": ms(percentile(answers, 0.5)),
+        "answer_p99_ms": ms(percentile(answers, 0.99)),
+        "go_back_ms": ms(median(go_backs) if go_backs else 0.0),
+        "session_kb": round(mean(memory) / 1024, 1) if memory else 0.0,
+        "answers_per_interview": round(mean(answer_counts), 1),
+        "completed_ratio": round(completed / interviews, 2) if interviews else 0.0
+    }
@@ -0,0 +1,269 @@
+"""
+診断APIの負荷試験
+
+N 人の仮想ユーザーが同時に E/L/B の診断（回答・スキップ・前の質問に戻る）を
+/api/consultation/* に送り、スループット・エンドポイントごとのレイテンシ・エラー率を出力する。
+フロントエンドと同じく、各操作の後に /status を取得する
+
+使い方:
+    python -m backend.benchmarks.load_test --users 20 --duration 30             # アプリをプロセス内で起動
+    python -m backend.benchmarks.load_test --url http://localhost:8000 --users 50  # 起動済みの uvicorn に送る
+
+httpx が必要（pip install -r backend/requirements-dev.txt）
+"""
+from collections import defaultdict
+from typing import Any, Dict, List, Optional
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+
+from backend.benchmarks.interview_benchmark import percentile
+
+VISA_TYPES = ("E", "L", "B")
+
+
+class LoadStats:
+    """
+    エンドポイントごとのレイテンシとエラーの集計
+    """
+
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+        self.interviews = 0
+        self.completed_interviews = 0
+
+    def record(self, endpoint: str, elapsed: float, ok: bool) -> None:
+        self.latencies[endpoint].append(elapsed)
+        if not ok:
+            self.errors[endpoint] += 1
+
+    def summary(self, elapsed: float) -> Dict[str, Any]:
+        """
+        集計結果を作成
+
+        Args:
+            elapsed: 負荷試験の実行時間（秒）
+
+        Returns:
+            スループット・エラー率・エンドポイントごとのレイテンシ（ミリ秒）
+        """
+        total = sum(len(values) for values in self.latencies.values())
+        errors = sum(self.errors.values())
+
+        endpoints = {}
+        for endpoint, values in sorted(self.latencies.items()):
+            endpoints[endpoint] = {
+                "requests": len(values),
+                "errors": self.errors[endpoint],
+                "p50_ms": round(percentile(values, 0.5) * 1000, 2),
+                "p90_ms": round(percentile(values, 0.9) * 1000, 2),
+                "p99_ms": round(percentile(values, 0.99) * 1000, 2),
+                "max_ms": round(max(values) * 1000, 2)
+            }
+
+        return {
+            "elapsed_seconds": round(elapsed, 2),
+            "requests": total,
+            "requests_per_second": round(total / elapsed, 1) if elapsed > 0 else 0.0,
+            "interviews": self.interviews,
+            "completed_interviews": self.completed_interviews,
+            "interviews_per_second": round(self.interviews / elapsed, 2) if elapsed > 0 else 0.0,
+            "error_rate": round(errors / total, 4) if total else 0.0,
+            "endpoints": endpoints
+        }
+
+
+async def _request(client, stats: LoadStats, method: str, path: str, **kwargs) -> Optional[Dict[str, Any]]:
+    # 1件のリクエストを送り、レイテンシを記録（エラーの場合は None）
+    endpoint = f"{method} {path}"
+    started = time.perf_counter()
+    try:
+        response = await client.request(method, path, **kwargs)
+    except Exception:
+        stats.record(endpoint, time.perf_counter() - started, False)
+        return None
+
+    ok = response.status_code < 400
+    stats.record(endpoint, time.perf_counter() - started, ok)
+    return response.json() if ok else None
+
+
+async def run_interview(
+    client,
+    stats: LoadStats,
+    rng: random.Random,
+    skip_ratio: float,
+    go_back_ratio: float,
+    max_steps: int,
+    think_time: float
+) -> None:
+    """
+    1回の診断を最後まで（または max_steps 回の操作まで）実行
+
+    Args:
+        client: httpx.AsyncClient
+        stats: 集計先
+        rng: 回答・操作を決める乱数
+        skip_ratio: 質問をスキップする割合
+        go_back_ratio: 前の質問に戻る割合
+        max_steps: 1回の診断の操作の最大数
+        think_time: 操作の間の待ち時間（秒）
+    """
+    stats.interviews += 1
+    result = await _request(client, stats, "POST", "/api/consultation/start", json={"visa_type": rng.choice(VISA_TYPES)})
+    if result is None:
+        return
+    headers = {"X-Session-ID": result["session_id"]}
+    answered = 0
+
+    for _ in range(max_steps):
+        if not result.get("need_input"):
+            stats.completed_interviews += 1
+            return
+
+        if think_time:
+            await asyncio.sleep(rng.uniform(0, think_time * 2))
+
+        draw = rng.random()
+        if draw < skip_ratio:
+            next_result = await _request(
+                client, stats, "POST", "/api/consultation/skip-question",
+                json={"question": result["question"]}, headers=headers
+            )
+        elif draw < skip_ratio + go_back_ratio and answered:
+            next_result = await _request(client, stats, "POST", "/api/consultation/go_back", headers=headers)
+            answered -= 1
+        else:
+            next_result = await _request(
+                client, stats, "POST", "/api/consultation/answer",
+                json={"key": result["question"], "value": rng.random() < 0.6}, headers=headers
+            )
+            answered += 1
+
+        if next_result is None:
+            return
+        result = next_result
+
+        # フロントエンドは各操作の後に診断状態を取得する
+        await _request(client, stats, "GET", "/api/consultation/status", headers=headers)
+
+
+async def run_load(
+    client,
+    users: int,
+    duration: float,
+    seed: int = 0,
+    skip_ratio: float = 0.05,
+    go_back_ratio: float = 0.1,
+    max_steps: int = 60,
+    think_time: float = 0.0
+) -> Dict[str, Any]:
+    """
+    仮想ユーザーを同時に動かして負荷をかける
+
+    Args:
+        client: httpx.AsyncClient
+        users: 仮想ユーザーの数
+        duration: 負荷をかける秒数（実行中の診断は最後まで続ける）
+        seed: 乱数のシード
+        skip_ratio: 質問をスキップする割合
+        go_back_ratio: 前の質問に戻る割合
+        max_steps: 1回の診断の操作の最大数
+        think_time: 操作の間の平均の待ち時間（秒）
+
+    Returns:
+        集計結果
+    """
+    stats = LoadStats()
+    deadline = time.perf_counter() + duration
+
+    async def user(number: int) -> None:
+        rng = random.Random(seed * 100003 + number)
+        while time.perf_counter() < deadline:
+            await run_interview(client, stats, rng, skip_ratio, go_back_ratio, max_steps, think_time)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(user(number) for number in range(users)))
+    return stats.summary(time.perf_counter() - started)
+
+
+async def _main(args) -> Dict[str, Any]:
+    try:
+        import httpx
+    except ImportError:
+        raise SystemExit("httpx が必要です: pip install -r backend/requirements-dev.txt")
+
+    limits = httpx.Limits(max_connections=args.users, max_keepalive_connections=args.users)
+    if args.url:
+        client = httpx.AsyncClient(base_url=args.url, timeout=args.timeout, limits=limits)
+    else:
+        from backend.main import app
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://loadtest", timeout=args.timeout)
+
+    async with client:
+        return await run_load(
+            client,
+            users=args.users,
+            duration=args.duration,
+            seed=args.seed,
+            skip_ratio=args.skip_ratio,
+            go_back_ratio=args.go_back_ratio,
+            max_steps=args.max_steps,
+            think_time=args.think_time
+        )
+
+
+def print_summary(summary: Dict[str, Any]) -> None:
+    """
+    集計結果を表で出力
+
+    Args:
+        summary: run_load の集計結果
+    """
+    print(
+        f"{summary['requests']}件のリクエスト（{summary['requests_per_second']}件/秒）、"
+        f"{summary['interviews']}回の診断（完了 {summary['completed_interviews']}回）、"
+        f"エラー率 {summary['error_rate'] * 100:.2f}%"
+    )
+    print(f"{'endpoint':<40} {'requests':>9} {'errors':>7} {'p50':>8} {'p90':>8} {'p99':>8} {'max':>8}")
+    for endpoint, values in summary["endpoints"].items():
+        print(
+            f"{endpoint:<40} {values['requests']:>9} {values['errors']:>7} "
+            f"{values['p50_ms']:>8} {values['p90_ms']:>8} {values['p99_ms']:>8} {values['max_ms']:>8}"
+        )
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="診断APIに仮想ユーザーで負荷をかけます")
+    parser.add_argument("--url", help="送信先の URL（省略時はアプリをプロセス内で起動）")
+    parser.add_argument("--users", type=int, default=10, help="同時に診断する仮想ユーザーの数")
+    parser.add_argument("--duration", type=float, default=30.0, help="負荷をかける秒数")
+    parser.add_argument("--skip-ratio", type=float, default=0.05, help="質問をスキップする割合")
+    parser.add_argument("--go-back-ratio", type=float, default=0.1, help="前の質問に戻る割合")
+    parser.add_argument("--max-steps", type=int, default=60, help="1回の診断の操作の最大数")
+    parser.add_argument("--think-time", type=float, default=0.0, help="操作の間の平均の待ち時間（秒）")
+    parser.add_argument("--timeout", type=float, default=30.0, help="リクエストのタイムアウト（秒）")
+    parser.add_argument("--seed", type=int, default=0, help="乱数のシード")
+    parser.add_argument("--output", help="集計結果を JSON で保存するファイル")
+    parser.add_argument("--max-error-rate", type=float, default=0.0, help="エラー率がこれを超えた場合は終了コード 1")
+    args = parser.parse_args(argv)
+
+    target = args.url or "プロセス内のアプリ"
+    print(f"⏱️  {target} に {args.users}人の仮想ユーザーで{args.duration:.0f}秒間負荷をかけています...", file=sys.stderr)
+    summary = asyncio.run(_main(args))
+
+    print_summary(summary)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(summary, f, ensure_ascii=False, indent=2)
+
+    if summary["error_rate"] > args.max_error_rate:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,229 @@
+"""
+合成ルールで推論エンジンのベンチマークを実行し、保存済みの基準値と比較するスクリプト
+
+使い方:
+    python -m backend.benchmarks.run                              # 30, 1k, 10k, 100k ルール
+    python -m backend.benchmarks.run --sizes 30,1000 --check      # 基準値より遅い場合は終了コード 1
+    python -m backend.benchmarks.run --save-baseline --repeat 3   # 現在の結果を基準値として保存（3回の最良値）
+
+計測項目（時間はミリ秒、メモリはキロバイト）:
+    compile_ms: ルール集合のコンパイル（CompiledRuleSet）
+    start_ms: Consultation の作成と最初の質問まで（中央値）
+    answer_p50_ms, answer_p99_ms: 1件の回答の処理
+    go_back_ms: 前の質問に戻る処理（中央値）
+    session_kb: 1回の診断を終えたセッションが保持するメモリ
+
+基準値は計測したマシンに依存するため、比較は同じマシンで保存した基準値と行う
+基準値は他の処理で負荷がかかっていないときに --repeat を付けて保存する（負荷による悪化を基準値にしない）
+"""
+from typing import Any, Dict, List, Optional
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+
+from backend.benchmarks.interview_benchmark import benchmark_rule_set
+from backend.benchmarks.synthetic_rules import generate_rules
+from backend.rules.rule_loader import COMPILE_RULES
+
+DEFAULT_SIZES = (30, 1000, 10000, 100000)
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), "baseline.json")
+
+# 基準値と比較する項目（大きいほど悪い）
+COMPARED_METRICS = ("compile_ms", "start_ms", "answer_p50_ms", "answer_p99_ms", "go_back_ms", "session_kb")
+
+
+def default_interviews(rule_count: int) -> int:
+    """
+    ルール数に応じた診断の回数（大きなルール集合ほど少なくする）
+
+    Args:
+        rule_count: ルール数
+
+    Returns:
+        診断の回数
+    """
+    return max(3, min(50, 100000 // max(rule_count, 1)))
+
+
+def run_benchmarks(sizes: List[int], settings: Dict[str, Any], interviews: Optional[int] = None) -> Dict[str, Any]:
+    """
+    各ルール数でベンチマークを実行
+
+    Args:
+        sizes: ルール数のリスト
+        settings: 合成ルール・診断の設定
+        interviews: 診断の回数（省略時はルール数に応じて決める）
+
+    Returns:
+        ルール数 -> 計測結果
+    """
+    results = {}
+    for size in sizes:
+        started = time.perf_counter()
+        rules = generate_rules(
+            size,
+            chain_depth=settings["chain_depth"],
+            or_ratio=settings["or_ratio"],
+            fan_in=settings["fan_in"],
+            fan_out=settings["fan_out"],
+            terminal_ratio=settings["terminal_ratio"],
+            seed=settings["seed"],
+            compiled=settings["compiled_rules"]
+        )
+        results[str(size)] = benchmark_rule_set(
+            rules,
+            interviews=interviews or default_interviews(size),
+            max_answers=settings["max_answers"],
+            go_back_every=settings["go_back_every"],
+            flowchart_mode=settings["mode"] == "flowchart",
+            match_engine=settings["match_engine"]
+        )
+        print(f"  {size}ルール: {time.perf_counter() - started:.1f}秒", file=sys.stderr)
+    return results
+
+
+def best_of(runs: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    複数回の計測結果から、比較する項目ごとの最良値（最小値）をまとめる
+
+    Args:
+        runs: run_benchmarks の結果のリスト
+
+    Returns:
+        ルール数 -> 計測結果（比較する項目以外は最初の計測結果の値）
+    """
+    results = {}
+    for size, metrics in runs[0].items():
+        best = dict(metrics)
+        for metric in COMPARED_METRICS:
+            best[metric] = min(run[size][metric] for run in runs)
+        results[size] = best
+    return results
+
+
+def compare_with_baseline(results: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """
+    計測結果を基準値と比較して表を出力
+
+    Args:
+        results: ルール数 -> 計測結果
+        baseline: 保存済みの基準値（run_benchmarks の結果と設定）
+        tolerance: 許容する悪化の割合（0.5 の場合、基準値の 1.5 倍まで）
+
+    Returns:
+        許容範囲を超えた項目の説明のリスト
+    """
+    regressions = []
+    baseline_results = baseline.get("results", {})
+
+    print(f"{'rules':>8} {'metric':<16} {'baseline':>12} {'current':>12} {'ratio':>7}")
+    for size, metrics in results.items():
+        expected = baseline_results.get(size)
+        for metric in COMPARED_METRICS:
+            current = metrics[metric]
+            if expected is None or metric not in expected:
+                print(f"{size:>8} {metric:<16} {'-':>12} {current:>12} {'-':>7}")
+                continue
+
+            reference = expected[metric]
+            ratio = current / reference if reference > 0 else 1.0
+            mark = ""
+            if ratio > 1.0 + tolerance:
+                mark = " ⚠️"
+                regressions.append(f"{size}ルール {metric}: {reference} → {current}（{ratio:.2f}倍）")
+            print(f"{size:>8} {metric:<16} {reference:>12} {current:>12} {ratio:>7.2f}{mark}")
+
+    return regressions
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="合成ルールで推論エンジンのベンチマークを実行します")
+    parser.add_argument("--sizes", default=",".join(str(size) for size in DEFAULT_SIZES), help="ルール数（カンマ区切り）")
+    parser.add_argument("--interviews", type=int, help="ルール数ごとの診断の回数（省略時はルール数に応じて決める）")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="基準値のファイル")
+    parser.add_argument("--save-baseline", action="store_true", help="結果を基準値として保存する")
+    parser.add_argument("--check", action="store_true", help="基準値より許容範囲を超えて悪化した場合は終了コード 1")
+    parser.add_argument("--repeat", type=int, default=1, help="計測の回数（項目ごとに最良値を使う）")
+    parser.add_argument(
+        "--tolerance", type=float, default=1.0,
+        help="許容する悪化の割合（デフォルトは基準値の2倍まで。1ミリ秒未満の項目は実行ごとの揺れが大きいため）"
+    )
+    parser.add_argument("--output", help="結果を JSON で保存するファイル")
+    parser.add_argument("--mode", choices=["flowchart", "deduce"], default="flowchart", help="推論のモード")
+    parser.add_argument("--match-engine", choices=["naive", "rete"], default="rete", help="競合集合の生成方式")
+    parser.add_argument(
+        "--interpreted-rules", action="store_true",
+        help="ルールの条件を DynamicRule の解釈で評価する（デフォルトは COMPILED_DB_RULES に従う）"
+    )
+    parser.add_argument("--chain-depth", type=int, default=4, help="推論チェーンの段数")
+    parser.add_argument("--or-ratio", type=float, default=0.3, help="OR 条件のルールの割合")
+    parser.add_argument("--fan-in", type=int, default=3, help="1ルールあたりの条件数")
+    parser.add_argument("--fan-out", type=int, default=2, help="1つの仮説を条件に持つルールの数")
+    parser.add_argument("--terminal-ratio", type=float, default=0.1, help="終了ルールの割合")
+    parser.add_argument("--max-answers", type=int, default=40, help="1回の診断で送る回答の最大数")
+    parser.add_argument("--go-back-every", type=int, default=5, help="何件の回答ごとに go_back するか")
+    parser.add_argument("--seed", type=int, default=0, help="合成ルールの乱数のシード")
+    args = parser.parse_args(argv)
+
+    settings = {
+        "mode": args.mode,
+        "match_engine": args.match_engine,
+        "compiled_rules": COMPILE_RULES and not args.interpreted_rules,
+        "chain_depth": args.chain_depth,
+        "or_ratio": args.or_ratio,
+        "fan_in": args.fan_in,
+        "fan_out": args.fan_out,
+        "terminal_ratio": args.terminal_ratio,
+        "max_answers": args.max_answers,
+        "go_back_every": args.go_back_every,
+        "seed": args.seed
+    }
+    sizes = [int(size) for size in args.sizes.split(",") if size.strip()]
+
+    print("⏱️  ベンチマークを実行しています...", file=sys.stderr)
+    report = {
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "settings": settings,
+        "results": best_of([run_benchmarks(sizes, settings, args.interviews) for _ in range(max(1, args.repeat))])
+    }
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+    regressions: List[str] = []
+    if os.path.exists(args.baseline):
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline.get("settings") != settings:
+            print("⚠️  基準値とは設定が異なります", file=sys.stderr)
+        regressions = compare_with_baseline(report["results"], baseline, args.tolerance)
+    else:
+        print(json.dumps(report["results"], ensure_ascii=False, indent=2))
+
+    if args.save_baseline:
+        baseline = {"results": {}}
+        if os.path.exists(args.baseline):
+            with open(args.baseline, encoding="utf-8") as f:
+                baseline = json.load(f)
+        # 計測しなかったルール数の基準値は残す
+        baseline["results"] = {**baseline.get("results", {}), **report["results"]}
+        baseline.update({key: report[key] for key in ("python", "machine", "settings")})
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(baseline, f, ensure_ascii=False, indent=2)
+        print(f"✅ 基準値を保存しました: {args.baseline}", file=sys.stderr)
+
+    if regressions:
+        print(f"⚠️  {len(regressions)}件の項目が基準値より悪化しました:", file=sys.stderr)
+        for regression in regressions:
+            print(f"  {regression}", file=sys.stderr)
+        if args.check:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
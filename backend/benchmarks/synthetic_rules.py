@@ -0,0 +1,166 @@
+"""
+ベンチマーク用の合成ルールの生成
+
+ルールは RuleDB と同じ形（/api/rules/export・/api/rules/import の形式）の辞書で生成し、
+DynamicRule に変換して推論エンジンに渡す。
+
+ルールは chain_depth 段の層に分かれる。最初の層のルールは質問だけを条件に持ち、
+以降の層のルールは前の層のルールが導出した仮説と質問を条件に持つ。最後の層が終了ルール（#n!）。
+
+使い方:
+    python -m backend.benchmarks.synthetic_rules rules.json --rule-count 1000 --chain-depth 6
+"""
+from typing import Any, Dict, List
+import argparse
+import json
+import random
+import sys
+
+from backend.models.dynamic_rule import create_rule_from_db
+from backend.models.rule import Rule
+from backend.models.rule_db import RuleDB
+from backend.rules.rule_loader import COMPILE_RULES
+
+
+def generate_rule_dicts(
+    rule_count: int,
+    chain_depth: int = 4,
+    or_ratio: float = 0.3,
+    fan_in: int = 3,
+    fan_out: int = 2,
+    terminal_ratio: float = 0.1,
+    question_ratio: float = 1.0,
+    visa_type: str = "E",
+    seed: int = 0
+) -> List[Dict[str, Any]]:
+    """
+    合成ルールを生成
+
+    Args:
+        rule_count: ルール数
+        chain_depth: 推論チェーンの段数（最初の層から終了ルールまで）
+        or_ratio: OR 条件のルールの割合
+        fan_in: 1ルールあたりの条件数（前の層の仮説が割り当てられた場合はそれ以上になる）
+        fan_out: 1つの仮説を条件に持つ次の層のルールの数
+        terminal_ratio: 終了ルール（#n!）の割合（最後の層の大きさ）
+        question_ratio: ルール数に対する質問の種類数の割合
+        visa_type: ルールのビザタイプ
+        seed: 乱数のシード
+
+    Returns:
+        ルール情報の辞書のリスト（優先順位順）
+    """
+    rng = random.Random(seed)
+    chain_depth = max(1, min(chain_depth, rule_count))
+    question_count = max(fan_in, int(rule_count * question_ratio))
+
+    # 各層のルール数（最後の層が終了ルール、残りを均等に分ける）
+    terminal_count = max(1, min(rule_count - (chain_depth - 1), round(rule_count * terminal_ratio)))
+    if chain_depth == 1:
+        terminal_count = rule_count
+    layer_sizes = []
+    remaining = rule_count - terminal_count
+    for layer in range(chain_depth - 1):
+        size = remaining // (chain_depth - 1 - layer)
+        layer_sizes.append(size)
+        remaining -= size
+    layer_sizes.append(terminal_count)
+
+    rules: List[Dict[str, Any]] = []
+    previous_hypotheses: List[str] = []
+    number = 0
+
+    for layer, size in enumerate(layer_sizes):
+        is_terminal_layer = layer == len(layer_sizes) - 1
+        conditions: List[List[str]] = [[] for _ in range(size)]
+
+        # 前の層の仮説を fan_out 個のルールに割り当てる
+        for hypothesis in previous_hypotheses:
+            for index in rng.sample(range(size), min(fan_out, size)):
+                conditions[index].append(hypothesis)
+
+        hypotheses = []
+        for index in range(size):
+            number += 1
+            rule_conditions = conditions[index]
+
+            # 残りの条件は質問
+            while len(rule_conditions) < fan_in:
+                question = f"質問{rng.randrange(question_count) + 1}"
+                if question not in rule_conditions:
+                    rule_conditions.append(question)
+
+            if is_terminal_layer:
+                action = f"結論{number}"
+            else:
+                action = f"仮説{number}"
+                hypotheses.append(action)
+
+            rules.append({
+                "name": str(number),
+                "visa_type": visa_type,
+                "rule_type": "#n!" if is_terminal_layer else "#i",
+                "condition_logic": "OR" if rng.random() < or_ratio else "AND",
+                "conditions": rule_conditions,
+                "actions": [action],
+                "priority": number
+            })
+
+        previous_hypotheses = hypotheses
+
+    return rules
+
+
+def generate_rules(rule_count: int, compiled: bool = COMPILE_RULES, **options) -> List[Rule]:
+    """
+    合成ルールを生成して、データベースから読み込んだルールと同じ DynamicRule に変換
+
+    Args:
+        rule_count: ルール数
+        compiled: 条件の評価を特化した CompiledDynamicRule にするか（デフォルトは rule_loader と同じ）
+        options: generate_rule_dicts のその他の引数
+
+    Returns:
+        Ruleオブジェクトのリスト
+    """
+    return [
+        create_rule_from_db(RuleDB.from_dict(data), compiled=compiled)
+        for data in generate_rule_dicts(rule_count, **options)
+    ]
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="ベンチマーク用の合成ルールを /api/rules/import の形式で出力します")
+    parser.add_argument("output", help="出力ファイル（JSON、- で標準出力）")
+    parser.add_argument("--rule-count", type=int, default=1000, help="ルール数")
+    parser.add_argument("--chain-depth", type=int, default=4, help="推論チェーンの段数")
+    parser.add_argument("--or-ratio", type=float, default=0.3, help="OR 条件のルールの割合")
+    parser.add_argument("--fan-in", type=int, default=3, help="1ルールあたりの条件数")
+    parser.add_argument("--fan-out", type=int, default=2, help="1つの仮説を条件に持つルールの数")
+    parser.add_argument("--terminal-ratio", type=float, default=0.1, help="終了ルールの割合")
+    parser.add_argument("--visa-type", default="E", help="ルールのビザタイプ")
+    parser.add_argument("--seed", type=int, default=0, help="乱数のシード")
+    args = parser.parse_args(argv)
+
+    rules = generate_rule_dicts(
+        args.rule_count,
+        chain_depth=args.chain_depth,
+        or_ratio=args.or_ratio,
+        fan_in=args.fan_in,
+        fan_out=args.fan_out,
+        terminal_ratio=args.terminal_ratio,
+        visa_type=args.visa_type,
+        seed=args.seed
+    )
+
+    data = json.dumps({"rules": rules, "overwrite": False}, ensure_ascii=False, indent=2)
+    if args.output == "-":
+        print(data)
+    else:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(data)
+        print(f"✅ {len(rules)}件のルールを出力しました: {args.output}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
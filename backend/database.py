@@ -18,7 +18,8 @@ except OSError:
     # ビルド時は読み取り専用なので無視（実行時には成功する）
     pass
 
-DATABASE_URL = f"sqlite:///{os.path.join(DATABASE_DIR, 'visa_rules.db')}"
+DATABASE_PATH = os.path.join(DATABASE_DIR, "visa_rules.db")
+DATABASE_URL = f"sqlite:///{DATABASE_PATH}"
 
 # SQLAlchemyエンジンの作成
 engine = create_engine(
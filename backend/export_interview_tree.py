@@ -0,0 +1,74 @@
+"""
+ビザタイプごとの診断の決定木を JSON ファイルに書き出すスクリプト
+書き出したファイルは静的ファイルとして配信し、フロントエンドだけで診断を進めるために使う
+
+使い方:
+    python -m backend.export_interview_tree frontend/public/interview-trees
+    python -m backend.export_interview_tree out --visa-type E --source db
+
+出力:
+    <出力先>/interview_tree_<ビザタイプ>.json（形式は backend/models/interview_artifact.py を参照）
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+from backend.batch_evaluate import load_rule_loader
+from backend.models.interview_tree import InterviewTree
+from backend.models.rule_set import CompiledRuleSet
+
+
+def export_interview_tree(visa_type: str, output_dir: str, source: str, max_nodes: int) -> InterviewTree:
+    """
+    1つのビザタイプの決定木を作成してファイルに書き出す
+
+    Args:
+        visa_type: ビザタイプ
+        output_dir: 出力先ディレクトリ
+        source: ルールの読み込み元（"db" または "hardcoded"）
+        max_nodes: 決定木の節点数の上限
+
+    Returns:
+        作成した決定木
+    """
+    get_rules = load_rule_loader(source)
+    tree = InterviewTree.compile(CompiledRuleSet(get_rules(visa_type)), max_nodes=max_nodes)
+
+    path = os.path.join(output_dir, f"interview_tree_{visa_type}.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(tree.to_artifact(), f, ensure_ascii=False, separators=(",", ":"))
+
+    return tree
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="診断の決定木を JSON ファイルに書き出します")
+    parser.add_argument("output_dir", help="出力先ディレクトリ")
+    parser.add_argument("--visa-type", action="append", help="書き出すビザタイプ（複数指定可、デフォルトは E, L, B）")
+    parser.add_argument(
+        "--source",
+        choices=["db", "hardcoded"],
+        default="db" if os.getenv("USE_DATABASE_RULES", "false").lower() == "true" else "hardcoded",
+        help="ルールの読み込み元（デフォルトは USE_DATABASE_RULES に従う）"
+    )
+    parser.add_argument("--max-nodes", type=int, default=50000, help="決定木の節点数の上限")
+    args = parser.parse_args(argv)
+
+    os.makedirs(args.output_dir, exist_ok=True)
+
+    for visa_type in args.visa_type or ["E", "L", "B"]:
+        started = time.perf_counter()
+        tree = export_interview_tree(visa_type, args.output_dir, args.source, args.max_nodes)
+        elapsed = time.perf_counter() - started
+
+        note = "" if tree.complete else "（上限に達したため一部未展開）"
+        print(
+            f"✅ {visa_type}: {tree.node_count}節点{note}、hash={tree.rule_set.content_hash[:12]}（{elapsed:.2f}秒）",
+            file=sys.stderr
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""
+ログ出力の設定
+JSON 形式（1行1レコード）の構造化ログと、診断セッションごとの相関ID（セッションID）を扱う
+
+環境変数:
+    LOG_LEVEL: 出力するログレベル（デフォルト INFO、推論の詳細は DEBUG）
+    LOG_FORMAT: "json"（デフォルト）または "text"
+
+推論エンジンのデバッグログは logger.debug の遅延フォーマット（%s と引数）で出力し、
+組み立てに手間のかかる値は logger.isEnabledFor(logging.DEBUG) で囲むため、
+DEBUG が無効な場合は文字列を作らない
+"""
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Optional
+import json
+import logging
+import os
+import sys
+
+# 現在処理中の診断セッションのID（ログの相関IDとして出力）
+session_id_var: ContextVar[Optional[str]] = ContextVar("session_id", default=None)
+
+# LogRecord の標準の属性（これ以外の属性は extra で渡された項目として出力する）
+_RESERVED_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    ログレコードを1行の JSON に変換するフォーマッター
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage()
+        }
+
+        session_id = session_id_var.get()
+        if session_id is not None:
+            entry["session_id"] = session_id
+
+        # extra={"...": ...} で渡された項目
+        for key, value in record.__dict__.items():
+            if key not in _RESERVED_ATTRIBUTES and not key.startswith("_"):
+                entry[key] = value
+
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    """
+    開発用のテキスト形式のフォーマッター（セッションIDがあれば先頭に付ける）
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        message = super().format(record)
+        session_id = session_id_var.get()
+        if session_id is not None:
+            return f"[{session_id}] {message}"
+        return message
+
+
+def configure_logging(level: Optional[str] = None, log_format: Optional[str] = None) -> None:
+    """
+    backend パッケージのロガーを設定（複数回呼び出しても設定は1回だけ）
+
+    Args:
+        level: ログレベル（省略時は環境変数 LOG_LEVEL、未設定なら INFO）
+        log_format: "json" または "text"（省略時は環境変数 LOG_FORMAT、未設定なら json）
+    """
+    logger = logging.getLogger("backend")
+    if getattr(logger, "_configured", False):
+        return
+
+    level = (level or os.getenv("LOG_LEVEL", "INFO")).upper()
+    log_format = (log_format or os.getenv("LOG_FORMAT", "json")).lower()
+
+    handler = logging.StreamHandler(sys.stdout)
+    if log_format == "text":
+        handler.setFormatter(TextFormatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+    else:
+        handler.setFormatter(JsonFormatter())
+
+    logger.addHandler(handler)
+    logger.setLevel(level)
+    logger.propagate = False
+    logger._configured = True
+
+
+class CorrelationIdMiddleware:
+    """
+    X-Session-ID ヘッダーの値を、リクエストの処理中のログの相関IDに設定する ASGI ミドルウェア
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        session_id = None
+        for name, value in scope.get("headers", ()):
+            if name == b"x-session-id":
+                session_id = value.decode("latin-1")
+                break
+
+        token = session_id_var.set(session_id)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            session_id_var.reset(token)
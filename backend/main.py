@@ -1,26 +1,62 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from backend.api.consultation_api import router as consultation_router
+from fastapi.middleware.gzip import GZipMiddleware
+from backend.api.consultation_api import (
+    router as consultation_router, on_rule_set_compiled, warm_up_interview_trees
+)
 from backend.api.rule_management_api import router as rule_management_router
 from backend.api.validation_api import router as validation_router
-from backend.database import init_db
+from backend.api.metrics_api import router as metrics_router
+from backend.api.profiling_api import router as profiling_router
+from backend.database import DATABASE_PATH, engine, init_db
+from backend.logging_config import CorrelationIdMiddleware, configure_logging
+from backend.metrics import RULES_VERSION, MetricsMiddleware, instrument_engine
+from backend.profiling import ProfilingMiddleware
+from backend.rules.change_detector import SQLiteChangeDetector
+from backend.rules.rule_registry import RuleRegistry
+import logging
 import os
+import threading
+
+configure_logging()
+logger = logging.getLogger("backend.main")
 
 # データベースからルールを読み込むか、ハードコードされたルールを使うか
 USE_DATABASE_RULES = os.getenv("USE_DATABASE_RULES", "false").lower() == "true"
 
+# 他のワーカープロセスでのルールの変更を確認する間隔（秒、DB のルールを使う場合のみ。0 未満で確認しない）
+RULES_POLL_INTERVAL = float(os.getenv("RULES_POLL_INTERVAL", "1.0"))
+
+# ルールの読み込み方
+#   "eager": インポート時に全ビザタイプを読み込む（デフォルト）
+#   "background": 起動後（ポートを開いた後）にバックグラウンドで読み込む。読み込み前に使われたビザタイプはその場で読み込む
+#   "lazy": 各ビザタイプを最初に使われたときに読み込む
+RULES_WARMUP = os.getenv("RULES_WARMUP", "eager").lower()
+
+# 最初のルールの読み込みの前に、ハードコードされたルールをデータベースに移行するか（ルールがない場合のみ）
+# 起動コマンドで python -m backend.migrate_rules を別に実行する代わりに使う
+MIGRATE_ON_STARTUP = os.getenv("MIGRATE_ON_STARTUP", "false").lower() == "true"
+
 if USE_DATABASE_RULES:
-    from backend.rules.rule_loader import get_rules_by_visa_type_from_db as get_rules_by_visa_type
-    print("📚 Using database-based rules")
+    from backend.rules.rule_snapshot import SNAPSHOT_PATH, SnapshotRuleLoader
+    if SNAPSHOT_PATH:
+        # データベースと一致するスナップショットがあれば ORM を使わずに読み込む
+        get_rules_by_visa_type = SnapshotRuleLoader(SNAPSHOT_PATH)
+    else:
+        from backend.rules.rule_loader import get_rules_by_visa_type_from_db as get_rules_by_visa_type
+    logger.info("📚 Using database-based rules")
 else:
     from backend.rules.visa_rules import get_rules_by_visa_type
-    print("📚 Using hardcoded rules")
+    logger.info("📚 Using hardcoded rules")
 
 app = FastAPI(title="Visa Expert System API")
 
 # データベースを初期化
 init_db()
 
+# クエリの実行時間を記録
+instrument_engine(engine)
+
 # CORS設定（フロントエンドからのアクセスを許可）
 app.add_middleware(
     CORSMiddleware,
@@ -30,19 +66,81 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# ルールキャッシュ：アプリ起動時に全ビザタイプのルールを事前生成
-print("🚀 Initializing rules cache...")
-RULES_CACHE = {
-    "E": get_rules_by_visa_type("E"),
-    "L": get_rules_by_visa_type("L"),
-    "B": get_rules_by_visa_type("B"),
-}
-print(f"✅ Rules cache initialized: E={len(RULES_CACHE['E'])} rules, L={len(RULES_CACHE['L'])} rules, B={len(RULES_CACHE['B'])} rules")
+# 決定木などの大きなレスポンスを圧縮
+app.add_middleware(GZipMiddleware, minimum_size=1000)
+
+# X-Session-ID をログの相関IDに設定
+app.add_middleware(CorrelationIdMiddleware)
+
+# PROFILE_REQUESTS が有効な場合、リクエストの推論処理のプロファイルを取る
+app.add_middleware(ProfilingMiddleware)
+
+# ルートごとの処理時間を記録（レスポンスのシリアライズと圧縮を含む）
+app.add_middleware(MetricsMiddleware)
+
+
+def prepare_rules_database() -> None:
+    """
+    最初のルールの読み込みの前の準備（MIGRATE_ON_STARTUP の場合のみルールを移行）
+    """
+    if MIGRATE_ON_STARTUP:
+        from backend.migrate_rules import migrate_rules
+        migrate_rules()
+
+
+# ルールキャッシュ：全ビザタイプのルールを事前生成（RULES_WARMUP に従う）
+# コンパイル済みルール集合は凍結されており、全セッションで共有する（発火状態はセッションごとに保持）
+# ルール管理APIでルールを変更するとバックグラウンドで再コンパイルし、新しいセッションから新しいルール集合を使う
+# 新しいルール集合に切り替えるたびに、決定木の作成をバックグラウンドで開始する（作成中の /start は推論エンジンで応答）
+RULES_CACHE = RuleRegistry(
+    get_rules_by_visa_type, ("E", "L", "B"), prepare=prepare_rules_database, on_compiled=on_rule_set_compiled
+)
+if USE_DATABASE_RULES and RULES_POLL_INTERVAL >= 0:
+    # 読み込みより前に基準を記録し、読み込み中の変更も検知する
+    RULES_CACHE.watch(SQLiteChangeDetector(DATABASE_PATH, min_interval=RULES_POLL_INTERVAL))
+RULES_VERSION.set_function(lambda: RULES_CACHE.version)
+
+if RULES_WARMUP == "eager":
+    logger.info("🚀 Initializing rules cache...")
+    RULES_CACHE.load()
+    logger.info(
+        "✅ Rules cache initialized: E=%d rules, L=%d rules, B=%d rules",
+        len(RULES_CACHE["E"]), len(RULES_CACHE["L"]), len(RULES_CACHE["B"])
+    )
+else:
+    logger.info("🚀 Rules cache will be loaded on demand (RULES_WARMUP=%s)", RULES_WARMUP)
+
+# バックグラウンドの事前読み込みが実行中か
+_warmup_running = threading.Event()
+
+
+def warm_up() -> None:
+    """
+    全ビザタイプのルールと決定木を読み込む（バックグラウンドのスレッドで実行）
+    """
+    try:
+        RULES_CACHE.warm_up()
+        warm_up_interview_trees(RULES_CACHE)
+    except Exception:
+        logger.exception("warm-up failed", extra={"event": "warm_up_failed"})
+    finally:
+        _warmup_running.clear()
+
+
+@app.on_event("startup")
+def start_warm_up() -> None:
+    # ポートを開く前に呼ばれるため、読み込みはスレッドで行いすぐに戻る
+    if RULES_WARMUP == "background":
+        _warmup_running.set()
+        threading.Thread(target=warm_up, name="warm-up", daemon=True).start()
+
 
 # APIルーターを登録
 app.include_router(consultation_router)
 app.include_router(rule_management_router)
 app.include_router(validation_router)
+app.include_router(metrics_router)
+app.include_router(profiling_router)
 
 @app.get("/")
 def read_root():
@@ -54,5 +152,16 @@ def health_check():
 
 @app.get("/api/health")
 def api_health_check():
-    """フロントエンドのプリウォームアップ用"""
-    return {"status": "healthy", "rules_cached": len(RULES_CACHE)}
+    """
+    フロントエンドのプリウォームアップ用
+    ready はルール（と RULES_WARMUP=background の場合は決定木）の読み込みが終わったか
+    """
+    loaded = RULES_CACHE.loaded
+    return {
+        "status": "healthy",
+        "ready": len(loaded) == len(RULES_CACHE) and not _warmup_running.is_set(),
+        "rules_cached": len(loaded),
+        "rules_loaded": list(loaded),
+        "rules_version": RULES_CACHE.version,
+        "rules_reload_pending": RULES_CACHE.pending
+    }
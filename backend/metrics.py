@@ -0,0 +1,394 @@
+"""
+プロセス内のメトリクス（カウンター・ゲージ・ヒストグラム）
+/api/metrics で Prometheus のテキスト形式として公開する
+
+p50/p99 などのパーセンタイルは、Prometheus 側でヒストグラムのバケットから
+histogram_quantile(0.99, rate(http_request_duration_seconds_bucket[5m])) のように求める
+"""
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+import functools
+import threading
+import time
+
+# 推論エンジンのメトリクスを一時的に記録しない（決定木の展開中など）
+_engine_metrics_paused: ContextVar[bool] = ContextVar("engine_metrics_paused", default=False)
+
+# レイテンシ用のバケット（秒）
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(zip(names, values))
+    if extra is not None:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    escaped = (
+        f'{name}="{str(value).replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34)).replace(chr(10), chr(92) + "n")}"'
+        for name, value in pairs
+    )
+    return "{" + ",".join(escaped) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    """
+    メトリクスの基底クラス（ラベルの組み合わせごとに子を持つ）
+    """
+
+    type_name = ""
+
+    def __init__(self, name: str, documentation: str, label_names: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self._children: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+
+    def labels(self, **labels):
+        """
+        ラベルの値に対応する子を取得（初回は作成）
+
+        Args:
+            labels: ラベル名 -> 値
+
+        Returns:
+            子のメトリクス
+        """
+        key = tuple(str(labels[name]) for name in self.label_names)
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.get(key)
+                if child is None:
+                    child = self._new_child()
+                    self._children[key] = child
+        return child
+
+    def _default(self):
+        # ラベルのないメトリクスは子を1つだけ持つ
+        return self.labels()
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def render(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} {self.type_name}"
+        for key, child in sorted(self._children.items()):
+            yield from self._render_child(key, child)
+
+    def _render_child(self, key, child) -> Iterable[str]:
+        yield f"{self.name}{_format_labels(self.label_names, key)} {_format_value(child.get())}"
+
+
+class _Value:
+    """
+    カウンター・ゲージの値
+    """
+
+    __slots__ = ("_value", "_lock", "_function")
+
+    def __init__(self):
+        self._value = 0.0
+        self._lock = threading.Lock()
+        self._function: Optional[Callable[[], float]] = None
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self._value += amount
+
+    def dec(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self._value -= amount
+
+    def set(self, value: float) -> None:
+        with self._lock:
+            self._value = float(value)
+
+    def set_function(self, function: Callable[[], float]) -> None:
+        # 出力時に値を取得する（セッション数など）
+        self._function = function
+
+    def get(self) -> float:
+        if self._function is not None:
+            return float(self._function())
+        return self._value
+
+
+class Counter(_Metric):
+    """
+    増加のみのカウンター
+    """
+
+    type_name = "counter"
+
+    def _new_child(self):
+        return _Value()
+
+    def inc(self, amount: float = 1.0) -> None:
+        self._default().inc(amount)
+
+
+class Gauge(_Metric):
+    """
+    増減する値
+    """
+
+    type_name = "gauge"
+
+    def _new_child(self):
+        return _Value()
+
+    def set(self, value: float) -> None:
+        self._default().set(value)
+
+    def set_function(self, function: Callable[[], float]) -> None:
+        self._default().set_function(function)
+
+
+class _HistogramValue:
+    """
+    ヒストグラムの値（バケットごとの件数・合計・件数）
+    """
+
+    __slots__ = ("_buckets", "_counts", "_sum", "_lock")
+
+    def __init__(self, buckets: Sequence[float]):
+        self._buckets = buckets
+        self._counts = [0] * (len(buckets) + 1)  # 最後は +Inf
+        self._sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        index = bisect_left(self._buckets, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+
+    def snapshot(self) -> Tuple[List[int], float]:
+        with self._lock:
+            return list(self._counts), self._sum
+
+
+class Histogram(_Metric):
+    """
+    値の分布（レイテンシなど）
+    """
+
+    type_name = "histogram"
+
+    def __init__(self, name: str, documentation: str, label_names: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, label_names)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self):
+        return _HistogramValue(self.buckets)
+
+    def observe(self, value: float) -> None:
+        self._default().observe(value)
+
+    def _render_child(self, key, child) -> Iterable[str]:
+        counts, total = child.snapshot()
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float("inf"),), counts):
+            cumulative += count
+            labels = _format_labels(self.label_names, key, ("le", _format_value(float(bound))))
+            yield f"{self.name}_bucket{labels} {cumulative}"
+        labels = _format_labels(self.label_names, key)
+        yield f"{self.name}_sum{labels} {_format_value(total)}"
+        yield f"{self.name}_count{labels} {cumulative}"
+
+
+class MetricsRegistry:
+    """
+    メトリクスの登録先
+    """
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name: str, documentation: str, label_names: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, label_names))
+
+    def gauge(self, name: str, documentation: str, label_names: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge(name, documentation, label_names))
+
+    def histogram(
+        self, name: str, documentation: str, label_names: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS
+    ) -> Histogram:
+        return self._register(Histogram(name, documentation, label_names, buckets))
+
+    def render(self) -> str:
+        """
+        すべてのメトリクスを Prometheus のテキスト形式で出力
+
+        Returns:
+            テキスト形式のメトリクス
+        """
+        lines: List[str] = []
+        for metric in list(self._metrics.values()):
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+# アプリケーション全体で共有する登録先
+REGISTRY = MetricsRegistry()
+
+HTTP_REQUEST_DURATION = REGISTRY.histogram(
+    "http_request_duration_seconds", "APIリクエストの処理時間", ("method", "route", "status")
+)
+ENGINE_PHASE_DURATION = REGISTRY.histogram(
+    "engine_phase_duration_seconds", "推論エンジンの処理段階ごとの処理時間", ("phase",)
+)
+DB_QUERY_DURATION = REGISTRY.histogram(
+    "db_query_duration_seconds", "データベースのクエリの実行時間"
+)
+RULES_FIRED = REGISTRY.counter(
+    "rules_fired_total", "発火したルールの数"
+)
+RULE_CONDITION_CHECKS = REGISTRY.counter(
+    "rule_condition_checks_total", "競合集合の生成で条件をチェックしたルールの数（naive 方式）"
+)
+INTERVIEW_TREE_ANSWERS = REGISTRY.counter(
+    "interview_tree_answers_total", "決定木を使うセッションの回答数（hit: 木から応答、fallback: 推論エンジン）", ("result",)
+)
+ACTIVE_SESSIONS = REGISTRY.gauge(
+    "consultation_sessions_active", "保持している診断セッションの数"
+)
+RULES_VERSION = REGISTRY.gauge(
+    "rules_version", "新しい診断セッションが使うルール集合のバージョン"
+)
+
+
+def engine_metrics_enabled() -> bool:
+    """
+    推論エンジンのメトリクスを記録するか
+
+    Returns:
+        engine_metrics_paused の中でなければ True
+    """
+    return not _engine_metrics_paused.get()
+
+
+@contextmanager
+def engine_metrics_paused():
+    """
+    ブロック内の推論エンジンの処理段階・ルールの評価回数を記録しない
+    決定木の展開のように、1回のリクエストで大量の推論を行う処理が
+    セッションの推論の分布に混ざらないようにする
+    """
+    token = _engine_metrics_paused.set(True)
+    try:
+        yield
+    finally:
+        _engine_metrics_paused.reset(token)
+
+
+def timed_phase(phase: str):
+    """
+    関数の処理時間を推論エンジンの処理段階として記録するデコレーター
+
+    Args:
+        phase: 処理段階の名前
+
+    Returns:
+        デコレーター
+    """
+    histogram = ENGINE_PHASE_DURATION.labels(phase=phase)
+
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if _engine_metrics_paused.get():
+                return func(*args, **kwargs)
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                histogram.observe(time.perf_counter() - started)
+        return wrapper
+
+    return decorator
+
+
+def instrument_engine(engine) -> None:
+    """
+    SQLAlchemy のエンジンにクエリの実行時間の計測を追加
+
+    Args:
+        engine: SQLAlchemy のエンジン
+    """
+    from sqlalchemy import event
+
+    histogram = DB_QUERY_DURATION.labels()
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info["query_started"].pop()
+        histogram.observe(time.perf_counter() - started)
+
+
+class MetricsMiddleware:
+    """
+    API のルートごとの処理時間を記録する ASGI ミドルウェア
+    ラベルにはパスではなくルートの定義（/api/rules/{rule_id} など）を使う
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self._route_paths: Optional[Dict[object, str]] = None
+
+    def _route_path(self, scope) -> str:
+        endpoint = scope.get("endpoint")
+        if endpoint is None:
+            return "unmatched"
+        if self._route_paths is None:
+            # ルートの一覧は起動後に変わらないので初回に対応表を作る
+            self._route_paths = {
+                route.endpoint: route.path
+                for route in getattr(scope.get("app"), "routes", ())
+                if hasattr(route, "endpoint")
+            }
+        return self._route_paths.get(endpoint, "unmatched")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = [500]
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            HTTP_REQUEST_DURATION.labels(
+                method=scope["method"], route=self._route_path(scope), status=status[0]
+            ).observe(time.perf_counter() - started)
@@ -3,6 +3,7 @@
 """
 from backend.database import init_db, SessionLocal
 from backend.models.rule_db import RuleDB
+from backend.rules.rule_snapshot import SNAPSHOT_PATH, refresh_snapshot
 from backend.rules.visa_rules import (
     VisaRule1, VisaRule2, VisaRule3, VisaRule4, VisaRule5,
     VisaRule6, VisaRule7, VisaRule8, VisaRule9, VisaRule10,
@@ -92,6 +93,12 @@ def migrate_rules():
         count = db.query(RuleDB).count()
         print(f"📊 データベースに {count} 件のルールが保存されています")
 
+        # 起動時に ORM を使わずに読み込めるよう、ルール集合のスナップショットを書き出す
+        if SNAPSHOT_PATH:
+            snapshot = refresh_snapshot(SNAPSHOT_PATH)
+            if snapshot is not None:
+                print(f"💾 ルールのスナップショットを作成しました: {SNAPSHOT_PATH}")
+
     except Exception as e:
         print(f"❌ エラーが発生しました: {e}")
         db.rollback()
@@ -2,8 +2,22 @@
 Consultation クラス
 診断を制御するクラス
 """
-from typing import List, Optional, Dict, Any
-from collections import OrderedDict
+from typing import List, Optional, Dict, Any, Mapping, Set, Tuple
+from .rule_set import CompiledRuleSet, RuleBitmap, compile_rule_set
+from .match_network import MatchNetwork
+from .question_ordering import QUESTION_STRATEGIES, rank_by_information_gain
+from .relevance import LazyRelevance
+from .undo_journal import UndoJournal
+from backend.metrics import RULE_CONDITION_CHECKS, RULES_FIRED, engine_metrics_enabled, timed_phase
+import logging
+
+logger = logging.getLogger(__name__)
+
+# 競合集合の生成方式
+MATCH_ENGINES = ("naive", "rete")
+
+# information_gain 戦略で次の質問を選ぶときに比較する候補の数
+QUESTION_CANDIDATE_LIMIT = 20
 
 
 class Consultation:
@@ -11,34 +25,165 @@ class Consultation:
     診断を制御するクラス
     """
 
-    def __init__(self, rules: List, flowchart_mode: bool = True):
+    def __init__(
+        self,
+        rules,
+        flowchart_mode: bool = True,
+        match_engine: str = "naive",
+        history_limit: Optional[int] = None,
+        question_strategy: str = "rule_order",
+        answer_frequencies: Optional[Mapping[str, float]] = None
+    ):
         """
         Consultation の初期化
 
         Args:
-            rules: ルールのリスト
+            rules: コンパイル済みルール集合（CompiledRuleSet）、またはルールのリスト
             flowchart_mode: フローチャートモード（条件を順番に検証）を使用するか
+            match_engine: 競合集合の生成方式
+                "naive": 毎回すべての未発火ルールの条件をチェック
+                "rete": 作業記憶の変更時に、その要素を条件に持つルールだけを再評価
+            history_limit: 「前の質問に戻る」で戻れるステップ数の上限（None の場合は無制限）
+            question_strategy: 次の質問の選び方
+                "rule_order": ルールの並び順で最初に必要になる質問
+                "information_gain": 回答後に残る必要な質問数の期待値が最小になる質問
+            answer_frequencies: 質問 -> 「はい」と回答される割合（information_gain で使用、省略時は 0.5）
         """
+        if match_engine not in MATCH_ENGINES:
+            raise ValueError(f"未対応の照合方式: {match_engine}")
+        if question_strategy not in QUESTION_STRATEGIES:
+            raise ValueError(f"未対応の質問順序: {question_strategy}")
+
         from .working_memory import WorkingMemory
 
-        self.status: WorkingMemory = WorkingMemory()
-        self.collection_of_rules: OrderedDict = OrderedDict()
+        # ルール集合は複数セッションで共有する（リストが渡された場合はここでコンパイル）
+        self.rule_set: CompiledRuleSet = compile_rule_set(rules)
+        self.collection_of_rules = self.rule_set.by_name  # ルール名 -> ルール（読み取り専用）
+        self.rules_list = self.rule_set.rules  # ルールの並び（順序保証、読み取り専用）
+
+        # 作業記憶はルール集合のファクト辞書のIDで要素を保持する
+        self.status: WorkingMemory = WorkingMemory(self.rule_set.facts)
         self.conflict_set: List = []
         self.applied_rules: List = []  # 適用されたルールの履歴
         self.pending_rules: List = []  # 評価待ちのルール（質問中）
-        self.evaluating_rules: set = set()  # 推論が開始されたルール名のセット（fireするまで保持）
-        self.history_stack: List[Dict[str, Any]] = []  # 各ステップのスナップショット
+        self.fired_rules: RuleBitmap = self.rule_set.new_bitmap()  # 発火済みルールのビットマップ
+        self.evaluating_rule_bits: RuleBitmap = self.rule_set.new_bitmap()  # 推論が開始されたルールのビットマップ（fireするまで保持）
+        # 各ステップで変更された要素・フラグの差分ログ（前の質問に戻るために使用）
+        self.history_stack: UndoJournal = UndoJournal(max_depth=history_limit)
+        self.status.attach_journal(self.history_stack)
 
         # フローチャートモード用の状態
         self.flowchart_mode: bool = flowchart_mode
         self.current_rule_index: int = 0  # 現在評価中のルール番号
-        self.rules_list: List = []  # ルールをリストで保持（順序保証）
 
-        # ルールをコレクションに追加
-        for rule in rules:
-            self.collection_of_rules[rule.name] = rule
-            self.rules_list.append(rule)
+        # インクリメンタル照合ネットワーク（rete 方式の場合のみ）
+        self.match_engine: str = match_engine
+        self.match_network: Optional[MatchNetwork] = None
+        if match_engine == "rete":
+            self.match_network = MatchNetwork(self.rule_set, self.status)
+
+        # 質問順序の戦略
+        self.question_strategy: str = question_strategy
+        self.answer_frequencies: Optional[Mapping[str, float]] = answer_frequencies
+
+        # 関連性解析のキャッシュ（作業記憶・発火状態が変わるまで再利用）
+        self._relevance: Optional[LazyRelevance] = None
+        self.status.add_listener(self._invalidate_relevance)
+
+    @property
+    def evaluating_rules(self) -> Set[str]:
+        """
+        推論が開始されたルール名のセット
+        """
+        rules = self.rule_set.rules
+        return {rules[index].name for index in self.evaluating_rule_bits}
+
+    def is_rule_fired(self, rule) -> bool:
+        """
+        このセッションでルールが既に発火したかどうかをチェック
+
+        Args:
+            rule: チェックするルール
+
+        Returns:
+            発火済みの場合 True、そうでない場合 False
+        """
+        return self.rule_set.index_of[rule.name] in self.fired_rules
+
+    def _is_rule_satisfied(self, rule) -> bool:
+        """
+        ルールの条件が満たされているかチェック
+        rete 方式の場合は照合ネットワークの状態を参照する
 
+        Args:
+            rule: チェックするルール
+
+        Returns:
+            条件が満たされている場合 True、そうでない場合 False
+        """
+        if self.match_network is not None:
+            return self.match_network.is_matched(self.rule_set.index_of[rule.name])
+        return bool(rule.check_conditions(self.status))
+
+    def _invalidate_relevance(self, fact_id: int = None) -> None:
+        """
+        関連性解析のキャッシュを破棄（作業記憶の変更通知からも呼び出される）
+
+        Args:
+            fact_id: 変更された要素のファクトID（未使用）
+        """
+        self._relevance = None
+
+    def _get_relevance(self) -> LazyRelevance:
+        """
+        現在の状態における仮説・ルールの関連性を取得（キャッシュ済みならそれを返す）
+        関連性は問い合わせたルール・仮説の分だけ求めるため、1回の回答でルール集合全体を解析しない
+
+        Returns:
+            関連性解析
+        """
+        if self._relevance is None:
+            rules = self.rules_list
+            self._relevance = LazyRelevance(
+                self.rule_set,
+                self.fired_rules,
+                lambda index: self._is_rule_satisfied(rules[index])
+            )
+        return self._relevance
+
+    def _mark_evaluating(self, rule) -> None:
+        """
+        ルールを評価中としてマーク
+
+        Args:
+            rule: 評価中にするルール
+        """
+        self._add_evaluating(self.rule_set.index_of[rule.name])
+
+    def _add_evaluating(self, index: int) -> None:
+        """
+        ルールのインデックスを評価中のビットマップに追加し、差分ログに記録
+
+        Args:
+            index: ルールのインデックス
+        """
+        if index not in self.evaluating_rule_bits:
+            self.evaluating_rule_bits.add(index)
+            self.history_stack.record_evaluating(index)
+
+    def _add_fired(self, index: int) -> None:
+        """
+        ルールのインデックスを発火済みのビットマップに追加し、差分ログに記録
+
+        Args:
+            index: ルールのインデックス
+        """
+        if index not in self.fired_rules:
+            self.fired_rules.add(index)
+            self.history_stack.record_fired(index)
+        self._invalidate_relevance()
+
+    @timed_phase("start_up")
     def start_up(self) -> Dict[str, Any]:
         """
         推論を開始する
@@ -49,7 +194,7 @@ class Consultation:
         # 競合集合を初期化
         self.conflict_set = []
         self.pending_rules = []
-        self.evaluating_rules = set()
+        self.evaluating_rule_bits.clear()
 
         # フローチャートモードの状態を初期化
         if self.flowchart_mode:
@@ -61,95 +206,114 @@ class Consultation:
         else:
             return self.start_deduce()
 
+    @timed_phase("flowchart_deduce")
     def start_flowchart_deduce(self) -> Dict[str, Any]:
         """
         フローチャート形式の推論プロセス
         ルールを1つずつ、条件1から順番に評価する
+        ルールのスキップ・適用は再帰せずにループで次のルールへ進む
 
         Returns:
             推論結果
         """
-        print(f"DEBUG: start_flowchart_deduce called, current_rule_index={self.current_rule_index}")
+        rules_list = self.rules_list
+        status = self.status
+        derivable_ids = self.rule_set.derivable_ids
+
+        # DEBUG が無効な場合はログの組み立て自体を行わない
+        debug = logger.isEnabledFor(logging.DEBUG)
+
+        while True:
+            if debug:
+                logger.debug(
+                    "start_flowchart_deduce called, current_rule_index=%d", self.current_rule_index,
+                    extra={"event": "flowchart_step", "current_rule_index": self.current_rule_index}
+                )
+
+            # すべてのルールを評価し終えた場合
+            if self.current_rule_index >= len(rules_list):
+                # まだ適用されたルールがない場合は申請不可
+                terminal_rules_applied = any(r for r in self.applied_rules if r.get('rule_type') == '#n!')
+                if not terminal_rules_applied:
+                    return {
+                        "status": "completed",
+                        "message": "すべてのルールを評価しましたが、申請条件を満たしませんでした",
+                        "results": dict(self.status.hypotheses),
+                        "need_input": False
+                    }
 
-        # すべてのルールを評価し終えた場合
-        if self.current_rule_index >= len(self.rules_list):
-            # まだ適用されたルールがない場合は申請不可
-            terminal_rules_applied = any(r for r in self.applied_rules if r.get('rule_type') == '#n!')
-            if not terminal_rules_applied:
                 return {
                     "status": "completed",
-                    "message": "すべてのルールを評価しましたが、申請条件を満たしませんでした",
+                    "message": "推論が完了しました",
                     "results": dict(self.status.hypotheses),
                     "need_input": False
                 }
 
-            return {
-                "status": "completed",
-                "message": "推論が完了しました",
-                "results": dict(self.status.hypotheses),
-                "need_input": False
-            }
+            # 現在のルールを取得
+            current_rule = rules_list[self.current_rule_index]
+            if debug:
+                logger.debug("evaluating rule %s", current_rule.name, extra={"event": "evaluate_rule", "rule": current_rule.name})
 
-        # 現在のルールを取得
-        current_rule = self.rules_list[self.current_rule_index]
-        print(f"DEBUG: evaluating rule {current_rule.name}")
+            # ルールが既に発火済みならスキップ
+            if self.current_rule_index in self.fired_rules:
+                if debug:
+                    logger.debug("rule %s already fired, moving to next rule", current_rule.name)
+                self.current_rule_index += 1
+                continue
 
-        # ルールが既に発火済みならスキップ
-        if current_rule.is_fired():
-            print(f"DEBUG: rule {current_rule.name} already fired, moving to next rule")
-            self.current_rule_index += 1
-            return self.start_flowchart_deduce()
+            # このルールを評価中としてマーク
+            self._add_evaluating(self.current_rule_index)
+            self.pending_rules = [current_rule]
+
+            # ルールの各条件を順番にチェックし、このルールを適用するかスキップするかを決める
+            should_apply = False
+            condition_ids = self.rule_set.condition_ids[self.current_rule_index]
+            for condition_index, fact_id in enumerate(condition_ids):
+                condition = current_rule.conditions[condition_index]
+                # 既に回答済みまたは導出済みか確認
+                if status.has_id(fact_id):
+                    value = status.get_value_by_id(fact_id)
+                    if debug:
+                        logger.debug("condition '%s' already has value: %s", condition, value)
+
+                    # AND条件で1つでもFalseがあればこのルールは不適用
+                    if current_rule.condition_logic == "AND" and value is False:
+                        if debug:
+                            logger.debug("AND rule %s failed at condition '%s'", current_rule.name, condition)
+                        # このルールをスキップして次へ
+                        break
+
+                    # OR条件で1つでもTrueがあればルールを適用可能かチェック
+                    if current_rule.condition_logic == "OR" and value is True:
+                        # 他の条件もチェック（まだ未回答の条件があるか）
+                        all_conditions_checked = all(status.has_id(c) for c in condition_ids)
+                        if all_conditions_checked:
+                            # すべての条件をチェック済みで、少なくとも1つTrue
+                            any_true = any(status.get_value_by_id(c) for c in condition_ids)
+                            if any_true:
+                                if debug:
+                                    logger.debug("OR rule %s satisfied, applying rule", current_rule.name)
+                                should_apply = True
+                                break
+
+                    # 次の条件へ
+                    continue
 
-        # このルールを評価中としてマーク
-        self.evaluating_rules.add(current_rule.name)
-        self.pending_rules = [current_rule]
-
-        # ルールの各条件を順番にチェック
-        for condition_index, condition in enumerate(current_rule.conditions):
-            # 条件が仮説（他のルールの結論）かチェック
-            is_hypothesis = condition in self.status.hypotheses
-
-            # 既に回答済みまたは導出済みか確認
-            if self.status.has_key(condition):
-                value = self.status.get_value(condition)
-                print(f"DEBUG: condition '{condition}' already has value: {value}")
-
-                # AND条件で1つでもFalseがあればこのルールは不適用
-                if current_rule.condition_logic == "AND" and value is False:
-                    print(f"DEBUG: AND rule {current_rule.name} failed at condition '{condition}'")
-                    # このルールをスキップして次へ
-                    self.current_rule_index += 1
-                    return self.start_flowchart_deduce()
-
-                # OR条件で1つでもTrueがあればルールを適用可能かチェック
-                if current_rule.condition_logic == "OR" and value is True:
-                    # 他の条件もチェック（まだ未回答の条件があるか）
-                    all_conditions_checked = all(self.status.has_key(c) for c in current_rule.conditions)
-                    if all_conditions_checked:
-                        # すべての条件をチェック済みで、少なくとも1つTrue
-                        any_true = any(self.status.get_value(c) for c in current_rule.conditions)
-                        if any_true:
-                            print(f"DEBUG: OR rule {current_rule.name} satisfied, applying rule")
-                            return self.apply_rule(current_rule)
-
-                # 次の条件へ
-                continue
-            else:
                 # この条件について質問が必要
                 # 仮説（他のルールの結論）の場合は質問しない
-                derivable_hypotheses = set()
-                for rule in self.collection_of_rules.values():
-                    derivable_hypotheses.update(rule.actions)
-
-                if condition in derivable_hypotheses:
+                if fact_id in derivable_ids:
                     # 仮説なので、先に他のルールを評価する必要がある
                     # このルールを一旦保留して次のルールへ（後で戻ってくる）
-                    print(f"DEBUG: condition '{condition}' is a hypothesis, need to evaluate other rules first")
-                    self.current_rule_index += 1
-                    return self.start_flowchart_deduce()
+                    if debug:
+                        logger.debug("condition '%s' is a hypothesis, need to evaluate other rules first", condition)
+                    break
 
                 # 質問が必要
-                print(f"DEBUG: asking question: '{condition}' (condition {condition_index + 1} of rule {current_rule.name})")
+                if debug:
+                    logger.debug(
+                        "asking question: '%s' (condition %d of rule %s)", condition, condition_index + 1, current_rule.name,
+                        extra={"event": "ask_question", "question": condition, "rule": current_rule.name}
+                    )
 
                 reasoning_chain = self._build_reasoning_chain(condition)
 
@@ -164,18 +328,28 @@ class Consultation:
                     "current_condition": condition_index + 1,
                     "total_conditions": len(current_rule.conditions)
                 }
+            else:
+                # すべての条件をチェック済み
+                # ルールが適用可能かチェック
+                if self._is_rule_satisfied(current_rule):
+                    if debug:
+                        logger.debug("rule %s all conditions satisfied, applying rule", current_rule.name)
+                    should_apply = True
+                else:
+                    if debug:
+                        logger.debug("rule %s conditions not satisfied, moving to next rule", current_rule.name)
 
-        # すべての条件をチェック済み
-        # ルールが適用可能かチェック
-        if current_rule.check_conditions(self.status):
-            print(f"DEBUG: rule {current_rule.name} all conditions satisfied, applying rule")
-            return self.apply_rule(current_rule)
-        else:
-            print(f"DEBUG: rule {current_rule.name} conditions not satisfied, moving to next rule")
-            # 次のルールへ
-            self.current_rule_index += 1
-            return self.start_flowchart_deduce()
+            if not should_apply:
+                # 次のルールへ
+                self.current_rule_index += 1
+                continue
+
+            # ルールを適用（終了ルールなら推論完了、そうでなければ次のルールへ）
+            result = self._fire_rule(current_rule)
+            if result is not None:
+                return result
 
+    @timed_phase("deduce")
     def start_deduce(self) -> Dict[str, Any]:
         """
         推論プロセスを開始
@@ -183,18 +357,26 @@ class Consultation:
         Returns:
             推論結果
         """
-        # 否定的推論: 申請不可の判定
-        impossibility_result = self._check_if_impossible()
-        if impossibility_result:
-            return impossibility_result
-
-        # 競合集合を生成
-        self.conflict_set = self._select_applicable_rules()
-
-        # 実行可能なルールがある場合は実行
-        if self.conflict_set:
+        while True:
+            # 否定的推論: 申請不可の判定
+            impossibility_result = self._check_if_impossible()
+            if impossibility_result:
+                return impossibility_result
+
+            # 競合集合を生成
+            self.conflict_set = self._select_applicable_rules()
+            if not self.conflict_set:
+                break
+
+            # 実行可能なルールがある場合は実行（再帰せずにループで競合集合を作り直す）
             selected_rule = self.conflict_set[0]
-            return self.apply_rule(selected_rule)
+            result = self._fire_rule(selected_rule)
+            if result is not None:
+                return result
+
+            # フローチャートモードではルール適用後にフローチャート形式の評価へ戻る
+            if self.flowchart_mode:
+                return self.start_flowchart_deduce()
 
         # 実行可能なルールがない場合、次に必要な質問を探す
         next_question = self._find_next_question()
@@ -205,32 +387,28 @@ class Consultation:
 
             # pending_rulesのルールをevaluating_rulesに追加（推論が開始されたことを記録）
             for rule in self.pending_rules:
-                self.evaluating_rules.add(rule.name)
+                self._mark_evaluating(rule)
 
             # pending_rulesのルールのアクション（結論）を条件として必要とするルールも追加
             # 例: ルール3のアクション"会社がEビザの条件を満たします"を条件として使うルール2も表示
-            # 再帰的に依存ルールを追加（ルール3 → ルール2 → ルール1）
-            def add_dependent_rules_recursively(actions_to_check):
-                for action in actions_to_check:
-                    dependent_rules = self._get_rules_that_need_hypothesis(action)
-                    for dep_rule in dependent_rules:
-                        if not dep_rule.is_fired() and dep_rule.name not in self.evaluating_rules:
-                            self.evaluating_rules.add(dep_rule.name)
-                            # さらにこのルールのアクションの依存ルールも追加
-                            add_dependent_rules_recursively(dep_rule.actions)
-
-            for rule in self.pending_rules:
-                add_dependent_rules_recursively(rule.actions)
+            # 依存ルールを連鎖的に追加（ルール3 → ルール2 → ルール1）
+            self._mark_dependent_rules_evaluating(self.pending_rules)
 
             # デバッグ情報
             pending_rule_names = [r.name for r in self.pending_rules]
-            print(f"DEBUG: next_question='{next_question}'")
-            print(f"DEBUG: pending_rules={pending_rule_names}")
-            print(f"DEBUG: evaluating_rules={self.evaluating_rules}")
 
             reasoning_chain = self._build_reasoning_chain(next_question)
-            print(f"DEBUG: reasoning_chain length={len(reasoning_chain)}")
-            print(f"DEBUG: reasoning_chain rules={[r['rule_name'] for r in reasoning_chain]}")
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug(
+                    "next_question='%s'", next_question,
+                    extra={
+                        "event": "ask_question",
+                        "question": next_question,
+                        "pending_rules": pending_rule_names,
+                        "evaluating_rules": sorted(self.evaluating_rules),
+                        "reasoning_chain": [r["rule_name"] for r in reasoning_chain]
+                    }
+                )
 
             # 利用可能な質問リストを取得（現在の質問を除く）
             available_questions = self.get_available_questions()
@@ -314,7 +492,7 @@ class Consultation:
 
     def apply_rule(self, rule) -> Dict[str, Any]:
         """
-        選択されたルールを適用
+        選択されたルールを適用し、次の推論ステップへ進む
 
         Args:
             rule: 適用するルール
@@ -322,6 +500,26 @@ class Consultation:
         Returns:
             ルール適用結果
         """
+        result = self._fire_rule(rule)
+        if result is not None:
+            return result
+
+        # 次の推論ステップへ
+        if self.flowchart_mode:
+            return self.start_flowchart_deduce()
+        else:
+            return self.start_deduce()
+
+    def _fire_rule(self, rule) -> Optional[Dict[str, Any]]:
+        """
+        ルールを適用して発火済みにする（次の推論ステップへは進まない）
+
+        Args:
+            rule: 適用するルール
+
+        Returns:
+            終了ルールの場合は推論完了の結果、そうでない場合は None
+        """
         # ルール適用時は pending_rules をクリア
         self.pending_rules = []
 
@@ -329,26 +527,28 @@ class Consultation:
         rule_info = {
             "rule_name": rule.name,
             "rule_type": rule.type,
-            "conditions": rule.conditions.copy(),
-            "actions": rule.actions.copy(),
+            "conditions": list(rule.conditions),
+            "actions": list(rule.actions),
             "condition_logic": rule.condition_logic,
             "satisfied_conditions": {}
         }
 
         # 実際に回答された条件だけを記録（未回答の条件は除外）
-        for condition in rule.conditions:
+        rule_index = self.rule_set.index_of[rule.name]
+        for condition, fact_id in zip(rule.conditions, self.rule_set.condition_ids[rule_index]):
             # findingsまたはhypothesesに存在する条件のみ記録
-            if self.status.has_key(condition):
-                value = self.status.get_value(condition)
-                rule_info["satisfied_conditions"][condition] = value
+            if self.status.has_id(fact_id):
+                rule_info["satisfied_conditions"][condition] = self.status.get_value_by_id(fact_id)
 
         self.applied_rules.append(rule_info)
 
         # ルールのアクションを実行
         rule.execute_actions(self.status)
 
-        # ルールを発火済みにする
-        rule.hoist_flag()
+        # ルールを発火済みにする（共有ルールではなくセッションのビットマップに記録）
+        self._add_fired(rule_index)
+        if engine_metrics_enabled():
+            RULES_FIRED.inc()
 
         # evaluating_rulesからは削除しない（fireしたルールも表示し続けるため）
 
@@ -362,16 +562,37 @@ class Consultation:
                 "applied_rule": rule.name,
                 "applied_rules": self.applied_rules
             }
-        else:
-            # フローチャートモードの場合、ルールインデックスを進める
-            if self.flowchart_mode:
-                self.current_rule_index += 1
 
-            # 次の推論ステップへ
-            if self.flowchart_mode:
-                return self.start_flowchart_deduce()
-            else:
-                return self.start_deduce()
+        # フローチャートモードの場合、ルールインデックスを進める
+        if self.flowchart_mode:
+            self.current_rule_index += 1
+
+        return None
+
+    def _mark_dependent_rules_evaluating(self, rules: List) -> None:
+        """
+        ルールのアクション（結論）を条件として必要とする未発火ルールを、連鎖的に評価中としてマーク
+
+        Args:
+            rules: 起点となるルールのリスト
+        """
+        consumer_ids = self.rule_set.consumer_ids
+        action_ids = self.rule_set.action_ids
+        index_of = self.rule_set.index_of
+        stack = [
+            fact_id
+            for rule in reversed(rules)
+            for fact_id in reversed(action_ids[index_of[rule.name]])
+        ]
+
+        while stack:
+            fact_id = stack.pop()
+            for dep_index in consumer_ids[fact_id]:
+                if dep_index in self.fired_rules or dep_index in self.evaluating_rule_bits:
+                    continue
+                self._add_evaluating(dep_index)
+                # さらにこのルールのアクションの依存ルールも追加
+                stack.extend(reversed(action_ids[dep_index]))
 
     def _select_applicable_rules(self) -> List:
         """
@@ -380,17 +601,24 @@ class Consultation:
         Returns:
             実行可能なルールのリスト
         """
+        if self.match_network is not None:
+            return self.match_network.applicable_rules(self.fired_rules)
+
         applicable_rules = []
+        checked = 0
 
-        for rule_name, rule in self.collection_of_rules.items():
+        for index, rule in enumerate(self.rules_list):
             # 既に発火したルールはスキップ
-            if rule.is_fired():
+            if index in self.fired_rules:
                 continue
 
             # 条件をチェック
+            checked += 1
             if rule.check_conditions(self.status):
                 applicable_rules.append(rule)
 
+        if engine_metrics_enabled():
+            RULE_CONDITION_CHECKS.inc(checked)
         return applicable_rules
 
     def check_all(self, conditions: List[str]) -> bool:
@@ -419,13 +647,12 @@ class Consultation:
         Returns:
             この仮説を条件とするルールのリスト
         """
-        rules_needing_hypothesis = []
-        for rule in self.collection_of_rules.values():
-            if rule.is_fired():
-                continue
-            if hypothesis in rule.conditions:
-                rules_needing_hypothesis.append(rule)
-        return rules_needing_hypothesis
+        rules = self.rules_list
+        return [
+            rules[index]
+            for index in self.rule_set.consumers.get(hypothesis, ())
+            if index not in self.fired_rules
+        ]
 
     def _get_rules_with_condition(self, condition: str) -> List:
         """
@@ -439,33 +666,44 @@ class Consultation:
             この条件を含むルールのリスト
         """
         rules_with_condition = []
-        for rule in self.collection_of_rules.values():
-            if rule.is_fired():
+        for index in self.rule_set.consumers.get(condition, ()):
+            if index in self.fired_rules:
                 continue
-            if condition in rule.conditions:
-                # AND条件のルールの場合、他の条件が既にFalseになっていないかチェック
-                if rule.condition_logic == "AND":
-                    can_be_satisfied = True
-                    for cond in rule.conditions:
-                        if cond == condition:
-                            # 今質問している条件はスキップ
-                            continue
-                        value = self.status.get_value(cond)
-                        # 他の条件が明示的にFalseの場合、このルールは適用不可
-                        if value is False:
-                            can_be_satisfied = False
-                            break
-                    if not can_be_satisfied:
-                        # このルールは除外
-                        continue
+            rule = self.rules_list[index]
 
-                rules_with_condition.append(rule)
+            # AND条件のルールの場合、他の条件が既にFalseになっていないかチェック
+            if rule.condition_logic == "AND" and self._has_other_false_condition(rule, condition):
+                # このルールは除外
+                continue
+
+            rules_with_condition.append(rule)
         return rules_with_condition
 
+    def _has_other_false_condition(self, rule, condition: str) -> bool:
+        """
+        指定された条件以外に、明示的に False の条件があるかチェック
+
+        Args:
+            rule: チェックするルール
+            condition: 除外する条件（今質問している条件）
+
+        Returns:
+            他の条件が False の場合 True、そうでない場合 False
+        """
+        for cond in rule.conditions:
+            if cond == condition:
+                continue
+            if self.status.get_value(cond) is False:
+                return True
+        return False
+
     def _is_hypothesis_needed(self, hypothesis: str) -> bool:
         """
-        この仮説が必要かどうかを再帰的にチェック
-        この仮説を使うルールのいずれかが満たされていない場合、必要
+        この仮説が必要かどうかをチェック
+        この仮説を使う未成立のルールのうち、終了ルールであるか結論が更に必要とされるものがあれば必要
+
+        判定は関連性解析（LazyRelevance）の結果を参照する。解析は作業記憶か
+        発火状態が変わるまでキャッシュされ、循環参照があっても停止する
 
         Args:
             hypothesis: チェックする仮説
@@ -473,28 +711,7 @@ class Consultation:
         Returns:
             仮説が必要な場合 True、不要な場合 False
         """
-        # この仮説を条件として使うルールを探す
-        dependent_rules = self._get_rules_that_need_hypothesis(hypothesis)
-
-        # 依存するルールがない場合、この仮説は不要
-        if not dependent_rules:
-            return False
-
-        # いずれかの依存ルールが満たされていないかチェック
-        for rule in dependent_rules:
-            # このルールが既に満たされているかチェック
-            if not rule.check_conditions(self.status):
-                # まだ満たされていない
-                # このルールのアクションが更に必要とされているかチェック
-                for action in rule.actions:
-                    if self._is_hypothesis_needed(action):
-                        return True
-                # このルールのアクションが不要でも、ルール自体が終了ルールなら必要
-                if rule.type == "#n!":
-                    return True
-
-        # すべての依存ルールが既に満たされている
-        return False
+        return self._get_relevance().is_needed(hypothesis)
 
     def _is_question_necessary(self, condition: str) -> bool:
         """
@@ -508,40 +725,21 @@ class Consultation:
         Returns:
             質問が必要な場合 True、不要な場合 False
         """
-        # この条件を含むルールをチェック
-        for rule in self.collection_of_rules.values():
-            if rule.is_fired():
-                continue
+        # 未発火・未成立で、結論が必要とされている（または終了ルールである）ルール
+        relevance = self._get_relevance()
 
-            if condition not in rule.conditions:
+        # この条件を含むルールをチェック
+        for index in self.rule_set.consumers.get(condition, ()):
+            if not relevance.is_useful(index):
                 continue
+            rule = self.rules_list[index]
 
             # AND条件のルールの場合、他の条件が既にFalseになっていないかチェック
-            if rule.condition_logic == "AND":
-                can_be_satisfied = True
-                for cond in rule.conditions:
-                    if cond == condition:
-                        # 今チェックしている条件はスキップ
-                        continue
-                    value = self.status.get_value(cond)
-                    # 他の条件が明示的にFalseの場合、このルールは適用不可
-                    if value is False:
-                        can_be_satisfied = False
-                        break
-                if not can_be_satisfied:
-                    # このルールは適用不可なので、この質問は不要（次のルールをチェック）
-                    continue
+            if rule.condition_logic == "AND" and self._has_other_false_condition(rule, condition):
+                # このルールは適用不可なので、この質問は不要（次のルールをチェック）
+                continue
 
-            # このルールが既に満たされているかチェック
-            if not rule.check_conditions(self.status):
-                # まだ満たされていない
-                # このルールのアクション（仮説）が必要とされているかチェック
-                for action in rule.actions:
-                    if self._is_hypothesis_needed(action):
-                        return True
-                # アクションが不要でも、ルール自体が終了ルールなら必要
-                if rule.type == "#n!":
-                    return True
+            return True
 
         # すべてのルールで不要
         return False
@@ -554,32 +752,24 @@ class Consultation:
         Returns:
             申請不可の場合は結果辞書、そうでない場合は None
         """
-        # 終了ルール（#n!）を探す
-        terminal_rules = [rule for rule in self.collection_of_rules.values() if rule.type == "#n!"]
-
-        for rule in terminal_rules:
-            # このルールが既に発火済みならスキップ
-            if rule.is_fired():
+        # 明示的に False の要素を条件に持つ、未発火の終了ルール（#n!）を探す
+        # （すべての終了ルールの条件を調べる代わりに、値のある要素からその要素を条件に持つルールをたどる）
+        rules = self.rules_list
+        consumer_ids = self.rule_set.consumer_ids
+        for fact_id in self.status.fact_ids():
+            # ファクト辞書にない要素（どのルールも使わない回答）は条件にならない
+            if fact_id >= len(consumer_ids) or self.status.get_value_by_id(fact_id) is not False:
                 continue
 
-            # ルールの条件をチェック
-            can_be_satisfied = True
-            for condition in rule.conditions:
-                value = self.status.get_value(condition)
-
-                # 条件が明示的に False の場合
-                if value is False:
-                    can_be_satisfied = False
-                    break
-
-            # このルールが絶対に適用できないと判明した場合
-            if not can_be_satisfied:
-                return {
-                    "status": "impossible",
-                    "message": "現在の条件では申請ができません",
-                    "results": {},
-                    "need_input": False
-                }
+            for index in consumer_ids[fact_id]:
+                # このルールが絶対に適用できないと判明した場合
+                if rules[index].type == "#n!" and index not in self.fired_rules:
+                    return {
+                        "status": "impossible",
+                        "message": "現在の条件では申請ができません",
+                        "results": {},
+                        "need_input": False
+                    }
 
         return None
 
@@ -592,11 +782,36 @@ class Consultation:
         Returns:
             次に尋ねるべき質問、なければ None
         """
-        available_questions = self.get_available_questions()
+        if self.question_strategy == "rule_order":
+            available_questions = self.get_available_questions()
+        else:
+            available_questions = self._rank_questions(self.get_available_questions(limit=QUESTION_CANDIDATE_LIMIT))
+
         if available_questions:
             return available_questions[0]
         return None
 
+    def _rank_questions(self, questions: List[str]) -> List[str]:
+        """
+        質問順序の戦略に従って質問を並べ替える
+
+        Args:
+            questions: 質問のリスト（ルールの並び順）
+
+        Returns:
+            並べ替えた質問のリスト
+        """
+        if self.question_strategy == "rule_order" or len(questions) < 2:
+            return questions
+        return rank_by_information_gain(
+            self.rule_set,
+            self.fired_rules,
+            self.status.get_value,
+            questions,
+            self.answer_frequencies
+        )
+
+    @timed_phase("available_questions")
     def get_available_questions(self, limit: int = 10) -> List[str]:
         """
         現在回答可能な質問のリストを取得
@@ -608,34 +823,35 @@ class Consultation:
         Returns:
             回答可能な質問のリスト
         """
-        # すべてのルールのアクション（導出可能な仮説）を収集
-        derivable_hypotheses = set()
-        for rule in self.collection_of_rules.values():
-            derivable_hypotheses.update(rule.actions)
+        # 導出可能な仮説はルール集合の索引から取得（条件はファクトIDで照合する）
+        derivable_ids = self.rule_set.derivable_ids
+        names = self.rule_set.facts.names
+        has_id = self.status.has_id
 
         available = []
         seen_questions = set()
 
         # すべてのルールの条件をチェック
-        for rule_name, rule in self.collection_of_rules.items():
+        for index, condition_ids in enumerate(self.rule_set.condition_ids):
             # 既に発火したルールはスキップ
-            if rule.is_fired():
+            if index in self.fired_rules:
                 continue
 
             # ルールの条件を確認
-            for condition in rule.conditions:
+            for fact_id in condition_ids:
                 # まだ回答されていない（WorkingMemoryにない）質問を探す
-                if not self.status.has_key(condition):
+                if not has_id(fact_id):
                     # 重複チェック
-                    if condition in seen_questions:
+                    if fact_id in seen_questions:
                         continue
 
                     # 他のルールから導出できる仮説は質問しない
-                    if condition not in derivable_hypotheses:
+                    if fact_id not in derivable_ids:
                         # OR条件で他の条件が既に満たされている場合も質問しない
+                        condition = names[fact_id]
                         if self._is_question_necessary(condition):
                             available.append(condition)
-                            seen_questions.add(condition)
+                            seen_questions.add(fact_id)
 
                             # 制限に達したら終了
                             if len(available) >= limit:
@@ -643,6 +859,83 @@ class Consultation:
 
         return available
 
+    def submit_answer(self, key: str, value: Any) -> Dict[str, Any]:
+        """
+        ユーザーの回答を記録して推論を進める
+        回答前の状態に戻れるよう、新しいステップとして記録する
+
+        Args:
+            key: 質問（条件）
+            value: 回答
+
+        Returns:
+            次の質問または推論結果
+        """
+        return self.submit_answers([(key, value)])
+
+    @timed_phase("submit_answers")
+    def submit_answers(self, answers: List[Tuple[str, Any]]) -> Dict[str, Any]:
+        """
+        複数の回答をまとめて記録し、推論を1回だけ実行する
+        まとめた回答は1つのステップとして記録されるため、go_back で一度に取り消される
+
+        Args:
+            answers: (質問, 回答) のリスト（記録する順）
+
+        Returns:
+            次の質問または推論結果
+        """
+        # 回答を記録する前に新しいステップを開始
+        self.save_snapshot()
+
+        # ユーザーの回答を作業記憶に記録
+        for key, value in answers:
+            self.status.set_finding(key, value)
+
+        # 推論を進める
+        return self.start_deduce()
+
+    def run_to_fixed_point(self) -> Dict[str, Any]:
+        """
+        質問をせずに、適用可能なルールがなくなるまで前向き推論を繰り返す
+        終了ルール（#n!）が発火しても停止せず、導出できるすべての仮説を求める
+        回答済みのプロファイルを一括で評価する場合に使用する
+
+        Returns:
+            評価結果（status, results, fired_rules, missing_facts）
+        """
+        while True:
+            self.conflict_set = self._select_applicable_rules()
+            if not self.conflict_set:
+                break
+
+            # 仮説は True の追加のみなので、競合集合のルールはまとめて発火してよい
+            for rule in self.conflict_set:
+                self._fire_rule(rule)
+
+        self.conflict_set = []
+        self.pending_rules = []
+
+        rules = self.rules_list
+        fired_rule_names = [rules[index].name for index in self.fired_rules]
+        terminal_fired = any(index in self.fired_rules for index in self.rule_set.terminal_indices)
+
+        if terminal_fired:
+            status = "completed"
+        elif self._check_if_impossible():
+            status = "impossible"
+        else:
+            status = "incomplete"
+
+        return {
+            "status": status,
+            "results": dict(self.status.hypotheses),
+            "fired_rules": fired_rule_names,
+            # 結論を出すためにまだ回答が必要な質問
+            "missing_facts": self.get_available_questions(limit=len(self.rule_set.consumers))
+        }
+
+    @timed_phase("skip_question")
     def skip_question(self, question_to_skip: str) -> Dict[str, Any]:
         """
         現在の質問をスキップして、次の質問に進む
@@ -664,27 +957,18 @@ class Consultation:
         remaining_questions = [q for q in available_questions if q != question_to_skip]
 
         if remaining_questions:
-            # 次の質問がある場合
-            next_question = remaining_questions[0]
+            # 次の質問がある場合（質問順序の戦略に従って選ぶ）
+            next_question = self._rank_questions(remaining_questions)[0]
 
             # pending_rulesを更新
             self.pending_rules = self._get_rules_with_condition(next_question)
 
             # evaluating_rulesを更新
             for rule in self.pending_rules:
-                self.evaluating_rules.add(rule.name)
+                self._mark_evaluating(rule)
 
             # 依存ルールも追加
-            def add_dependent_rules_recursively(actions_to_check):
-                for action in actions_to_check:
-                    dependent_rules = self._get_rules_that_need_hypothesis(action)
-                    for dep_rule in dependent_rules:
-                        if not dep_rule.is_fired() and dep_rule.name not in self.evaluating_rules:
-                            self.evaluating_rules.add(dep_rule.name)
-                            add_dependent_rules_recursively(dep_rule.actions)
-
-            for rule in self.pending_rules:
-                add_dependent_rules_recursively(rule.actions)
+            self._mark_dependent_rules_evaluating(self.pending_rules)
 
             reasoning_chain = self._build_reasoning_chain(next_question)
 
@@ -713,78 +997,119 @@ class Consultation:
         self.conflict_set = []
         self.applied_rules = []  # 適用ルール履歴もリセット
         self.pending_rules = []  # 評価待ちルールもリセット
-        self.evaluating_rules = set()  # 評価中ルールもリセット
-        self.history_stack = []  # 履歴スタックもリセット
+        self.evaluating_rule_bits.clear()  # 評価中ルールもリセット
+        self.history_stack.clear()  # 差分ログもリセット
 
         # フローチャートモードの状態もリセット
         if self.flowchart_mode:
             self.current_rule_index = 0
 
-        # すべてのルールの flag をリセット
-        for rule in self.collection_of_rules.values():
-            rule.flag = "#fire"
+        # 発火状態をリセット（共有ルールの flag は変更しない）
+        self.fired_rules.clear()
+        self._invalidate_relevance()
 
     def save_snapshot(self) -> None:
         """
-        現在の診断状態のスナップショットを保存
-        ユーザーが回答する前の状態を保存して、後で戻れるようにする
+        新しいステップの差分ログを開始
+        ユーザーが回答する前に呼び出し、以降の変更を記録して後で戻れるようにする
+        状態全体はコピーせず、適用ルール履歴の件数とフローチャートのルール番号だけを保存する
         """
-        import copy
-
-        # 現在の状態をディープコピーして保存
-        snapshot = {
-            "findings": copy.deepcopy(self.status.findings),
-            "hypotheses": copy.deepcopy(self.status.hypotheses),
-            "applied_rules": copy.deepcopy(self.applied_rules),
-            "rule_flags": {rule_name: rule.flag for rule_name, rule in self.collection_of_rules.items()},
-            "evaluating_rules": copy.deepcopy(self.evaluating_rules)
-        }
-
-        # フローチャートモードの状態も保存
-        if self.flowchart_mode:
-            snapshot["current_rule_index"] = self.current_rule_index
-
-        self.history_stack.append(snapshot)
+        self.history_stack.begin_step(len(self.applied_rules), self.current_rule_index)
 
+    @timed_phase("go_back")
     def go_back(self) -> Dict[str, Any]:
         """
         前の質問に戻る
-        履歴スタックから前の状態を復元して、その時点の質問を返す
+        差分ログの変更を逆順に取り消して前の状態に戻し、その時点の質問を返す
 
         Returns:
             前の質問の情報、または戻れない場合はエラー情報
         """
-        if not self.history_stack:
+        if not self._undo_last_step():
             return {
                 "status": "error",
                 "message": "これ以上戻れません",
                 "need_input": False
             }
 
-        # 最後のスナップショットを取り出す
-        snapshot = self.history_stack.pop()
-
-        # 状態を復元
-        self.status.findings = snapshot["findings"]
-        self.status.hypotheses = snapshot["hypotheses"]
-        self.applied_rules = snapshot["applied_rules"]
-        self.evaluating_rules = snapshot.get("evaluating_rules", set())
-
-        # フローチャートモードの状態も復元
-        if self.flowchart_mode and "current_rule_index" in snapshot:
-            self.current_rule_index = snapshot["current_rule_index"]
-
-        # ルールのフラグを復元
-        for rule_name, flag in snapshot["rule_flags"].items():
-            if rule_name in self.collection_of_rules:
-                self.collection_of_rules[rule_name].flag = flag
-
         # 復元後に推論を実行して次の質問を取得
         if self.flowchart_mode:
             return self.start_flowchart_deduce()
         else:
             return self.start_deduce()
 
+    def _undo_last_step(self) -> bool:
+        """
+        最後のステップの変更を取り消す（推論は再実行しない）
+
+        Returns:
+            取り消した場合 True、戻れるステップがない場合 False
+        """
+        # 最後のステップの差分ログを取り出す
+        step = self.history_stack.pop_step()
+        if step is None:
+            return False
+
+        # 変更を逆順に取り消す（作業記憶の変更は照合ネットワーク・関連性解析にも通知される）
+        for entry in reversed(step.entries):
+            kind = entry[0]
+            if kind == "fact":
+                _, store, fact_id, old_value = entry
+                self.status.restore(store, fact_id, old_value)
+            elif kind == "fired":
+                self.fired_rules.discard(entry[1])
+            elif kind == "evaluating":
+                self.evaluating_rule_bits.discard(entry[1])
+
+        # 返却済みのレスポンスが参照しているリストは変更せず、切り詰めたリストに置き換える
+        self.applied_rules = self.applied_rules[:step.applied_rules_count]
+
+        # フローチャートモードの状態も復元
+        if self.flowchart_mode:
+            self.current_rule_index = step.current_rule_index
+
+        self._invalidate_relevance()
+        return True
+
+    @timed_phase("status")
+    def get_status(self) -> Dict[str, Any]:
+        """
+        現在の診断状態を取得
+
+        Returns:
+            現在の作業記憶（findings と hypotheses）、評価中のルール、適用されたルール
+        """
+        # 評価中のルールを決定（conflict_set または pending_rules）
+        rules_to_show = self.conflict_set if self.conflict_set else self.pending_rules
+
+        # 評価中のルールの情報を構築
+        conflict_set_info = []
+        for rule in rules_to_show:
+            rule_info = {
+                "rule_name": rule.name,
+                "rule_type": rule.type,
+                "conditions": list(rule.conditions),
+                "actions": list(rule.actions),
+                "condition_logic": rule.condition_logic,
+                "satisfied_conditions": {}
+            }
+
+            # 各条件の現在の状態を記録
+            for condition in rule.conditions:
+                if self.status.has_key(condition):
+                    value = self.status.get_value(condition)
+                    rule_info["satisfied_conditions"][condition] = value
+
+            conflict_set_info.append(rule_info)
+
+        return {
+            "findings": dict(self.status.findings),
+            "hypotheses": dict(self.status.hypotheses),
+            "conflict_set": conflict_set_info,  # 評価中のルール
+            "applied_rules": self.applied_rules  # 確定したルール（適用済みの全ルール）
+        }
+
+    @timed_phase("reasoning_chain")
     def _build_reasoning_chain(self, current_question: str) -> List[Dict[str, Any]]:
         """
         評価中のルールチェーンを構築
@@ -797,11 +1122,8 @@ class Consultation:
             推論チェーン情報のリスト（優先度順）
         """
         # evaluating_rulesに含まれる全てのルールを取得（fireしたものも含む）
-        chain_rules = []
-        for rule_name in self.evaluating_rules:
-            if rule_name in self.collection_of_rules:
-                rule = self.collection_of_rules[rule_name]
-                chain_rules.append(rule)
+        rules = self.rules_list
+        chain_indices = list(self.evaluating_rule_bits)
 
         # ルール名の数値順にソート（"1", "2", "3", ...）
         def get_rule_number(rule):
@@ -811,23 +1133,26 @@ class Consultation:
                 # 数値でない場合は大きい値を返して後ろに配置
                 return 999999
 
-        chain_rules.sort(key=get_rule_number)
+        chain_indices.sort(key=lambda index: get_rule_number(rules[index]))
 
-        # ルール情報を構築
+        # ルール情報を構築（条件の値はファクトIDで参照する）
+        condition_ids = self.rule_set.condition_ids
+        get_value_by_id = self.status.get_value_by_id
         chain = []
-        for rule in chain_rules:
+        for index in chain_indices:
+            rule = rules[index]
             rule_info = {
                 "rule_name": rule.name,
                 "rule_type": rule.type,
                 "condition_logic": rule.condition_logic,
                 "conditions": [],
-                "actions": rule.actions.copy(),
-                "is_fired": rule.is_fired(),  # fireしたかどうか
+                "actions": list(rule.actions),
+                "is_fired": index in self.fired_rules,  # fireしたかどうか
                 "priority": rule.priority  # 優先度
             }
 
             # 各条件の状態を評価
-            for condition in rule.conditions:
+            for condition, fact_id in zip(rule.conditions, condition_ids[index]):
                 condition_info = {
                     "text": condition,
                     "status": "unknown",
@@ -837,7 +1162,7 @@ class Consultation:
                 if condition == current_question:
                     condition_info["status"] = "current"
                 else:
-                    value = self.status.get_value(condition)
+                    value = get_value_by_id(fact_id)
                     if value is True:
                         condition_info["status"] = "satisfied"
                     elif value is False:
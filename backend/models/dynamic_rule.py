@@ -1,8 +1,11 @@
 """
 データベースから動的にRuleオブジェクトを生成するファクトリー
 """
+from typing import List
+
 from backend.models.rule import Rule
 from backend.models.rule_db import RuleDB
+from backend.models.working_memory import EFFECTIVE_STATE, SLOT_OTHER, SLOT_TRUE
 
 
 class DynamicRule(Rule):
@@ -18,16 +21,53 @@ class DynamicRule(Rule):
             rule_db: データベースのルールモデル
         """
         self.rule_db = rule_db
-        self._conditions = rule_db.get_conditions_list()
-        self._actions = rule_db.get_actions_list()
+        self._setup(
+            rule_db.name, rule_db.get_conditions_list(), rule_db.get_actions_list(),
+            rule_db.rule_type, rule_db.condition_logic, rule_db.priority
+        )
+
+    @classmethod
+    def from_values(
+        cls,
+        name: str,
+        conditions: List[str],
+        actions: List[str],
+        rule_type: str,
+        condition_logic: str = "AND",
+        priority: int = 0
+    ) -> "DynamicRule":
+        """
+        データベースのモデルを使わずにルールの各値からRuleオブジェクトを作成
+        （ルール集合のスナップショットからの読み込み用。rule_db は None）
+
+        Args:
+            name: ルールの名前
+            conditions: 条件のリスト
+            actions: アクションのリスト
+            rule_type: ルールのタイプ
+            condition_logic: 条件のロジック（"AND" または "OR"）
+            priority: 優先順位
+
+        Returns:
+            DynamicRuleインスタンス
+        """
+        rule = cls.__new__(cls)
+        rule.rule_db = None
+        rule._setup(name, conditions, actions, rule_type, condition_logic, priority)
+        return rule
+
+    def _setup(self, name, conditions, actions, rule_type, condition_logic, priority) -> None:
+        # __init__ と from_values で共通の初期化
+        self._conditions = conditions
+        self._actions = actions
 
         super().__init__(
-            name=rule_db.name,
+            name=name,
             conditions=self._conditions,
             actions=self._actions,
-            rule_type=rule_db.rule_type,
-            condition_logic=rule_db.condition_logic,
-            priority=rule_db.priority
+            rule_type=rule_type,
+            condition_logic=condition_logic,
+            priority=priority
         )
 
     def check_conditions(self, working_memory) -> bool:
@@ -66,14 +106,129 @@ class DynamicRule(Rule):
             working_memory.put_value_of_hypothesis(action, True)
 
 
-def create_rule_from_db(rule_db: RuleDB) -> DynamicRule:
+class CompiledDynamicRule(DynamicRule):
+    """
+    条件の評価を特化した DynamicRule
+    get_value の呼び出しを省き、ルール集合のコンパイル時に受け取った条件のファクトIDで
+    作業記憶のスロット（slots）を直接参照する
+    （ルールごとに関数を生成したりクラスを分けたりすると、ルール数が多い場合に
+    Python の特殊化が効かず遅くなるため、評価の処理は全ルールで1つのメソッドを共有する）
+    """
+
+    def _setup(self, name, conditions, actions, rule_type, condition_logic, priority) -> None:
+        super()._setup(name, conditions, actions, rule_type, condition_logic, priority)
+        self._is_or = self.condition_logic == "OR"
+        self._facts = None  # bind_facts で受け取ったファクト辞書
+        self._condition_ids = ()
+        self._action_ids = ()
+
+    def bind_facts(self, facts, condition_ids, action_ids) -> None:
+        """
+        ルール集合のファクト辞書での条件・アクションのIDを設定（CompiledRuleSet から呼び出される）
+        凍結後に呼び出されるため、凍結の対象外の属性として設定する
+
+        Args:
+            facts: ファクト辞書
+            condition_ids: 条件のファクトID
+            action_ids: アクションのファクトID
+        """
+        object.__setattr__(self, "_facts", facts)
+        object.__setattr__(self, "_condition_ids", condition_ids)
+        object.__setattr__(self, "_action_ids", action_ids)
+
+    def check_conditions(self, working_memory) -> bool:
+        """
+        条件をチェック
+
+        Args:
+            working_memory: 作業記憶
+
+        Returns:
+            条件が満たされている場合 True、そうでない場合 False
+        """
+        if working_memory.facts is not self._facts:
+            # 別のファクト辞書の作業記憶は文字列で参照する
+            return super().check_conditions(working_memory)
+
+        slots = working_memory.slots
+        size = len(slots)
+
+        if self._is_or:
+            # OR条件: いずれか1つでも満たされていればTrue
+            for fact_id in self._condition_ids:
+                if fact_id >= size:
+                    continue
+                # get_value と同じく findings にあればその値、なければ hypotheses の値
+                state = EFFECTIVE_STATE[slots[fact_id]]
+                if state == SLOT_TRUE or (state == SLOT_OTHER and working_memory.get_value_by_id(fact_id)):
+                    return True
+            return False
+
+        # AND条件: すべて満たされている必要がある
+        for fact_id in self._condition_ids:
+            if fact_id >= size:
+                return False
+            state = EFFECTIVE_STATE[slots[fact_id]]
+            if state != SLOT_TRUE and not (state == SLOT_OTHER and working_memory.get_value_by_id(fact_id)):
+                return False
+        return True
+
+    def execute_actions(self, working_memory) -> None:
+        """
+        アクションを実行（仮説を導出）
+
+        Args:
+            working_memory: 作業記憶
+        """
+        if working_memory.facts is not self._facts:
+            super().execute_actions(working_memory)
+            return
+
+        # 差分ログ・変更の通知のため put_hypothesis_by_id を経由する
+        put = working_memory.put_hypothesis_by_id
+        for fact_id in self._action_ids:
+            put(fact_id, True)
+
+
+def create_rule_from_db(rule_db: RuleDB, compiled: bool = False) -> DynamicRule:
     """
     データベースのルールからRuleオブジェクトを作成
 
     Args:
         rule_db: データベースのルールモデル
+        compiled: 条件の評価を特化した CompiledDynamicRule にするか
 
     Returns:
         DynamicRuleインスタンス
     """
+    if compiled:
+        return CompiledDynamicRule(rule_db)
     return DynamicRule(rule_db)
+
+
+def create_rule_from_values(
+    name: str,
+    conditions: List[str],
+    actions: List[str],
+    rule_type: str,
+    condition_logic: str = "AND",
+    priority: int = 0,
+    compiled: bool = False
+) -> DynamicRule:
+    """
+    ルールの各値からRuleオブジェクトを作成（データベースのモデルを使わない）
+
+    Args:
+        name: ルールの名前
+        conditions: 条件のリスト
+        actions: アクションのリスト
+        rule_type: ルールのタイプ
+        condition_logic: 条件のロジック（"AND" または "OR"）
+        priority: 優先順位
+        compiled: 条件の評価を特化した CompiledDynamicRule にするか
+
+    Returns:
+        DynamicRuleインスタンス
+    """
+    rule_class = CompiledDynamicRule if compiled else DynamicRule
+    return rule_class.from_values(name, conditions, actions, rule_type, condition_logic, priority)
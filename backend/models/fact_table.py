@@ -0,0 +1,98 @@
+"""
+FactTable クラス
+条件・仮説の文字列と連番の整数ID（ファクトID）を対応付ける辞書
+"""
+from typing import Dict, Iterable, Optional, Tuple
+from types import MappingProxyType
+
+
+class FactTable:
+    """
+    ファクト辞書
+    ルール集合のコンパイル時に一度だけ作成し、以降は変更しない
+
+    ファクトIDは 0 から始まる連番で、ルール順に条件・アクションが最初に現れた順に割り当てる。
+    推論エンジンと作業記憶は内部ではファクトIDを使い、文字列への変換は API との境界でだけ行う
+    """
+
+    __slots__ = ("names", "ids")
+
+    def __init__(self, names: Iterable[str]):
+        """
+        FactTable の初期化
+
+        Args:
+            names: 要素の文字列（重複している場合は最初の1つにIDを割り当てる）
+        """
+        ids: Dict[str, int] = {}
+        for name in names:
+            if name not in ids:
+                ids[name] = len(ids)
+        object.__setattr__(self, "names", tuple(ids))
+        object.__setattr__(self, "ids", MappingProxyType(ids))
+
+    def __setattr__(self, name, value):
+        raise AttributeError("FactTable は変更できません")
+
+    @classmethod
+    def from_rules(cls, rules: Iterable) -> "FactTable":
+        """
+        ルールの条件・アクションからファクト辞書を作成
+
+        Args:
+            rules: ルールのリスト（優先順位順）
+
+        Returns:
+            FactTable
+        """
+        return cls(name for rule in rules for name in (*rule.conditions, *rule.actions))
+
+    def id_of(self, name: str) -> Optional[int]:
+        """
+        要素の文字列からファクトIDを取得
+
+        Args:
+            name: 要素の文字列
+
+        Returns:
+            ファクトID、辞書にない場合は None
+        """
+        return self.ids.get(name)
+
+    def name_of(self, fact_id: int) -> str:
+        """
+        ファクトIDから要素の文字列を取得
+
+        Args:
+            fact_id: ファクトID
+
+        Returns:
+            要素の文字列
+        """
+        return self.names[fact_id]
+
+    def encode(self, names: Iterable[str]) -> Tuple[int, ...]:
+        """
+        要素の文字列の並びをファクトIDのタプルに変換（すべて辞書にあること）
+
+        Args:
+            names: 要素の文字列のリスト
+
+        Returns:
+            ファクトIDのタプル
+        """
+        ids = self.ids
+        return tuple(ids[name] for name in names)
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def __contains__(self, name) -> bool:
+        return name in self.ids
+
+    def __repr__(self):
+        return f"FactTable(facts={len(self.names)})"
+
+
+# ルール集合なしで作成した作業記憶が使う空の辞書
+EMPTY_FACTS = FactTable(())
@@ -0,0 +1,239 @@
+"""
+決定木（InterviewTree）の書き出し形式
+フロントエンドがサーバーに問い合わせずに診断を進められるよう、決定木を1つの JSON にまとめる
+
+形式（format_version 1）:
+    rule_set_hash: 木を作成したルール集合の content_hash（ルールが変わると変わる）
+    complete: すべての回答の組み合わせを展開できた場合 true
+    root: 開始時の節点の番号
+    facts: 条件・仮説の文字列の一覧（以下では番号で参照する）
+    rules: ルールの一覧。各ルールは [ルール名, タイプ, 条件の論理, [条件], [アクション], 優先度]
+    responses: /answer のレスポンスの一覧（同じ内容は1つにまとめる）
+    statuses: /status の診断状態の一覧（同じ内容は1つにまとめる）
+    nodes: 節点の一覧。各節点は [レスポンスの番号, 診断状態の番号, 「はい」の子節点, 「いいえ」の子節点]
+           （子節点は節点の番号、未展開・結果の節点は -1）
+
+レスポンス・診断状態は、繰り返し現れるルールの情報を番号に置き換えて保持する
+    - 条件・仮説 -> facts の番号、{要素: 値} -> [[番号, 値], ...]
+    - 適用ルール・評価中ルールの情報 -> [ルールの番号, [[条件の番号, 値], ...]]
+    - 推論チェーンの各ルール -> [ルールの番号, 発火済みなら 1, 条件ごとの状態の文字列]
+      （s: satisfied, n: unsatisfied, u: unknown, c: current）
+expand_response / expand_status で API と同じ形に戻せる
+"""
+from typing import Any, Dict, List
+import json
+
+from .interview_tree import ANSWER_VALUES
+
+# 書き出し形式のバージョン
+ARTIFACT_FORMAT_VERSION = 1
+
+# 推論チェーンの条件の状態 <-> 1文字の符号
+CONDITION_STATUS_CODES = {"satisfied": "s", "unsatisfied": "n", "unknown": "u", "current": "c"}
+CONDITION_STATUS_NAMES = {code: name for name, code in CONDITION_STATUS_CODES.items()}
+
+
+class _Encoder:
+    """
+    レスポンス・診断状態を番号参照の形式に変換する
+    """
+
+    def __init__(self, rule_set):
+        self.rule_set = rule_set
+        self.facts: List[str] = []
+        self.fact_numbers: Dict[str, int] = {}
+        self.rules = [
+            [
+                rule.name, rule.type, rule.condition_logic,
+                [self.fact(c) for c in rule.conditions], [self.fact(a) for a in rule.actions],
+                rule.priority
+            ]
+            for rule in rule_set.rules
+        ]
+
+    def fact(self, text: str) -> int:
+        number = self.fact_numbers.get(text)
+        if number is None:
+            number = len(self.facts)
+            self.facts.append(text)
+            self.fact_numbers[text] = number
+        return number
+
+    def pairs(self, values: Dict[str, Any]) -> List[List]:
+        return [[self.fact(key), value] for key, value in values.items()]
+
+    def rule_info(self, info: Dict[str, Any]) -> List:
+        return [self.rule_set.index_of[info["rule_name"]], self.pairs(info["satisfied_conditions"])]
+
+    def chain_entry(self, info: Dict[str, Any]) -> List:
+        codes = "".join(CONDITION_STATUS_CODES[condition["status"]] for condition in info["conditions"])
+        return [self.rule_set.index_of[info["rule_name"]], 1 if info["is_fired"] else 0, codes]
+
+    def response(self, response: Dict[str, Any]) -> Dict[str, Any]:
+        encoded = dict(response)
+        if response.get("question") is not None:
+            encoded["question"] = self.fact(response["question"])
+        if response.get("results") is not None:
+            encoded["results"] = self.pairs(response["results"])
+        if response.get("reasoning_chain") is not None:
+            encoded["reasoning_chain"] = [self.chain_entry(info) for info in response["reasoning_chain"]]
+        if response.get("available_questions") is not None:
+            encoded["available_questions"] = [self.fact(q) for q in response["available_questions"]]
+        if response.get("applied_rules") is not None:
+            encoded["applied_rules"] = [self.rule_info(info) for info in response["applied_rules"]]
+        if response.get("debug_pending_rules") is not None:
+            encoded["debug_pending_rules"] = [self.rule_set.index_of[name] for name in response["debug_pending_rules"]]
+        return encoded
+
+    def status(self, status: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "findings": self.pairs(status["findings"]),
+            "hypotheses": self.pairs(status["hypotheses"]),
+            "conflict_set": [self.rule_info(info) for info in status["conflict_set"]],
+            "applied_rules": [self.rule_info(info) for info in status["applied_rules"]]
+        }
+
+
+def build_artifact(tree) -> Dict[str, Any]:
+    """
+    決定木を書き出し形式に変換
+
+    Args:
+        tree: 決定木（InterviewTree）
+
+    Returns:
+        書き出し形式の辞書
+    """
+    encoder = _Encoder(tree.rule_set)
+    tables: Dict[str, List] = {"responses": [], "statuses": []}
+    numbers: Dict[str, Dict] = {"responses": {}, "statuses": {}}
+
+    def payload_number(table: str, payload: Dict[str, Any], encode) -> int:
+        # 共有されたオブジェクトは id、内容が同じものは JSON で1つにまとめる
+        by_id = numbers[table]
+        number = by_id.get(id(payload))
+        if number is None:
+            encoded = encode(payload)
+            key = json.dumps(encoded, ensure_ascii=False, sort_keys=True)
+            number = by_id.get(key)
+            if number is None:
+                number = len(tables[table])
+                tables[table].append(encoded)
+                by_id[key] = number
+            by_id[id(payload)] = number
+        return number
+
+    # 幅優先で節点に番号を付ける
+    node_numbers: Dict[int, int] = {id(tree.root): 0}
+    order = [tree.root]
+    for node in order:
+        for value in ANSWER_VALUES:
+            child = node.children.get(value)
+            if child is not None and id(child) not in node_numbers:
+                node_numbers[id(child)] = len(order)
+                order.append(child)
+
+    nodes = []
+    for node in order:
+        children = [node_numbers[id(node.children[value])] if value in node.children else -1 for value in ANSWER_VALUES]
+        nodes.append([
+            payload_number("responses", node.response, encoder.response),
+            payload_number("statuses", node.status, encoder.status),
+            *children
+        ])
+
+    return {
+        "format_version": ARTIFACT_FORMAT_VERSION,
+        "rule_set_hash": tree.rule_set.content_hash,
+        "complete": tree.complete,
+        "root": 0,
+        "facts": encoder.facts,
+        "rules": encoder.rules,
+        "responses": tables["responses"],
+        "statuses": tables["statuses"],
+        "nodes": nodes
+    }
+
+
+def _expand_pairs(artifact: Dict[str, Any], pairs: List[List]) -> Dict[str, Any]:
+    facts = artifact["facts"]
+    return {facts[number]: value for number, value in pairs}
+
+
+def _expand_rule_info(artifact: Dict[str, Any], encoded: List) -> Dict[str, Any]:
+    facts = artifact["facts"]
+    name, rule_type, logic, conditions, actions, _ = artifact["rules"][encoded[0]]
+    return {
+        "rule_name": name,
+        "rule_type": rule_type,
+        "conditions": [facts[c] for c in conditions],
+        "actions": [facts[a] for a in actions],
+        "condition_logic": logic,
+        "satisfied_conditions": _expand_pairs(artifact, encoded[1])
+    }
+
+
+def _expand_chain_entry(artifact: Dict[str, Any], encoded: List) -> Dict[str, Any]:
+    facts = artifact["facts"]
+    name, rule_type, logic, conditions, actions, priority = artifact["rules"][encoded[0]]
+    return {
+        "rule_name": name,
+        "rule_type": rule_type,
+        "condition_logic": logic,
+        "conditions": [
+            {"text": facts[c], "status": CONDITION_STATUS_NAMES[code], "is_current": code == "c"}
+            for c, code in zip(conditions, encoded[2])
+        ],
+        "actions": [facts[a] for a in actions],
+        "is_fired": bool(encoded[1]),
+        "priority": priority
+    }
+
+
+def expand_response(artifact: Dict[str, Any], number: int) -> Dict[str, Any]:
+    """
+    書き出し形式のレスポンスを API と同じ形に戻す
+
+    Args:
+        artifact: 書き出し形式の辞書
+        number: レスポンスの番号
+
+    Returns:
+        /answer と同じ形のレスポンス
+    """
+    encoded = artifact["responses"][number]
+    facts = artifact["facts"]
+    response = dict(encoded)
+    if encoded.get("question") is not None:
+        response["question"] = facts[encoded["question"]]
+    if encoded.get("results") is not None:
+        response["results"] = _expand_pairs(artifact, encoded["results"])
+    if encoded.get("reasoning_chain") is not None:
+        response["reasoning_chain"] = [_expand_chain_entry(artifact, entry) for entry in encoded["reasoning_chain"]]
+    if encoded.get("available_questions") is not None:
+        response["available_questions"] = [facts[q] for q in encoded["available_questions"]]
+    if encoded.get("applied_rules") is not None:
+        response["applied_rules"] = [_expand_rule_info(artifact, info) for info in encoded["applied_rules"]]
+    if encoded.get("debug_pending_rules") is not None:
+        response["debug_pending_rules"] = [artifact["rules"][index][0] for index in encoded["debug_pending_rules"]]
+    return response
+
+
+def expand_status(artifact: Dict[str, Any], number: int) -> Dict[str, Any]:
+    """
+    書き出し形式の診断状態を API と同じ形に戻す
+
+    Args:
+        artifact: 書き出し形式の辞書
+        number: 診断状態の番号
+
+    Returns:
+        /status と同じ形の診断状態
+    """
+    encoded = artifact["statuses"][number]
+    return {
+        "findings": _expand_pairs(artifact, encoded["findings"]),
+        "hypotheses": _expand_pairs(artifact, encoded["hypotheses"]),
+        "conflict_set": [_expand_rule_info(artifact, info) for info in encoded["conflict_set"]],
+        "applied_rules": [_expand_rule_info(artifact, info) for info in encoded["applied_rules"]]
+    }
@@ -0,0 +1,318 @@
+"""
+InterviewTree クラス
+フローチャートモードの診断を事前に展開した決定木（質問 → はい/いいえ → … → 結果）
+
+ルール集合が同じであれば、次の質問とレスポンスはそれまでの回答だけで決まる。
+ルール集合ごとに回答の組み合わせを一度だけ探索しておき、/answer を木の参照だけで返す。
+木にない状態（木の上限を超えた部分、はい/いいえ以外の回答、戻る・スキップなど）は
+それまでの回答を再生した Consultation で続行する
+"""
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+import json
+
+from .consultation import Consultation
+from backend.metrics import INTERVIEW_TREE_ANSWERS
+from .rule_set import compile_rule_set
+
+# 木で扱う回答値（探索する順）
+ANSWER_VALUES = (True, False)
+
+
+class InterviewNode:
+    """
+    決定木の節点
+    この状態で返すレスポンス・診断状態（/status）と、質問への回答ごとの子節点を保持する
+    """
+
+    __slots__ = ("response", "status", "question", "children")
+
+    def __init__(self, response: Dict[str, Any], status: Dict[str, Any]):
+        """
+        InterviewNode の初期化
+
+        Args:
+            response: この状態で返すレスポンス
+            status: この状態の診断状態（Consultation.get_status の結果）
+        """
+        self.response = response
+        self.status = status
+        self.question: Optional[str] = response.get("question") if response.get("need_input") else None
+        self.children: Dict[bool, "InterviewNode"] = {}  # 回答 -> 子節点（未展開の回答は含まない）
+
+
+class InterviewTree:
+    """
+    1つのルール集合に対する診断の決定木
+    """
+
+    def __init__(
+        self,
+        rule_set,
+        root: InterviewNode,
+        node_count: int,
+        complete: bool,
+        consultation_options: Optional[Dict[str, Any]] = None
+    ):
+        """
+        InterviewTree の初期化（通常は compile を使用する）
+
+        Args:
+            rule_set: コンパイル済みルール集合
+            root: 診断開始時の節点
+            node_count: 節点数
+            complete: すべての回答の組み合わせを展開できた場合 True
+            consultation_options: 木の作成に使った Consultation の設定（質問順序の戦略など）
+        """
+        self.rule_set = rule_set
+        self.consultation_options: Dict[str, Any] = consultation_options or {}
+        self.root = root
+        self.node_count = node_count
+        self.complete = complete
+        self._artifact: Optional[Dict[str, Any]] = None
+
+    @classmethod
+    def compile(
+        cls,
+        rules,
+        max_nodes: int = 50000,
+        match_engine: str = "naive",
+        question_strategy: str = "rule_order",
+        answer_frequencies: Optional[Mapping[str, float]] = None
+    ) -> "InterviewTree":
+        """
+        ルール集合の回答の組み合わせを深さ優先で探索して決定木を作成
+
+        1つの Consultation に回答しては差分ログで取り消しながら探索するため、
+        各節点の作成にかかるのは1回分の推論だけ。作業記憶・発火状態・レスポンスが
+        同じ状態は同じ節点として共有し、同じ内容のレスポンスは1つのオブジェクトにまとめる
+
+        Args:
+            rules: コンパイル済みルール集合、またはルールのリスト
+            max_nodes: 節点数の上限（超えた部分は展開せず、実行時に推論エンジンで処理する）
+            match_engine: 探索に使う競合集合の生成方式
+            question_strategy: 次の質問の選び方（Consultation を参照）
+            answer_frequencies: 質問 -> 「はい」と回答される割合
+
+        Returns:
+            決定木
+        """
+        rule_set = compile_rule_set(rules)
+        options = {"question_strategy": question_strategy, "answer_frequencies": answer_frequencies}
+        consultation = Consultation(rule_set, flowchart_mode=True, match_engine=match_engine, **options)
+
+        payloads: Dict[str, Dict[str, Any]] = {}  # レスポンス・診断状態の内容 -> 共有するオブジェクト
+        nodes: Dict[Tuple, InterviewNode] = {}  # 状態 -> 節点
+
+        def share(payload: Dict[str, Any]) -> Tuple[str, Dict[str, Any]]:
+            # 以降の推論で変更されないよう JSON 経由で複製して保持
+            encoded = json.dumps(payload, ensure_ascii=False, sort_keys=True)
+            shared = payloads.get(encoded)
+            if shared is None:
+                shared = json.loads(encoded)
+                payloads[encoded] = shared
+            return encoded, shared
+
+        def make_node(response: Dict[str, Any]) -> Tuple[InterviewNode, bool]:
+            encoded, shared_response = share(response)
+            signature = (encoded, _state_signature(consultation))
+            node = nodes.get(signature)
+            if node is not None:
+                return node, False
+
+            _, shared_status = share(consultation.get_status())
+            node = InterviewNode(shared_response, shared_status)
+            nodes[signature] = node
+            return node, True
+
+        root, _ = make_node(consultation.start_up())
+        complete = True
+
+        def enter(node: InterviewNode) -> List:
+            # 差分ログに記録されない競合集合・評価待ちルールは、取り消し時に自前で戻す
+            return [node, 0, consultation.conflict_set, consultation.pending_rules]
+
+        def undo(frame: List) -> None:
+            consultation._undo_last_step()
+            consultation.conflict_set, consultation.pending_rules = frame[2], frame[3]
+
+        # (節点, 次に探索する回答の位置, 競合集合, 評価待ちルール) のスタック
+        stack: List[List] = [enter(root)] if root.question is not None else []
+        while stack:
+            frame = stack[-1]
+            node, position = frame[0], frame[1]
+            if position >= len(ANSWER_VALUES):
+                stack.pop()
+                if stack:
+                    # この節点に至った回答を取り消す
+                    undo(stack[-1])
+                continue
+
+            if len(nodes) >= max_nodes:
+                complete = False
+                frame[1] = len(ANSWER_VALUES)
+                continue
+
+            frame[1] = position + 1
+            value = ANSWER_VALUES[position]
+            child, created = make_node(consultation.submit_answer(node.question, value))
+            node.children[value] = child
+
+            if created and child.question is not None:
+                stack.append(enter(child))
+            else:
+                undo(frame)
+
+        return cls(rule_set, root, len(nodes), complete, options)
+
+    def to_artifact(self) -> Dict[str, Any]:
+        """
+        決定木を JSON に書き出せる形式に変換（結果はキャッシュする）
+        形式は interview_artifact モジュールを参照
+
+        Returns:
+            決定木の辞書
+        """
+        if self._artifact is None:
+            from .interview_artifact import build_artifact
+            self._artifact = build_artifact(self)
+        return self._artifact
+
+    def new_session(self, match_engine: str = "naive", history_limit: Optional[int] = None) -> "InterviewSession":
+        """
+        この決定木を使う診断セッションを作成
+
+        Args:
+            match_engine: 推論エンジンに切り替えた後の競合集合の生成方式
+            history_limit: 推論エンジンに切り替えた後の「前の質問に戻る」の上限
+
+        Returns:
+            診断セッション
+        """
+        return InterviewSession(self, match_engine, history_limit)
+
+
+def _state_signature(consultation: Consultation) -> Tuple:
+    """
+    以降の推論結果を決める状態の要約
+
+    Args:
+        consultation: 診断
+
+    Returns:
+        状態が同じ場合に等しくなるタプル
+    """
+    status = consultation.status
+    return (
+        tuple(sorted(status.findings.items())),
+        tuple(sorted(status.hypotheses.items())),
+        tuple(consultation.fired_rules),
+        tuple(consultation.evaluating_rule_bits),
+        tuple(rule.name for rule in consultation.conflict_set),
+        tuple(rule.name for rule in consultation.pending_rules),
+        consultation.current_rule_index,
+        json.dumps(consultation.applied_rules, ensure_ascii=False, sort_keys=True)
+    )
+
+
+class InterviewSession:
+    """
+    決定木を使う診断セッション
+    回答が木の中にある間は木をたどるだけで応答し、木にない操作が行われた時点で
+    それまでの回答を Consultation に再生して推論エンジンに切り替える
+    """
+
+    def __init__(self, tree: InterviewTree, match_engine: str = "naive", history_limit: Optional[int] = None):
+        """
+        InterviewSession の初期化
+
+        Args:
+            tree: 決定木
+            match_engine: 推論エンジンに切り替えた後の競合集合の生成方式
+            history_limit: 推論エンジンに切り替えた後の「前の質問に戻る」の上限
+        """
+        self.tree = tree
+        self.match_engine = match_engine
+        self.history_limit = history_limit
+        self.node: Optional[InterviewNode] = tree.root  # 現在の節点（推論エンジンに切り替えた後は None）
+        self.answers: List[Tuple[str, Any]] = []  # これまでの回答
+        self.live: Optional[Consultation] = None
+
+    def start_up(self) -> Dict[str, Any]:
+        """
+        診断開始時のレスポンスを取得
+
+        Returns:
+            推論結果
+        """
+        return dict(self.tree.root.response)
+
+    def submit_answer(self, key: str, value: Any) -> Dict[str, Any]:
+        """
+        ユーザーの回答を記録して推論を進める（木にある回答は木から応答）
+
+        Args:
+            key: 質問（条件）
+            value: 回答
+
+        Returns:
+            次の質問または推論結果
+        """
+        node = self.node
+        if node is not None and key == node.question and isinstance(value, bool):
+            child = node.children.get(value)
+            if child is not None:
+                self.node = child
+                self.answers.append((key, value))
+                INTERVIEW_TREE_ANSWERS.labels(result="hit").inc()
+                return dict(child.response)
+
+        INTERVIEW_TREE_ANSWERS.labels(result="fallback").inc()
+        return self.consultation().submit_answer(key, value)
+
+    def get_status(self) -> Dict[str, Any]:
+        """
+        現在の診断状態を取得（木をたどっている間は展開時に記録した状態）
+
+        Returns:
+            現在の作業記憶（findings と hypotheses）、評価中のルール、適用されたルール
+        """
+        if self.node is not None:
+            return self.node.status
+        return self.live.get_status()
+
+    def consultation(self) -> Consultation:
+        """
+        推論エンジンに切り替えて Consultation を取得
+        初回はそれまでの回答を再生して、木をたどった結果と同じ状態を作る
+
+        Returns:
+            診断
+        """
+        if self.live is None:
+            live = Consultation(
+                self.tree.rule_set,
+                flowchart_mode=True,
+                match_engine=self.match_engine,
+                history_limit=self.history_limit,
+                **self.tree.consultation_options
+            )
+            live.start_up()
+            for key, value in self.answers:
+                live.submit_answer(key, value)
+            self.live = live
+            self.node = None
+        return self.live
+
+    def reset(self) -> None:
+        """
+        診断をリセット（推論前の Consultation に切り替える）
+        """
+        self.live = Consultation(
+            self.tree.rule_set,
+            flowchart_mode=True,
+            match_engine=self.match_engine,
+            history_limit=self.history_limit,
+            **self.tree.consultation_options
+        )
+        self.node = None
+        self.answers = []
@@ -0,0 +1,111 @@
+"""
+MatchNetwork クラス
+作業記憶の変更に応じてルールの照合状態を差分更新するクラス（Rete 方式）
+"""
+from itertools import compress
+from typing import List
+import operator
+
+
+class MatchNetwork:
+    """
+    インクリメンタル照合ネットワーク
+    作業記憶の値が変わったとき、その要素を条件に持つルールだけを再評価する
+
+    各ルールについて「満たされている（値が真の）条件の数」を保持し、
+    AND ルールはすべての条件、OR ルールは1つ以上の条件が満たされたときに照合済みとする。
+    ルールの check_conditions は呼び出さないため、条件部が AND/OR の組み合わせで
+    表現されているルール（VisaRule*、DynamicRule）を前提とする
+    """
+
+    def __init__(self, rule_set, working_memory):
+        """
+        MatchNetwork の初期化
+        作業記憶に通知先として登録し、現在の内容から照合状態を構築する
+
+        Args:
+            rule_set: コンパイル済みルール集合
+            working_memory: 監視する作業記憶
+        """
+        if working_memory.facts is not rule_set.facts:
+            raise ValueError("作業記憶とルール集合のファクト辞書が異なります")
+        self.rule_set = rule_set
+        self.working_memory = working_memory
+
+        # ルールごとの成立に必要な条件数（AND: 条件の種類数、OR: 1。ルール集合で一度だけ計算したものを共有）
+        self._required = rule_set.required_counts
+
+        self.satisfied_counts: List[int] = []  # ルールごとの満たされている条件数
+        self._truth = bytearray(len(rule_set.facts))  # ファクトIDごとの直近の真偽値（0/1）
+        self._matched: set = set()  # 条件を満たしているルールのインデックス
+
+        working_memory.add_listener(self.on_fact_changed)
+        self.rebuild()
+
+    def rebuild(self) -> None:
+        """
+        作業記憶の現在の内容から照合状態を作り直す
+        作業記憶を通知なしで置き換えた場合に使用する
+        """
+        self.satisfied_counts = [0] * len(self.rule_set.rules)
+        self._truth = bytearray(len(self.rule_set.facts))
+        # 条件のない AND ルールは常に照合済み
+        self._matched = set(compress(range(len(self._required)), map(operator.not_, self._required)))
+
+        for fact_id in self.working_memory.fact_ids():
+            self.on_fact_changed(fact_id)
+
+    def on_fact_changed(self, fact_id: int) -> None:
+        """
+        作業記憶の要素が変更されたときに呼び出される
+        真偽が変わった場合のみ、その要素を条件に持つルールの条件数を更新する
+
+        Args:
+            fact_id: 変更された要素のファクトID
+        """
+        # ファクト辞書にない要素（作業記憶で割り当てたID）を条件に持つルールはない
+        consumer_ids = self.rule_set.consumer_ids
+        if fact_id >= len(consumer_ids):
+            return
+        consumers = consumer_ids[fact_id]
+        if not consumers:
+            return
+
+        is_true = 1 if self.working_memory.get_value_by_id(fact_id) else 0
+        if self._truth[fact_id] == is_true:
+            return
+        self._truth[fact_id] = is_true
+
+        delta = 1 if is_true else -1
+        counts = self.satisfied_counts
+        for index in consumers:
+            counts[index] += delta
+            if counts[index] >= self._required[index]:
+                self._matched.add(index)
+            else:
+                self._matched.discard(index)
+
+    def is_matched(self, index: int) -> bool:
+        """
+        ルールの条件が満たされているかチェック
+
+        Args:
+            index: ルールのインデックス
+
+        Returns:
+            条件が満たされている場合 True、そうでない場合 False
+        """
+        return index in self._matched
+
+    def applicable_rules(self, fired_rules) -> List:
+        """
+        条件を満たしている未発火のルールをルール順に取得（競合集合）
+
+        Args:
+            fired_rules: 発火済みルールのビットマップ
+
+        Returns:
+            実行可能なルールのリスト
+        """
+        rules = self.rule_set.rules
+        return [rules[index] for index in sorted(self._matched) if index not in fired_rules]
@@ -0,0 +1,124 @@
+"""
+次の質問の選び方（質問順序の戦略）
+
+rule_order: ルールの並び順で最初に必要になる質問（従来の動作）
+information_gain: 回答後に残る必要な質問数の期待値が最小になる質問
+"""
+from typing import Callable, Dict, Iterable, List, Mapping, Optional
+
+from .relevance import analyze_relevance
+
+# 質問順序の戦略
+QUESTION_STRATEGIES = ("rule_order", "information_gain")
+
+# 回答の頻度が分からない質問で「はい」となる確率
+DEFAULT_TRUE_PROBABILITY = 0.5
+
+
+def count_remaining_questions(rule_set, fired_rules, get_value: Callable[[str], Optional[bool]]) -> int:
+    """
+    終了ルールの発火または申請不可の判定までに、まだ必要な質問の数を数える
+
+    回答済みの値は get_value で参照する（仮の回答を加えた状態を評価するため）。
+    いずれかの終了ルールが成立するか、明示的に False の条件を持つ場合は 0 を返す。
+    ルールの成立判定は AND/OR で行い、仮の回答による連鎖的な発火は考慮しない
+
+    Args:
+        rule_set: コンパイル済みルール集合
+        fired_rules: 発火済みルールのビットマップ
+        get_value: 要素の値を返す関数（未回答の場合 None）
+
+    Returns:
+        必要な質問の数
+    """
+    rules = rule_set.rules
+    satisfied_cache: Dict[int, bool] = {}
+
+    def is_satisfied(index: int) -> bool:
+        satisfied = satisfied_cache.get(index)
+        if satisfied is None:
+            rule = rules[index]
+            values = (get_value(condition) for condition in rule.conditions)
+            if rule.condition_logic == "OR":
+                satisfied = any(values)
+            else:
+                satisfied = all(values)
+            satisfied_cache[index] = satisfied
+        return satisfied
+
+    # 終了ルールの発火・申請不可の判定で診断が終わる場合
+    for index in rule_set.terminal_indices:
+        if index in fired_rules:
+            continue
+        if is_satisfied(index):
+            return 0
+        if any(get_value(condition) is False for condition in rules[index].conditions):
+            return 0
+
+    relevance = analyze_relevance(rule_set, fired_rules, is_satisfied)
+    derivable_hypotheses = rule_set.derivable_hypotheses
+    consumers = rule_set.consumers
+
+    count = 0
+    for condition in relevance.needed_hypotheses:
+        if condition in derivable_hypotheses or get_value(condition) is not None:
+            continue
+
+        # AND 条件で他の条件が False になっているルールしかなければ不要
+        for index in consumers.get(condition, ()):
+            if index not in relevance.useful_rules:
+                continue
+            rule = rules[index]
+            if rule.condition_logic == "AND" and any(
+                c != condition and get_value(c) is False for c in rule.conditions
+            ):
+                continue
+            count += 1
+            break
+
+    return count
+
+
+def rank_by_information_gain(
+    rule_set,
+    fired_rules,
+    get_value: Callable[[str], Optional[bool]],
+    candidates: Iterable[str],
+    answer_frequencies: Optional[Mapping[str, float]] = None
+) -> List[str]:
+    """
+    質問を、回答後に残る必要な質問数の期待値が小さい順に並べる（同じ場合は元の順序）
+
+    期待値 = P(はい) × はいの場合の残りの質問数 + P(いいえ) × いいえの場合の残りの質問数
+    「いいえ」で AND 条件の終了ルールが不成立になる質問など、多くの質問を不要にする質問が先になる
+
+    Args:
+        rule_set: コンパイル済みルール集合
+        fired_rules: 発火済みルールのビットマップ
+        get_value: 要素の値を返す関数（未回答の場合 None）
+        candidates: 候補の質問（ルールの並び順）
+        answer_frequencies: 質問 -> 「はい」と回答される割合（ない質問は 0.5 とする）
+
+    Returns:
+        並べ替えた質問のリスト
+    """
+    frequencies = answer_frequencies or {}
+    scored = []
+    for position, question in enumerate(candidates):
+        p_true = frequencies.get(question, DEFAULT_TRUE_PROBABILITY)
+
+        expected = 0.0
+        for answer, probability in ((True, p_true), (False, 1.0 - p_true)):
+            if probability <= 0.0:
+                continue
+            remaining = count_remaining_questions(
+                rule_set,
+                fired_rules,
+                lambda key, q=question, a=answer: a if key == q else get_value(key)
+            )
+            expected += probability * remaining
+
+        scored.append((expected, position, question))
+
+    scored.sort()
+    return [question for _, _, question in scored]
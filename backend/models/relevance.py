@@ -0,0 +1,162 @@
+"""
+仮説・ルールの必要性（関連性）の解析
+"""
+from typing import Callable, Dict, NamedTuple, FrozenSet
+
+
+class Relevance(NamedTuple):
+    """
+    関連性解析の結果
+
+    needed_hypotheses: まだ必要とされている仮説（条件）の集合
+    useful_rules: 結論がまだ必要とされている未発火・未成立のルールのインデックス集合
+    """
+    needed_hypotheses: FrozenSet[str]
+    useful_rules: FrozenSet[int]
+
+
+def analyze_relevance(rule_set, fired_rules, is_satisfied: Callable[[int], bool]) -> Relevance:
+    """
+    どの仮説・ルールがまだ必要かを解析する
+
+    次の定義の最小不動点を、終了ルールから依存関係を逆向きにたどる作業リストで求める
+    - ルールが「有用」: 未発火かつ未成立で、終了ルール（#n!）であるか、アクションのいずれかが必要
+    - 仮説が「必要」: その仮説を条件に持つルールのいずれかが有用
+
+    各ルール・各条件は高々1回しか処理しないため、ルール数と条件数の合計に比例する時間で終わる。
+    循環参照（強連結成分）があっても、到達済みの要素は再訪しないので停止する
+
+    Args:
+        rule_set: コンパイル済みルール集合
+        fired_rules: 発火済みルールのビットマップ
+        is_satisfied: ルールのインデックスを受け取り、条件が満たされているかを返す関数
+
+    Returns:
+        関連性解析の結果
+    """
+    rules = rule_set.rules
+    producers = rule_set.producers
+    live_cache = {}
+
+    def is_live(index: int) -> bool:
+        live = live_cache.get(index)
+        if live is None:
+            live = index not in fired_rules and not is_satisfied(index)
+            live_cache[index] = live
+        return live
+
+    useful_rules = set()
+    needed_hypotheses = set()
+
+    stack = [index for index in rule_set.terminal_indices if is_live(index)]
+    useful_rules.update(stack)
+
+    while stack:
+        index = stack.pop()
+        for condition in rules[index].conditions:
+            if condition in needed_hypotheses:
+                continue
+            needed_hypotheses.add(condition)
+
+            # この条件を導出するルールは、結論が必要とされるので有用
+            for producer_index in producers.get(condition, ()):
+                if producer_index in useful_rules or not is_live(producer_index):
+                    continue
+                useful_rules.add(producer_index)
+                stack.append(producer_index)
+
+    return Relevance(frozenset(needed_hypotheses), frozenset(useful_rules))
+
+
+class LazyRelevance:
+    """
+    問い合わせたルール・仮説の分だけ求める関連性解析（analyze_relevance と同じ定義）
+
+    ルールが有用かは、そのルールから「アクションを条件に持つ未発火・未成立のルール」を順にたどり、
+    未発火・未成立の終了ルールに到達できるかで判定する（analyze_relevance の逆向きの探索と同じ結果）。
+    探索するのは問い合わせたルールから到達できる範囲だけなので、ルール集合全体の大きさには比例しない。
+    判定結果は作業記憶か発火状態が変わるまで（インスタンスを作り直すまで）再利用する
+    """
+
+    __slots__ = ("_rules", "_action_ids", "_consumer_ids", "_consumers", "_fired_rules", "_is_satisfied", "_live", "_useful")
+
+    def __init__(self, rule_set, fired_rules, is_satisfied: Callable[[int], bool]):
+        """
+        LazyRelevance の初期化
+
+        Args:
+            rule_set: コンパイル済みルール集合
+            fired_rules: 発火済みルールのビットマップ
+            is_satisfied: ルールのインデックスを受け取り、条件が満たされているかを返す関数
+        """
+        self._rules = rule_set.rules
+        self._action_ids = rule_set.action_ids
+        self._consumer_ids = rule_set.consumer_ids
+        self._consumers = rule_set.consumers
+        self._fired_rules = fired_rules
+        self._is_satisfied = is_satisfied
+        self._live: Dict[int, bool] = {}
+        self._useful: Dict[int, bool] = {}
+
+    def _is_live(self, index: int) -> bool:
+        live = self._live.get(index)
+        if live is None:
+            live = index not in self._fired_rules and not self._is_satisfied(index)
+            self._live[index] = live
+        return live
+
+    def is_useful(self, index: int) -> bool:
+        """
+        ルールが有用か（未発火・未成立で、終了ルールであるか結論がまだ必要とされている）
+
+        Args:
+            index: ルールのインデックス
+
+        Returns:
+            有用な場合 True
+        """
+        useful = self._useful.get(index)
+        if useful is not None:
+            return useful
+        if not self._is_live(index):
+            self._useful[index] = False
+            return False
+
+        # 深さ優先で、結論を使う未発火・未成立のルールをたどる（到達済みのルールは再訪しない）
+        rules = self._rules
+        parents = {index: None}
+        stack = [index]
+        while stack:
+            current = stack.pop()
+            known = self._useful.get(current)
+            if known is False:
+                continue
+            if known or rules[current].type == "#n!":
+                # 終了ルールまでの経路上のルールはすべて有用
+                while current is not None:
+                    self._useful[current] = True
+                    current = parents[current]
+                return True
+
+            for fact_id in self._action_ids[current]:
+                for consumer in self._consumer_ids[fact_id]:
+                    if consumer not in parents and self._is_live(consumer):
+                        parents[consumer] = current
+                        stack.append(consumer)
+
+        # 到達できたルールからも終了ルールには到達できない
+        for visited in parents:
+            self._useful[visited] = False
+        return False
+
+    def is_needed(self, hypothesis: str) -> bool:
+        """
+        仮説（条件）がまだ必要か（その仮説を条件に持つルールのいずれかが有用）
+
+        Args:
+            hypothesis: 仮説
+
+        Returns:
+            必要な場合 True
+        """
+        return any(self.is_useful(index) for index in self._consumers.get(hypothesis, ()))
@@ -12,6 +12,8 @@ class Rule(ABC):
     各ルールはこのクラスを継承して実装する
     """
 
+    _frozen = False  # freeze() 後は属性を変更できない
+
     def __init__(
         self,
         name: str,
@@ -79,22 +81,22 @@ class Rule(ABC):
         """
         return self.check_conditions(working_memory)
 
-    def hoist_flag(self) -> None:
-        """
-        一度活性化したルールに対して、それが再度競合集合に
-        入ることによって、それ以降のルールの適用時に識別する
-        ための指標とする
-        """
-        self.flag = "#fired"
-
-    def is_fired(self) -> bool:
+    def freeze(self) -> None:
         """
-        ルールが既に発火したかどうかをチェック
-
-        Returns:
-            発火済みの場合 True、そうでない場合 False
+        ルールを凍結する
+        条件部・結論部をタプルに変換し、以降の属性の変更（flag を含む）を禁止する
+        複数の診断セッションで同じルールを共有するために使用する
         """
-        return self.flag == "#fired"
+        if self._frozen:
+            return
+        self.conditions = tuple(self.conditions)
+        self.actions = tuple(self.actions)
+        object.__setattr__(self, "_frozen", True)
+
+    def __setattr__(self, name, value):
+        if self._frozen:
+            raise AttributeError(f"凍結されたルール {self.name} は変更できません")
+        object.__setattr__(self, name, value)
 
     def __repr__(self):
         return f"Rule(name={self.name}, type={self.type}, flag={self.flag})"
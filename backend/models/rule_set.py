@@ -0,0 +1,229 @@
+"""
+CompiledRuleSet クラス
+複数の診断セッションで共有する、変更不可のルール集合
+"""
+from typing import Dict, Iterable, Iterator, List
+from types import MappingProxyType
+import hashlib
+import json
+import re
+
+from .fact_table import FactTable
+
+# 0 でないバイト（ビットマップの走査で、ビットの立っていないバイトを C の処理で読み飛ばす）
+_NONZERO_BYTE = re.compile(rb"[^\x00]")
+
+
+class RuleBitmap:
+    """
+    ルールの位置（インデックス）を添字とするビットマップ
+    セッションごとの発火済み・評価中の状態を保持する
+    """
+
+    __slots__ = ("_bits",)
+
+    def __init__(self, size: int = 0):
+        """
+        RuleBitmap の初期化
+
+        Args:
+            size: 保持するルール数
+        """
+        self._bits = bytearray((size + 7) >> 3)
+
+    def add(self, index: int) -> None:
+        """
+        指定位置のビットを立てる
+
+        Args:
+            index: ルールのインデックス
+        """
+        self._bits[index >> 3] |= 1 << (index & 7)
+
+    def discard(self, index: int) -> None:
+        """
+        指定位置のビットを下ろす
+
+        Args:
+            index: ルールのインデックス
+        """
+        self._bits[index >> 3] &= ~(1 << (index & 7)) & 0xFF
+
+    def clear(self) -> None:
+        """
+        すべてのビットを下ろす
+        """
+        self._bits[:] = bytes(len(self._bits))
+
+    def copy(self) -> "RuleBitmap":
+        """
+        ビットマップを複製
+
+        Returns:
+            複製したビットマップ
+        """
+        bitmap = RuleBitmap()
+        bitmap._bits = bytearray(self._bits)
+        return bitmap
+
+    def __contains__(self, index: int) -> bool:
+        return bool(self._bits[index >> 3] & (1 << (index & 7)))
+
+    def __iter__(self) -> Iterator[int]:
+        """
+        立っているビットのインデックスを昇順に返す
+        """
+        bits = self._bits
+        for match in _NONZERO_BYTE.finditer(bits):
+            byte_index = match.start()
+            byte = bits[byte_index]
+            while byte:
+                low_bit = byte & -byte
+                yield (byte_index << 3) + low_bit.bit_length() - 1
+                byte ^= low_bit
+
+    def __len__(self) -> int:
+        return bin(int.from_bytes(self._bits, "little")).count("1")
+
+    def __repr__(self):
+        return f"RuleBitmap({list(self)})"
+
+
+class CompiledRuleSet:
+    """
+    コンパイル済みのルール集合
+    ルールは凍結され、生成後は変更できない。発火状態はセッション側の RuleBitmap で管理する
+
+    推論エンジンが全ルールを走査せずに済むよう、以下の索引を生成時に一度だけ構築する
+    - consumers: 条件 -> その条件を使うルールのインデックス（ルール順）
+    - producers: アクション（仮説） -> その仮説を導出するルールのインデックス（ルール順）
+    - derivable_hypotheses: 他のルールから導出できる仮説の集合
+    - terminal_indices: 終了ルール（#n!）のインデックス
+    - required_counts: ルールごとの成立に必要な満たされた条件の数（AND: 条件の種類数、OR: 1。照合ネットワークで使用）
+    - content_hash: ルールの内容（順序を含む）の SHA-256。内容が同じルール集合は同じ値になる
+
+    条件・アクションの文字列はファクト辞書（facts）で整数IDに変換し、推論エンジンの内部ではIDの索引を使う
+    - condition_ids, action_ids: ルールごとの条件・アクションのファクトID（ルールの並びと同じ順）
+    - consumer_ids: ファクトID -> その要素を条件に持つルールのインデックス（consumers のID版）
+    - derivable_ids: 他のルールから導出できる仮説のファクトID
+    """
+
+    __slots__ = (
+        "rules", "by_name", "index_of", "consumers", "producers", "derivable_hypotheses", "terminal_indices",
+        "required_counts", "content_hash", "facts", "condition_ids", "action_ids", "consumer_ids", "derivable_ids"
+    )
+
+    def __init__(self, rules: Iterable):
+        """
+        ルールを凍結してルール集合を作成
+
+        Args:
+            rules: ルールのリスト（優先順位順）
+        """
+        rules = tuple(rules)
+        index_of = {}
+        consumers: Dict[str, List[int]] = {}
+        producers: Dict[str, List[int]] = {}
+
+        for index, rule in enumerate(rules):
+            if rule.name in index_of:
+                raise ValueError(f"ルール名 '{rule.name}' が重複しています")
+            index_of[rule.name] = index
+            rule.freeze()
+
+            # 同じ条件・アクションが1つのルールに重複していても索引には1回だけ登録する
+            for condition in dict.fromkeys(rule.conditions):
+                consumers.setdefault(condition, []).append(index)
+            for action in dict.fromkeys(rule.actions):
+                producers.setdefault(action, []).append(index)
+
+        object.__setattr__(self, "rules", rules)
+        object.__setattr__(self, "by_name", MappingProxyType({rule.name: rule for rule in rules}))
+        object.__setattr__(self, "index_of", MappingProxyType(index_of))
+        object.__setattr__(self, "consumers", MappingProxyType({key: tuple(value) for key, value in consumers.items()}))
+        object.__setattr__(self, "producers", MappingProxyType({key: tuple(value) for key, value in producers.items()}))
+        object.__setattr__(self, "derivable_hypotheses", frozenset(producers))
+        object.__setattr__(
+            self, "terminal_indices",
+            tuple(index for index, rule in enumerate(rules) if rule.type == "#n!")
+        )
+        object.__setattr__(
+            self, "required_counts",
+            tuple(1 if rule.condition_logic == "OR" else len(set(rule.conditions)) for rule in rules)
+        )
+        object.__setattr__(self, "content_hash", rule_set_hash(rules))
+
+        # ファクト辞書とIDの索引
+        facts = FactTable.from_rules(rules)
+        condition_ids = tuple(facts.encode(rule.conditions) for rule in rules)
+        action_ids = tuple(facts.encode(rule.actions) for rule in rules)
+        consumer_ids: List[tuple] = [()] * len(facts)
+        for key, indices in self.consumers.items():
+            consumer_ids[facts.ids[key]] = indices
+
+        object.__setattr__(self, "facts", facts)
+        object.__setattr__(self, "condition_ids", condition_ids)
+        object.__setattr__(self, "action_ids", action_ids)
+        object.__setattr__(self, "consumer_ids", tuple(consumer_ids))
+        object.__setattr__(self, "derivable_ids", frozenset(facts.ids[key] for key in producers))
+
+        # 条件の評価をファクトIDで行うルール（CompiledDynamicRule）にIDを渡す
+        for index, rule in enumerate(rules):
+            bind_facts = getattr(rule, "bind_facts", None)
+            if bind_facts is not None:
+                bind_facts(facts, condition_ids[index], action_ids[index])
+
+    def __setattr__(self, name, value):
+        raise AttributeError("CompiledRuleSet は変更できません")
+
+    def new_bitmap(self) -> RuleBitmap:
+        """
+        このルール集合の大きさに合わせた空のビットマップを作成
+
+        Returns:
+            空のビットマップ
+        """
+        return RuleBitmap(len(self.rules))
+
+    def __len__(self) -> int:
+        return len(self.rules)
+
+    def __iter__(self):
+        return iter(self.rules)
+
+    def __repr__(self):
+        return f"CompiledRuleSet(rules={len(self.rules)})"
+
+
+def rule_set_hash(rules: Iterable) -> str:
+    """
+    ルールの内容（順序を含む）から SHA-256 のハッシュ値を計算
+
+    Args:
+        rules: ルールのリスト（優先順位順）
+
+    Returns:
+        16進数のハッシュ値
+    """
+    canonical = [
+        [rule.name, rule.type, rule.condition_logic, list(rule.conditions), list(rule.actions), rule.priority]
+        for rule in rules
+    ]
+    encoded = json.dumps(canonical, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+def compile_rule_set(rules) -> CompiledRuleSet:
+    """
+    ルールのリストをコンパイル済みルール集合に変換
+    既にコンパイル済みの場合はそのまま返す
+
+    Args:
+        rules: ルールのリスト、または CompiledRuleSet
+
+    Returns:
+        CompiledRuleSet
+    """
+    if isinstance(rules, CompiledRuleSet):
+        return rules
+    return CompiledRuleSet(rules)
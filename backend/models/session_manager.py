@@ -0,0 +1,124 @@
+"""
+SessionManager クラス
+複数の診断セッションを管理するクラス
+"""
+from typing import Any, Callable, Optional
+from collections import OrderedDict
+import secrets
+import threading
+import time
+
+
+class SessionManager:
+    """
+    診断セッションの管理クラス
+    セッションIDごとに Consultation を保持し、LRU と最終アクセスからの TTL で追い出す
+    """
+
+    def __init__(
+        self,
+        max_sessions: int = 1000,
+        ttl_seconds: float = 1800,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        """
+        SessionManager の初期化
+
+        Args:
+            max_sessions: 同時に保持するセッションの最大数（超えた場合は最も古いものから削除）
+            ttl_seconds: 最終アクセスからセッションを破棄するまでの秒数
+            clock: 現在時刻を返す関数（テスト用に差し替え可能）
+        """
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        self._clock = clock
+        # セッションID -> (Consultation, 最終アクセス時刻)。先頭ほどアクセスが古い
+        self._sessions: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def create(self, consultation: Any) -> str:
+        """
+        新しいセッションを登録してセッションIDを発行
+
+        Args:
+            consultation: セッションに紐づける Consultation
+
+        Returns:
+            発行したセッションID
+        """
+        session_id = secrets.token_urlsafe(16)
+        now = self._clock()
+
+        with self._lock:
+            self._evict_expired(now)
+            self._sessions[session_id] = (consultation, now)
+
+            # 上限を超えた場合は最も長くアクセスされていないセッションから削除
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+
+        return session_id
+
+    def get(self, session_id: str) -> Optional[Any]:
+        """
+        セッションIDに対応する Consultation を取得
+        取得したセッションは最終アクセス時刻を更新する
+
+        Args:
+            session_id: セッションID
+
+        Returns:
+            Consultation、存在しないか期限切れの場合は None
+        """
+        now = self._clock()
+
+        with self._lock:
+            self._evict_expired(now)
+
+            entry = self._sessions.get(session_id)
+            if entry is None:
+                return None
+
+            consultation = entry[0]
+            self._sessions[session_id] = (consultation, now)
+            self._sessions.move_to_end(session_id)
+            return consultation
+
+    def remove(self, session_id: str) -> bool:
+        """
+        セッションを削除
+
+        Args:
+            session_id: セッションID
+
+        Returns:
+            削除した場合 True、存在しなかった場合 False
+        """
+        with self._lock:
+            return self._sessions.pop(session_id, None) is not None
+
+    def clear(self) -> None:
+        """
+        すべてのセッションを削除
+        """
+        with self._lock:
+            self._sessions.clear()
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._evict_expired(self._clock())
+            return len(self._sessions)
+
+    def _evict_expired(self, now: float) -> None:
+        """
+        期限切れのセッションを削除（ロック取得済みで呼び出す）
+        アクセス順に並んでいるため、先頭から期限切れでなくなるまで削除すればよい
+
+        Args:
+            now: 現在時刻
+        """
+        while self._sessions:
+            session_id, (_, last_access) = next(iter(self._sessions.items()))
+            if now - last_access < self.ttl_seconds:
+                break
+            del self._sessions[session_id]
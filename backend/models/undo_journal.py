@@ -0,0 +1,104 @@
+"""
+UndoJournal クラス
+「前の質問に戻る」ための差分ログを管理するクラス
+"""
+from typing import Any, List, Optional, Tuple
+from collections import deque
+
+
+class UndoStep:
+    """
+    1回の回答（ステップ）で変更された内容の記録
+    """
+
+    __slots__ = ("applied_rules_count", "current_rule_index", "entries")
+
+    def __init__(self, applied_rules_count: int, current_rule_index: int):
+        """
+        UndoStep の初期化
+
+        Args:
+            applied_rules_count: ステップ開始時点の適用ルール履歴の件数
+            current_rule_index: ステップ開始時点のフローチャートのルール番号
+        """
+        self.applied_rules_count = applied_rules_count
+        self.current_rule_index = current_rule_index
+        self.entries: List[Tuple] = []  # 変更の記録（変更が起きた順）
+
+
+class UndoJournal:
+    """
+    差分ログ
+    スナップショット全体ではなく、各ステップで変更された要素・フラグだけを記録する
+    """
+
+    def __init__(self, max_depth: Optional[int] = None):
+        """
+        UndoJournal の初期化
+
+        Args:
+            max_depth: 保持するステップ数の上限（超えた場合は古いステップから破棄）。None の場合は無制限
+        """
+        self._steps = deque(maxlen=max_depth)
+
+    def begin_step(self, applied_rules_count: int, current_rule_index: int) -> None:
+        """
+        新しいステップの記録を開始
+
+        Args:
+            applied_rules_count: 現在の適用ルール履歴の件数
+            current_rule_index: 現在のフローチャートのルール番号
+        """
+        self._steps.append(UndoStep(applied_rules_count, current_rule_index))
+
+    def record_fact(self, store: str, fact_id: int, old_value: Any) -> None:
+        """
+        作業記憶の要素の変更を記録
+
+        Args:
+            store: 変更された記憶（"findings" または "hypotheses"）
+            fact_id: 変更された要素のファクトID
+            old_value: 変更前の値（存在しなかった場合は WorkingMemory の MISSING）
+        """
+        if self._steps:
+            self._steps[-1].entries.append(("fact", store, fact_id, old_value))
+
+    def record_fired(self, index: int) -> None:
+        """
+        ルールの発火を記録
+
+        Args:
+            index: 発火したルールのインデックス
+        """
+        if self._steps:
+            self._steps[-1].entries.append(("fired", index))
+
+    def record_evaluating(self, index: int) -> None:
+        """
+        ルールが評価中になったことを記録
+
+        Args:
+            index: 評価中になったルールのインデックス
+        """
+        if self._steps:
+            self._steps[-1].entries.append(("evaluating", index))
+
+    def pop_step(self) -> Optional[UndoStep]:
+        """
+        最後のステップの記録を取り出す
+
+        Returns:
+            最後のステップ、記録がない場合は None
+        """
+        if not self._steps:
+            return None
+        return self._steps.pop()
+
+    def clear(self) -> None:
+        """
+        すべての記録を破棄
+        """
+        self._steps.clear()
+
+    def __len__(self) -> int:
+        return len(self._steps)
@@ -0,0 +1,239 @@
+"""
+VectorizedRuleSet クラス
+多数のプロファイルを NumPy の真偽値行列でまとめて評価するクラス
+
+NumPy は一括評価でのみ使用するオプションの依存関係で、API サーバーの実行には不要（backend/requirements-dev.txt）
+"""
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - NumPy がない環境でもモジュールの読み込みはできるようにする
+    np = None
+
+
+class VectorizedRuleSet:
+    """
+    ベクトル化されたルール集合
+    コンパイル済みルール集合を、要素（条件・仮説）の列番号の配列に変換して保持する
+
+    プロファイル × 要素 の行列に対して、仮説の依存グラフのトポロジカル順に
+    層ごとの AND / OR 縮約を行い、前向き推論の不動点を求める。
+    循環参照を含むルールは最後の層にまとめ、変化がなくなるまで繰り返し評価する。
+    ルールの check_conditions は呼び出さないため、条件部が AND/OR で表現されているルールを前提とする
+    """
+
+    def __init__(self, rule_set):
+        """
+        ルール集合をベクトル化
+
+        Args:
+            rule_set: コンパイル済みルール集合
+        """
+        if np is None:
+            raise RuntimeError("ベクトル化評価には NumPy が必要です（pip install -r backend/requirements-dev.txt）")
+
+        self.rule_set = rule_set
+        rules = rule_set.rules
+
+        # 要素 -> 列番号（最後の2列は常に True / 常に False の番兵）
+        facts: Dict[str, int] = {}
+        for rule in rules:
+            for fact in list(rule.conditions) + list(rule.actions):
+                facts.setdefault(fact, len(facts))
+        self.fact_columns = facts
+        self.true_column = len(facts)
+        self.false_column = len(facts) + 1
+        self.width = len(facts) + 2
+
+        self.action_columns = [np.array([facts[a] for a in dict.fromkeys(rule.actions)], dtype=np.intp) for rule in rules]
+        self.terminal_indices = np.array(rule_set.terminal_indices, dtype=np.intp)
+
+        self.layers, self.cyclic_layer = self._build_layers()
+
+    def _build_layers(self) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+        """
+        仮説の依存グラフをトポロジカル順の層に分割し、層ごとの評価用配列を作成
+
+        Returns:
+            (非循環部分の層のリスト, 循環部分の層（なければ None）)
+        """
+        rules = self.rule_set.rules
+        producers = self.rule_set.producers
+        count = len(rules)
+
+        # ルール -> そのルールの条件を導出するルール
+        depends_on = []
+        dependents: List[List[int]] = [[] for _ in range(count)]
+        for index, rule in enumerate(rules):
+            parents = {p for condition in rule.conditions for p in producers.get(condition, ()) if p != index}
+            depends_on.append(len(parents))
+            for parent in parents:
+                dependents[parent].append(index)
+
+        # Kahn 法で層に分割（自己参照のみのルールは循環として扱う）
+        self_loops = {
+            index for index, rule in enumerate(rules)
+            if index in {p for c in rule.conditions for p in producers.get(c, ())}
+        }
+        remaining = list(depends_on)
+        current = [index for index in range(count) if remaining[index] == 0 and index not in self_loops]
+        placed = set()
+        layers = []
+        while current:
+            layers.append(self._compile_layer(current))
+            placed.update(current)
+            following = []
+            for index in current:
+                for child in dependents[index]:
+                    remaining[child] -= 1
+                    if remaining[child] == 0 and child not in self_loops:
+                        following.append(child)
+            current = following
+
+        cyclic = [index for index in range(count) if index not in placed]
+        return layers, (self._compile_layer(cyclic) if cyclic else None)
+
+    def _compile_layer(self, indices: Sequence[int]) -> Dict[str, Any]:
+        """
+        1つの層を評価するための配列を作成
+        条件数の違いは番兵の列で埋める（AND は常に True、OR は常に False）
+
+        Args:
+            indices: 層に含まれるルールのインデックス
+
+        Returns:
+            層の評価用データ
+        """
+        rules = self.rule_set.rules
+        layer = {}
+        for logic, padding in (("AND", self.true_column), ("OR", self.false_column)):
+            members = [i for i in indices if (rules[i].condition_logic == "OR") == (logic == "OR")]
+            width = max((len(rules[i].conditions) for i in members), default=0)
+            matrix = np.full((len(members), max(width, 1)), padding, dtype=np.intp)
+            for row, index in enumerate(members):
+                columns = [self.fact_columns[c] for c in rules[index].conditions]
+                matrix[row, :len(columns)] = columns
+            layer[logic] = (np.array(members, dtype=np.intp), matrix)
+        return layer
+
+    def encode(self, profiles: Sequence[Dict[str, Any]]) -> Tuple["np.ndarray", "np.ndarray", "np.ndarray"]:
+        """
+        回答の辞書のリストを行列に変換
+        推論エンジンと同じく、回答があれば導出された仮説より優先し、条件の成立は値の真偽で判定する。
+        申請不可の判定に使う「明示的に False」は値が False の場合だけ（None・0 などは含めない）
+
+        Args:
+            profiles: 質問 -> 回答 の辞書のリスト
+
+        Returns:
+            (回答済みかを表す行列, 回答値の真偽を表す行列, 回答値が False かを表す行列)
+        """
+        known = np.zeros((len(profiles), self.width), dtype=bool)
+        values = np.zeros((len(profiles), self.width), dtype=bool)
+        explicit_false = np.zeros((len(profiles), self.width), dtype=bool)
+        columns = self.fact_columns
+        for row, answers in enumerate(profiles):
+            for key, value in answers.items():
+                column = columns.get(key)
+                if column is not None:
+                    known[row, column] = True
+                    values[row, column] = bool(value)
+                    explicit_false[row, column] = value is False
+        return known, values, explicit_false
+
+    def evaluate(
+        self, known: "np.ndarray", values: "np.ndarray", explicit_false: Optional["np.ndarray"] = None
+    ) -> Dict[str, "np.ndarray"]:
+        """
+        プロファイル行列をまとめて評価
+
+        Args:
+            known: 回答済みかを表す行列（プロファイル数 × width）
+            values: 回答値の真偽を表す行列（プロファイル数 × width）
+            explicit_false: 回答値が False かを表す行列（省略時は回答済みで偽の値をすべて False とみなす）
+
+        Returns:
+            fired: 発火したルール（プロファイル数 × ルール数）
+            hypotheses: 導出された仮説（プロファイル数 × width）
+            status: 0 = incomplete, 1 = completed, 2 = impossible（プロファイル数）
+        """
+        profiles = known.shape[0]
+        hypotheses = np.zeros((profiles, self.width), dtype=bool)
+        fired = np.zeros((profiles, len(self.rule_set.rules)), dtype=bool)
+
+        # 作業記憶の値: 回答があれば回答値、なければ導出された仮説
+        effective = np.where(known, values, hypotheses)
+        effective[:, self.true_column] = True
+        effective[:, self.false_column] = False
+
+        for layer in self.layers:
+            self._evaluate_layer(layer, effective, known, hypotheses, fired)
+
+        if self.cyclic_layer is not None:
+            # 循環部分は変化がなくなるまで繰り返す（仮説は True の追加のみなので必ず収束する）
+            while self._evaluate_layer(self.cyclic_layer, effective, known, hypotheses, fired):
+                pass
+
+        terminals = self.terminal_indices
+        completed = fired[:, terminals].any(axis=1) if len(terminals) else np.zeros(profiles, dtype=bool)
+
+        # 未発火の終了ルールに、明示的に False の条件があれば申請不可
+        impossible = np.zeros(profiles, dtype=bool)
+        if explicit_false is None:
+            explicit_false = known & ~values
+        rules = self.rule_set.rules
+        for index in terminals:
+            columns = [self.fact_columns[c] for c in rules[index].conditions]
+            if columns:
+                impossible |= ~fired[:, index] & explicit_false[:, columns].any(axis=1)
+
+        status = np.where(completed, 1, np.where(impossible, 2, 0))
+        return {"fired": fired, "hypotheses": hypotheses, "status": status}
+
+    def _evaluate_layer(self, layer, effective, known, hypotheses, fired) -> bool:
+        """
+        1つの層のルールを評価して発火させる
+
+        Returns:
+            新たに発火したルールがあった場合 True
+        """
+        changed = False
+        for logic in ("AND", "OR"):
+            members, matrix = layer[logic]
+            if not len(members):
+                continue
+
+            gathered = effective[:, matrix]  # プロファイル数 × ルール数 × 条件数
+            matched = gathered.all(axis=2) if logic == "AND" else gathered.any(axis=2)
+            newly_fired = matched & ~fired[:, members]
+            if not newly_fired.any():
+                continue
+
+            changed = True
+            fired[:, members] |= newly_fired
+            for local, index in enumerate(members):
+                columns = self.action_columns[index]
+                if len(columns):
+                    hypotheses[:, columns] |= newly_fired[:, local:local + 1]
+                    effective[:, columns] = np.where(known[:, columns], effective[:, columns], hypotheses[:, columns])
+        return changed
+
+    def decode(self, result: Dict[str, "np.ndarray"], row: int) -> Dict[str, Any]:
+        """
+        評価結果の1行を Consultation.run_to_fixed_point と同じ形式に変換（missing_facts は含まない）
+
+        Args:
+            result: evaluate の戻り値
+            row: プロファイルの行番号
+
+        Returns:
+            評価結果（status, results, fired_rules）
+        """
+        rules = self.rule_set.rules
+        hypotheses = result["hypotheses"][row]
+        return {
+            "status": ("incomplete", "completed", "impossible")[int(result["status"][row])],
+            "results": {fact: True for fact, column in self.fact_columns.items() if hypotheses[column]},
+            "fired_rules": [rules[index].name for index in np.flatnonzero(result["fired"][row])]
+        }
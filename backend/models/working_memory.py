@@ -2,21 +2,213 @@
 WorkingMemory クラス
 作業記憶（findings, hypotheses）を管理するクラス
 """
-from typing import Dict, Any
+from typing import Dict, Any, Callable, Iterator, List, Optional, Tuple
+from collections.abc import Mapping
+
+from .fact_table import EMPTY_FACTS, FactTable
+
+# 差分ログで「要素が存在しなかった」ことを表す値
+MISSING = object()
+
+# スロットの状態（findings は下位2ビット、hypotheses はその上の2ビット）
+SLOT_UNKNOWN = 0  # 値がない
+SLOT_TRUE = 1     # True
+SLOT_FALSE = 2    # False
+SLOT_OTHER = 3    # True/False 以外の値（値は別の辞書に保持）
+
+FINDINGS = 0    # findings の記憶の番号
+HYPOTHESES = 1  # hypotheses の記憶の番号
+_STORES = {"findings": FINDINGS, "hypotheses": HYPOTHESES}
+
+# スロットの値 -> get_value が返す値の状態（findings にあればその値、なければ hypotheses の値）
+EFFECTIVE_STATE = bytes((slot & 3) or ((slot >> 2) & 3) for slot in range(16))
+
+
+class FactView(Mapping):
+    """
+    スロットで保持している findings・hypotheses を、要素の文字列で参照する読み取り専用のビュー
+    """
+
+    __slots__ = ("_memory", "_store")
+
+    def __init__(self, memory: "WorkingMemory", store: int):
+        """
+        FactView の初期化
+
+        Args:
+            memory: 作業記憶
+            store: 記憶の番号（FINDINGS または HYPOTHESES）
+        """
+        self._memory = memory
+        self._store = store
+
+    def __getitem__(self, key: str) -> Any:
+        fact_id = self._memory.fact_id(key)
+        value = MISSING if fact_id is None else self._memory._read(self._store, fact_id)
+        if value is MISSING:
+            raise KeyError(key)
+        return value
+
+    def __contains__(self, key) -> bool:
+        fact_id = self._memory.fact_id(key)
+        return fact_id is not None and self._memory._read(self._store, fact_id) is not MISSING
+
+    def __iter__(self) -> Iterator[str]:
+        # 値を設定した順（dict と同じ）
+        name_of = self._memory.name_of
+        for fact_id in self._memory._order[self._store]:
+            yield name_of(fact_id)
+
+    def __len__(self) -> int:
+        return len(self._memory._order[self._store])
+
+    def __repr__(self):
+        return repr(dict(self))
 
 
 class WorkingMemory:
     """
     作業記憶クラス
     診断に関する状態、知見（findings）、仮説（hypotheses）を保持する
+
+    要素はルール集合のファクト辞書（FactTable）のIDを添字とする bytearray（slots）の
+    1バイトで保持する。下位2ビットが findings、その上の2ビットが hypotheses の状態
+    （SLOT_UNKNOWN/SLOT_TRUE/SLOT_FALSE/SLOT_OTHER）で、True/False 以外の値だけを別の辞書に保持する。
+    slots は値を設定した最大のIDまでしか確保しないため、範囲外のIDは値がないものとして扱う
+
+    辞書にない要素（どのルールも使わない回答など）には、この作業記憶の中だけで有効なIDを割り当てる
     """
 
-    def __init__(self):
+    def __init__(self, facts: Optional[FactTable] = None):
         """
         インスタンス変数を初期化
+
+        Args:
+            facts: ルール集合のファクト辞書（省略時は空の辞書）
+        """
+        self.facts: FactTable = facts if facts is not None else EMPTY_FACTS
+        self.slots = bytearray()  # ファクトID -> 状態
+        self._other: Tuple[Dict[int, Any], Dict[int, Any]] = ({}, {})  # 記憶ごとの True/False 以外の値
+        self._order: Tuple[List[int], List[int]] = ([], [])  # 記憶ごとの値を設定した順のファクトID
+        self._extra_ids: Dict[str, int] = {}  # ファクト辞書にない要素 -> この作業記憶でのID
+        self._extra_names: List[str] = []
+        self._listeners: List[Callable[[int], None]] = []  # 値の変更を通知する関数
+        self._journal = None  # 変更前の値を記録する差分ログ（UndoJournal）
+
+    @property
+    def findings(self) -> FactView:
+        """
+        ユーザーの回答（事実）を要素の文字列で参照するビュー
+        """
+        return FactView(self, FINDINGS)
+
+    @property
+    def hypotheses(self) -> FactView:
+        """
+        推論結果（仮説）を要素の文字列で参照するビュー
+        """
+        return FactView(self, HYPOTHESES)
+
+    def copy(self) -> "WorkingMemory":
+        """
+        作業記憶の複製（スナップショット）を作成
+        通知先と差分ログは引き継がない
+
+        Returns:
+            複製した作業記憶
+        """
+        memory = WorkingMemory(self.facts)
+        memory.slots = bytearray(self.slots)
+        memory._other = (dict(self._other[FINDINGS]), dict(self._other[HYPOTHESES]))
+        memory._order = (list(self._order[FINDINGS]), list(self._order[HYPOTHESES]))
+        memory._extra_ids = dict(self._extra_ids)
+        memory._extra_names = list(self._extra_names)
+        return memory
+
+    def fact_ids(self) -> List[int]:
+        """
+        値のある要素のファクトID
+
+        Returns:
+            ファクトIDのリスト（findings、hypotheses の順に値を設定した順、重複なし）
+        """
+        return list(dict.fromkeys(self._order[FINDINGS] + self._order[HYPOTHESES]))
+
+    def fact_id(self, key: str) -> Optional[int]:
+        """
+        要素の文字列からファクトIDを取得（IDは割り当てない）
+
+        Args:
+            key: 要素のキー
+
+        Returns:
+            ファクトID、まだIDのない要素の場合は None
+        """
+        fact_id = self.facts.ids.get(key)
+        if fact_id is None and self._extra_ids:
+            fact_id = self._extra_ids.get(key)
+        return fact_id
+
+    def intern(self, key: str) -> int:
+        """
+        要素の文字列からファクトIDを取得（ファクト辞書にない場合はこの作業記憶でIDを割り当てる）
+
+        Args:
+            key: 要素のキー
+
+        Returns:
+            ファクトID
+        """
+        fact_id = self.fact_id(key)
+        if fact_id is None:
+            fact_id = len(self.facts) + len(self._extra_names)
+            self._extra_ids[key] = fact_id
+            self._extra_names.append(key)
+        return fact_id
+
+    def name_of(self, fact_id: int) -> str:
+        """
+        ファクトIDから要素の文字列を取得
+
+        Args:
+            fact_id: ファクトID
+
+        Returns:
+            要素のキー
+        """
+        names = self.facts.names
+        if fact_id < len(names):
+            return names[fact_id]
+        return self._extra_names[fact_id - len(names)]
+
+    def attach_journal(self, journal) -> None:
+        """
+        変更前の値を記録する差分ログを設定
+
+        Args:
+            journal: 差分ログ（UndoJournal）
+        """
+        self._journal = journal
+
+    def add_listener(self, listener: Callable[[int], None]) -> None:
+        """
+        値が変更されたときに呼び出される関数を登録
+        変更された要素のファクトIDを引数として呼び出す
+
+        Args:
+            listener: 通知先の関数
+        """
+        self._listeners.append(listener)
+
+    def _notify(self, fact_id: int) -> None:
+        """
+        登録された関数に値の変更を通知
+
+        Args:
+            fact_id: 変更された要素のファクトID
         """
-        self.findings: Dict[str, Any] = {}      # ユーザーの回答（事実）
-        self.hypotheses: Dict[str, Any] = {}    # 推論結果（仮説）
+        for listener in self._listeners:
+            listener(fact_id)
 
     def get_value(self, key: str) -> Any:
         """
@@ -29,12 +221,97 @@ class WorkingMemory:
         Returns:
             findings または hypotheses に含まれる値、存在しない場合は None
         """
-        if key in self.findings:
-            return self.findings[key]
-        elif key in self.hypotheses:
-            return self.hypotheses[key]
-        else:
+        fact_id = self.fact_id(key)
+        if fact_id is None:
+            return None
+        return self.get_value_by_id(fact_id)
+
+    def get_value_by_id(self, fact_id: int) -> Any:
+        """
+        get_value のファクトID版
+
+        Args:
+            fact_id: 取得する要素のファクトID
+
+        Returns:
+            findings または hypotheses に含まれる値、存在しない場合は None
+        """
+        if fact_id >= len(self.slots):
             return None
+        slot = self.slots[fact_id]
+        if slot & 3:
+            return self._decode(FINDINGS, fact_id, slot & 3)
+        if slot:
+            return self._decode(HYPOTHESES, fact_id, slot >> 2)
+        return None
+
+    def _decode(self, store: int, fact_id: int, state: int) -> Any:
+        # スロットの状態から値を取り出す
+        if state == SLOT_TRUE:
+            return True
+        if state == SLOT_FALSE:
+            return False
+        return self._other[store][fact_id]
+
+    def _read(self, store: int, fact_id: int) -> Any:
+        """
+        1つの記憶から要素の値を取り出す
+
+        Args:
+            store: 記憶の番号（FINDINGS または HYPOTHESES）
+            fact_id: 要素のファクトID
+
+        Returns:
+            値、存在しない場合は MISSING
+        """
+        if fact_id >= len(self.slots):
+            return MISSING
+        state = (self.slots[fact_id] >> (store * 2)) & 3
+        if state == SLOT_UNKNOWN:
+            return MISSING
+        return self._decode(store, fact_id, state)
+
+    def _write(self, store: int, fact_id: int, value: Any) -> None:
+        """
+        1つの記憶に要素の値を設定（MISSING の場合は要素を削除）
+
+        Args:
+            store: 記憶の番号（FINDINGS または HYPOTHESES）
+            fact_id: 要素のファクトID
+            value: 設定する値
+        """
+        slots = self.slots
+        if fact_id >= len(slots):
+            if value is MISSING:
+                return
+            slots.extend(bytes(fact_id + 1 - len(slots)))
+
+        shift = store * 2
+        old_state = (slots[fact_id] >> shift) & 3
+        if old_state == SLOT_OTHER:
+            del self._other[store][fact_id]
+
+        if value is MISSING:
+            state = SLOT_UNKNOWN
+            if old_state != SLOT_UNKNOWN:
+                order = self._order[store]
+                # 差分ログは逆順に戻すため、ほとんどの場合は最後に追加した要素
+                if order[-1] == fact_id:
+                    order.pop()
+                else:
+                    order.remove(fact_id)
+        else:
+            if value is True:
+                state = SLOT_TRUE
+            elif value is False:
+                state = SLOT_FALSE
+            else:
+                state = SLOT_OTHER
+                self._other[store][fact_id] = value
+            if old_state == SLOT_UNKNOWN:
+                self._order[store].append(fact_id)
+
+        slots[fact_id] = (slots[fact_id] & ~(3 << shift) & 0xF) | (state << shift)
 
     def get_value_all(self, key: str) -> Any:
         """
@@ -57,7 +334,20 @@ class WorkingMemory:
             key: 追加する要素のキー
             value: 追加する値
         """
-        self.hypotheses[key] = value
+        self.put_hypothesis_by_id(self.intern(key), value)
+
+    def put_hypothesis_by_id(self, fact_id: int, value: Any) -> None:
+        """
+        put_value_of_hypothesis のファクトID版
+
+        Args:
+            fact_id: 追加する要素のファクトID
+            value: 追加する値
+        """
+        if self._journal is not None:
+            self._journal.record_fact("hypotheses", fact_id, self._read(HYPOTHESES, fact_id))
+        self._write(HYPOTHESES, fact_id, value)
+        self._notify(fact_id)
 
     def has_key(self, key: str) -> bool:
         """
@@ -69,7 +359,20 @@ class WorkingMemory:
         Returns:
             キーが存在する場合 True、そうでない場合 False
         """
-        return key in self.findings or key in self.hypotheses
+        fact_id = self.fact_id(key)
+        return fact_id is not None and self.has_id(fact_id)
+
+    def has_id(self, fact_id: int) -> bool:
+        """
+        has_key のファクトID版
+
+        Args:
+            fact_id: チェックする要素のファクトID
+
+        Returns:
+            要素が存在する場合 True、そうでない場合 False
+        """
+        return fact_id < len(self.slots) and self.slots[fact_id] != SLOT_UNKNOWN
 
     def set_finding(self, key: str, value: Any) -> None:
         """
@@ -79,11 +382,40 @@ class WorkingMemory:
             key: 設定する要素のキー
             value: 設定する値
         """
-        self.findings[key] = value
+        self.set_finding_by_id(self.intern(key), value)
+
+    def set_finding_by_id(self, fact_id: int, value: Any) -> None:
+        """
+        set_finding のファクトID版
+
+        Args:
+            fact_id: 設定する要素のファクトID
+            value: 設定する値
+        """
+        if self._journal is not None:
+            self._journal.record_fact("findings", fact_id, self._read(FINDINGS, fact_id))
+        self._write(FINDINGS, fact_id, value)
+        self._notify(fact_id)
+
+    def restore(self, store: str, fact_id: int, value: Any) -> None:
+        """
+        差分ログの記録から要素を変更前の値に戻す（差分ログには記録しない）
+
+        Args:
+            store: 戻す記憶（"findings" または "hypotheses"）
+            fact_id: 戻す要素のファクトID
+            value: 変更前の値（MISSING の場合は要素を削除）
+        """
+        self._write(_STORES[store], fact_id, value)
+        self._notify(fact_id)
 
     def clear(self) -> None:
         """
         作業記憶をクリア
         """
-        self.findings.clear()
-        self.hypotheses.clear()
+        fact_ids = self._order[FINDINGS] + self._order[HYPOTHESES]
+        self.slots = bytearray()
+        self._other = ({}, {})
+        self._order = ([], [])
+        for fact_id in fact_ids:
+            self._notify(fact_id)
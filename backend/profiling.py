@@ -0,0 +1,221 @@
+"""
+リクエスト単位のプロファイリング
+推論エンジンの処理（スレッドプールで実行されるエンドポイント）の cProfile を取得し、
+件数に上限のあるディレクトリに保存する
+
+環境変数:
+    PROFILE_REQUESTS: "off"（デフォルト）、"header"（X-Profile: 1 ヘッダーのあるリクエストだけ）、
+                      "all"（すべてのリクエスト）
+    PROFILE_DIR: 保存先のディレクトリ（デフォルトは一時ディレクトリの visa-profiles）
+    PROFILE_MAX_FILES: 保存するプロファイルの最大数（超えた場合は古いものから削除）
+
+保存したプロファイルは /api/profiles で一覧・取得でき、
+python -m pstats や snakeviz などで開ける
+"""
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+import cProfile
+import functools
+import json
+import os
+import re
+import secrets
+import tempfile
+import threading
+import time
+
+from starlette.concurrency import run_in_threadpool
+
+PROFILE_MODE = os.getenv("PROFILE_REQUESTS", "off").lower()
+PROFILE_DIR = os.getenv("PROFILE_DIR", os.path.join(tempfile.gettempdir(), "visa-profiles"))
+PROFILE_MAX_FILES = int(os.getenv("PROFILE_MAX_FILES", "50"))
+
+# プロファイルIDの形式（一覧・取得時のパスの検証に使う）
+PROFILE_ID_PATTERN = re.compile(r"^[0-9]{8}T[0-9]{12}-[0-9a-f]{8}$")
+
+
+class RequestProfile:
+    """
+    1件のリクエストのプロファイル
+    """
+
+    def __init__(self, profile_id: str):
+        self.profile_id = profile_id
+        self.profiler = cProfile.Profile()
+        self.used = False  # プロファイル対象の処理を実行したか
+        self._lock = threading.Lock()
+        self._active = False
+
+    def run(self, func, *args, **kwargs):
+        """
+        プロファイルを取りながら関数を実行（実行中の呼び出しの中からは二重に開始しない）
+        """
+        with self._lock:
+            if self._active:
+                nested = True
+            else:
+                nested = False
+                self._active = True
+        if nested:
+            return func(*args, **kwargs)
+
+        self.used = True
+        self.profiler.enable()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            self.profiler.disable()
+            with self._lock:
+                self._active = False
+
+
+# 現在のリクエストのプロファイル（プロファイルしない場合は None）
+current_profile: ContextVar[Optional[RequestProfile]] = ContextVar("current_profile", default=None)
+
+
+def profiled(func):
+    """
+    リクエストのプロファイルが有効な場合に、関数の実行中のプロファイルを取るデコレーター
+    同期エンドポイントに付けると、スレッドプールの中の処理（推論エンジン・レスポンスの作成）が対象になる
+    """
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        profile = current_profile.get()
+        if profile is None:
+            return func(*args, **kwargs)
+        return profile.run(func, *args, **kwargs)
+    return wrapper
+
+
+def new_profile_id() -> str:
+    # 名前順が作成順になるよう、マイクロ秒までの作成日時から始める
+    return f"{datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%S%f')}-{secrets.token_hex(4)}"
+
+
+class ProfileStore:
+    """
+    プロファイルの保存先（件数に上限のあるディレクトリ）
+    各プロファイルは pstats 形式の <ID>.prof と、リクエストの情報を持つ <ID>.json で保存する
+    """
+
+    def __init__(self, directory: str, max_files: int):
+        self.directory = directory
+        self.max_files = max_files
+        self._lock = threading.Lock()
+
+    def path(self, profile_id: str, extension: str = ".prof") -> Optional[str]:
+        """
+        プロファイルのファイルのパスを取得
+
+        Args:
+            profile_id: プロファイルID
+            extension: 拡張子
+
+        Returns:
+            パス、IDの形式が不正な場合は None
+        """
+        if not PROFILE_ID_PATTERN.match(profile_id):
+            return None
+        return os.path.join(self.directory, profile_id + extension)
+
+    def save(self, profile: RequestProfile, info: Dict[str, Any]) -> None:
+        """
+        プロファイルを保存し、上限を超えた古いプロファイルを削除
+
+        Args:
+            profile: リクエストのプロファイル
+            info: リクエストの情報（メソッド・パス・ステータス・処理時間など）
+        """
+        with self._lock:
+            os.makedirs(self.directory, exist_ok=True)
+            profile.profiler.dump_stats(self.path(profile.profile_id))
+            with open(self.path(profile.profile_id, ".json"), "w", encoding="utf-8") as f:
+                json.dump({"id": profile.profile_id, **info}, f, ensure_ascii=False)
+
+            # IDは作成日時から始まるため、名前順が古い順
+            profile_ids = sorted(name[:-5] for name in os.listdir(self.directory) if name.endswith(".prof"))
+            for profile_id in profile_ids[:max(0, len(profile_ids) - self.max_files)]:
+                for extension in (".prof", ".json"):
+                    try:
+                        os.remove(self.path(profile_id, extension))
+                    except FileNotFoundError:
+                        pass
+
+    def list(self) -> List[Dict[str, Any]]:
+        """
+        保存しているプロファイルの情報を新しい順に取得
+
+        Returns:
+            プロファイルの情報のリスト
+        """
+        if not os.path.isdir(self.directory):
+            return []
+
+        profiles = []
+        for name in sorted(os.listdir(self.directory), reverse=True):
+            if not name.endswith(".json") or not PROFILE_ID_PATTERN.match(name[:-5]):
+                continue
+            try:
+                with open(os.path.join(self.directory, name), encoding="utf-8") as f:
+                    profiles.append(json.load(f))
+            except (OSError, ValueError):
+                # 削除中のファイルは読み飛ばす
+                continue
+        return profiles
+
+
+profile_store = ProfileStore(PROFILE_DIR, PROFILE_MAX_FILES)
+
+
+class ProfilingMiddleware:
+    """
+    PROFILE_REQUESTS に従ってリクエストのプロファイルを開始する ASGI ミドルウェア
+    プロファイルを取ったリクエストのレスポンスには X-Profile-ID ヘッダーを付ける
+    """
+
+    def __init__(self, app, mode: str = PROFILE_MODE, store: ProfileStore = profile_store):
+        self.app = app
+        self.mode = mode
+        self.store = store
+
+    def _should_profile(self, scope) -> bool:
+        if self.mode == "all":
+            return True
+        if self.mode == "header":
+            for name, value in scope.get("headers", ()):
+                if name == b"x-profile":
+                    return value.strip() not in (b"", b"0", b"false")
+        return False
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or self.mode == "off" or not self._should_profile(scope):
+            await self.app(scope, receive, send)
+            return
+
+        profile = RequestProfile(new_profile_id())
+        status = [500]
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+                if profile.used:
+                    headers = list(message.get("headers", []))
+                    headers.append((b"x-profile-id", profile.profile_id.encode("latin-1")))
+                    message = {**message, "headers": headers}
+            await send(message)
+
+        token = current_profile.set(profile)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            current_profile.reset(token)
+            if profile.used:
+                await run_in_threadpool(self.store.save, profile, {
+                    "method": scope["method"],
+                    "path": scope["path"],
+                    "status": status[0],
+                    "duration_ms": round((time.perf_counter() - started) * 1000, 2),
+                    "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds")
+                })
@@ -0,0 +1,90 @@
+"""
+SQLite のデータベースファイルの変更検知
+複数のワーカープロセスで動かす場合に、他のワーカーが行ったルールの変更を検知するために使う
+"""
+from typing import Optional
+import logging
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class SQLiteChangeDetector:
+    """
+    PRAGMA data_version によるデータベースの変更検知
+
+    data_version は接続ごとの値で、他の接続（他のプロセスを含む）がコミットすると変わる。
+    そのため、検知専用の接続を1つ開いたままにして値を比較する。
+    確認は min_interval 秒に1回までに制限し、それ以外の呼び出しはロックも取らずに戻る
+    """
+
+    def __init__(self, path: str, min_interval: float = 1.0):
+        """
+        SQLiteChangeDetector の初期化（現在の値を基準として記録する）
+
+        Args:
+            path: データベースファイルのパス
+            min_interval: 確認の最小間隔（秒）
+        """
+        self.path = path
+        self.min_interval = min_interval
+        self._lock = threading.Lock()
+        self._connection: Optional[sqlite3.Connection] = None
+        self._data_version: Optional[int] = None
+        self._next_check = 0.0
+        self.sync()
+
+    def _read_data_version(self) -> int:
+        # 検知用の接続は初回に開き、以降は使い回す（呼び出し元でロックを取ること）
+        if self._connection is None:
+            self._connection = sqlite3.connect(self.path, check_same_thread=False)
+        return self._connection.execute("PRAGMA data_version").fetchone()[0]
+
+    def sync(self) -> None:
+        """
+        現在の値を基準として記録する（これまでの変更は検知済みとする）
+        自分でルールを変更して再読み込みを開始したときに呼び出す
+        """
+        with self._lock:
+            try:
+                self._data_version = self._read_data_version()
+            except sqlite3.Error:
+                logger.exception("failed to read data_version", extra={"event": "rules_watch_failed"})
+                self._data_version = None
+            self._next_check = time.monotonic() + self.min_interval
+
+    def changed(self) -> bool:
+        """
+        前回の確認以降にデータベースが変更されたか
+        最小間隔内の呼び出しと、他のスレッドが確認中の呼び出しは False を返す
+
+        Returns:
+            変更された場合 True
+        """
+        now = time.monotonic()
+        if now < self._next_check or not self._lock.acquire(blocking=False):
+            return False
+        try:
+            self._next_check = now + self.min_interval
+            try:
+                data_version = self._read_data_version()
+            except sqlite3.Error:
+                logger.exception("failed to read data_version", extra={"event": "rules_watch_failed"})
+                return False
+            if data_version == self._data_version:
+                return False
+            self._data_version = data_version
+            return True
+        finally:
+            self._lock.release()
+
+    def close(self) -> None:
+        """
+        検知用の接続を閉じる
+        """
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
@@ -1,19 +1,24 @@
 """
 データベースからルールを読み込む
 """
-from typing import List
+from typing import List, Optional
 from backend.database import SessionLocal
 from backend.models.rule_db import RuleDB
 from backend.models.dynamic_rule import create_rule_from_db
 from backend.models.rule import Rule
+import os
 
+# DB のルールを条件の評価を特化した CompiledDynamicRule にするか（"false" で DynamicRule）
+COMPILE_RULES = os.getenv("COMPILED_DB_RULES", "true").lower() == "true"
 
-def get_rules_from_db(visa_type: str = None) -> List[Rule]:
+
+def get_rules_from_db(visa_type: str = None, compiled: Optional[bool] = None) -> List[Rule]:
     """
     データベースからルールを読み込む
 
     Args:
         visa_type: ビザタイプ（"E", "L", "B" など）。Noneの場合は全ルールを取得
+        compiled: 条件の評価を特化した CompiledDynamicRule にするか（省略時は環境変数 COMPILED_DB_RULES に従う）
 
     Returns:
         Ruleオブジェクトのリスト
@@ -35,7 +40,9 @@ def get_rules_from_db(visa_type: str = None) -> List[Rule]:
         rule_dbs = query.all()
 
         # DynamicRuleオブジェクトに変換
-        rules = [create_rule_from_db(rule_db) for rule_db in rule_dbs]
+        if compiled is None:
+            compiled = COMPILE_RULES
+        rules = [create_rule_from_db(rule_db, compiled=compiled) for rule_db in rule_dbs]
 
         return rules
 
@@ -43,14 +50,15 @@ def get_rules_from_db(visa_type: str = None) -> List[Rule]:
         db.close()
 
 
-def get_rules_by_visa_type_from_db(visa_type: str) -> List[Rule]:
+def get_rules_by_visa_type_from_db(visa_type: str, compiled: Optional[bool] = None) -> List[Rule]:
     """
     指定されたビザタイプに関連するルールをデータベースから取得
 
     Args:
         visa_type: ビザタイプ（"E", "L", "B"）
+        compiled: 条件の評価を特化した CompiledDynamicRule にするか（省略時は環境変数 COMPILED_DB_RULES に従う）
 
     Returns:
         指定されたビザタイプに関連するルールのリスト
     """
-    return get_rules_from_db(visa_type)
+    return get_rules_from_db(visa_type, compiled)
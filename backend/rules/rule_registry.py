@@ -0,0 +1,384 @@
+"""
+ビザタイプごとのコンパイル済みルール集合の登録先（バージョン付き）
+ルールの編集後はバックグラウンドで再コンパイルし、完成したルール集合にまとめて切り替える
+"""
+from collections.abc import Mapping
+from types import MappingProxyType
+from typing import Callable, Iterable, Iterator, List, Optional, Tuple
+import logging
+import threading
+import time
+
+from backend.metrics import ENGINE_PHASE_DURATION
+from backend.models.rule import Rule
+from backend.models.rule_set import CompiledRuleSet
+
+logger = logging.getLogger(__name__)
+
+
+class RuleSetVersion:
+    """
+    あるバージョンのルール集合（ビザタイプ -> CompiledRuleSet）
+    生成後は変更しない
+    """
+
+    __slots__ = ("version", "rule_sets")
+
+    def __init__(self, version: int, rule_sets):
+        self.version = version
+        self.rule_sets = MappingProxyType(dict(rule_sets))
+
+    def __repr__(self):
+        return f"RuleSetVersion(version={self.version}, visa_types={list(self.rule_sets)})"
+
+
+class RuleRegistry(Mapping):
+    """
+    バージョン付きのルール集合の登録先
+    ビザタイプ -> CompiledRuleSet の読み取り専用の辞書として参照できる（RULES_CACHE）
+
+    invalidate() でバージョンを進め、バックグラウンドのスレッドで読み込み済みのビザタイプを再コンパイルする。
+    完成したルール集合は参照を1回書き換えて切り替えるため、読み取り側はロックを取らない。
+    開始済みの診断セッションは開始時のルール集合を保持し続ける（切り替えの影響を受けない）。
+    内容（content_hash）が変わらなかったビザタイプは以前の CompiledRuleSet をそのまま使い、
+    決定木などのルール集合ごとのキャッシュを保つ
+
+    watch() で変更検知（SQLiteChangeDetector）を設定すると、ルール集合を参照するたびに
+    （検知側で決めた間隔で）データベースの変更を確認し、他のワーカープロセスでの変更も再読み込みする
+
+    load() を呼ばない場合、各ビザタイプは最初に参照されたときに読み込む（warm_up() でまとめて読み込める）。
+    その場合の再読み込みは読み込み済みのビザタイプだけを対象にする
+
+    on_compiled を指定すると、新しい CompiledRuleSet に切り替えた後に（読み込み・再読み込みを行ったスレッドで）
+    ビザタイプごとに呼び出す。決定木などのルール集合ごとのデータの作成の開始に使う
+    """
+
+    def __init__(
+        self,
+        loader: Callable[[str], List[Rule]],
+        visa_types: Iterable[str],
+        prepare: Optional[Callable[[], None]] = None,
+        on_compiled: Optional[Callable[[str, CompiledRuleSet], None]] = None
+    ):
+        """
+        RuleRegistry の初期化（ルールはまだ読み込まない）
+
+        Args:
+            loader: ビザタイプ -> ルールのリスト（優先順位順）を返す関数
+            visa_types: 登録するビザタイプ
+            prepare: 最初のルールの読み込みの前に1回だけ実行する関数（データベースへのルールの移行など）
+            on_compiled: 新しいルール集合に切り替えた後に呼び出す関数（ビザタイプ, ルール集合）
+        """
+        self._loader = loader
+        self._visa_types = tuple(visa_types)
+        self._prepare = prepare
+        self._on_compiled = on_compiled
+        self._current = RuleSetVersion(0, {})
+        self._requested_version = 0  # invalidate で要求された最新のバージョン
+        self._lock = threading.Lock()  # バージョンの採番と再コンパイルのスレッドの起動
+        self._compile_lock = threading.Lock()  # 再コンパイルを同時に1つだけ実行する
+        self._worker: Optional[threading.Thread] = None
+        self._detector = None  # データベースの変更検知（watch で設定）
+
+    def watch(self, detector) -> None:
+        """
+        データベースの変更検知を設定
+
+        Args:
+            detector: changed() と sync() を持つ変更検知（SQLiteChangeDetector）
+        """
+        self._detector = detector
+
+    @property
+    def current(self) -> RuleSetVersion:
+        """
+        現在のバージョンのルール集合
+        データベースの変更を検知した場合は再読み込みを開始する（切り替えまでは現在のルール集合を返す）
+        """
+        detector = self._detector
+        if detector is not None and detector.changed():
+            self.invalidate("database changed")
+        return self._current
+
+    @property
+    def version(self) -> int:
+        """
+        現在のルール集合のバージョン
+        """
+        return self._current.version
+
+    @property
+    def pending(self) -> bool:
+        """
+        再コンパイルが完了していない変更があるか
+        """
+        return self._requested_version > self._current.version
+
+    @property
+    def loaded(self) -> Tuple[str, ...]:
+        """
+        読み込み済みのビザタイプ
+        """
+        return tuple(visa_type for visa_type in self._visa_types if visa_type in self._current.rule_sets)
+
+    @property
+    def ready(self) -> bool:
+        """
+        すべてのビザタイプを読み込み済みか
+        """
+        return len(self.loaded) == len(self._visa_types)
+
+    def lookup(self, visa_type: str) -> Tuple[Optional[CompiledRuleSet], int]:
+        """
+        ビザタイプのルール集合とそのバージョンを取得（未読み込みの場合はここで読み込む）
+
+        Args:
+            visa_type: ビザタイプ
+
+        Returns:
+            (ルール集合, バージョン)。登録されていないビザタイプの場合、ルール集合は None
+        """
+        current = self.current
+        if visa_type not in self._visa_types:
+            return None, current.version
+
+        rule_set = current.rule_sets.get(visa_type)
+        if rule_set is None:
+            current = self._load_visa_type(visa_type)
+            rule_set = current.rule_sets[visa_type]
+        return rule_set, current.version
+
+    def warm_up(self) -> None:
+        """
+        未読み込みのビザタイプをすべて読み込む（呼び出したスレッドで実行）
+        読み込み中に参照されたビザタイプは、参照した側が読み込むか、読み込みの完了を待つ
+        """
+        started = time.perf_counter()
+        for visa_type in self._visa_types:
+            self._load_visa_type(visa_type)
+        logger.info(
+            "rules warm-up finished", extra={
+                "event": "rules_warm_up", "rules_version": self.version,
+                "duration_ms": round((time.perf_counter() - started) * 1000, 2)
+            }
+        )
+
+    def _run_prepare(self) -> None:
+        # 最初の読み込みの前の準備（_compile_lock を取った状態で呼び出す。失敗した場合は次の読み込みで再試行）
+        if self._prepare is not None:
+            self._prepare()
+            self._prepare = None
+            # 準備でのデータベースの変更は、これから読み込むルールに含まれる
+            if self._detector is not None:
+                self._detector.sync()
+
+    def _load_visa_type(self, visa_type: str) -> RuleSetVersion:
+        """
+        1つのビザタイプを読み込み、現在のバージョンに追加する
+
+        Args:
+            visa_type: ビザタイプ
+
+        Returns:
+            追加した後のルール集合
+        """
+        with self._compile_lock:
+            current = self._current
+            if visa_type in current.rule_sets:
+                return current
+
+            self._run_prepare()
+            started = time.perf_counter()
+            rule_set = CompiledRuleSet(self._loader(visa_type))
+
+            # 最初の読み込みはバージョン1（load() と同じ）
+            version = current.version
+            if version == 0:
+                with self._lock:
+                    self._requested_version = max(self._requested_version, 1)
+                version = 1
+            self._current = RuleSetVersion(version, {**current.rule_sets, visa_type: rule_set})
+            elapsed = time.perf_counter() - started
+            ENGINE_PHASE_DURATION.labels(phase="rules_compile").observe(elapsed)
+
+        logger.info(
+            "rule set %s loaded: %d rules", visa_type, len(rule_set),
+            extra={
+                "event": "rules_loaded", "visa_type": visa_type, "rules_version": version,
+                "duration_ms": round(elapsed * 1000, 2)
+            }
+        )
+        self._notify_compiled({visa_type: rule_set})
+        return self._current
+
+    def load(self) -> RuleSetVersion:
+        """
+        全ビザタイプのルールを読み込み・コンパイルして切り替える（呼び出したスレッドで実行）
+
+        Returns:
+            切り替えた後のルール集合
+        """
+        with self._lock:
+            self._requested_version += 1
+            version = self._requested_version
+        return self._compile(version, self._visa_types)
+
+    def invalidate(self, reason: str = "") -> int:
+        """
+        ルールが変更されたことを通知し、バックグラウンドでの再コンパイルを開始
+        再コンパイル中に通知された変更は、実行中の再コンパイルの後にまとめて反映する
+
+        Args:
+            reason: 変更の内容（ログ用）
+
+        Returns:
+            要求したバージョン
+        """
+        # 再読み込みはこれ以降に読み込むため、ここまでのデータベースの変更は検知済みとする
+        if self._detector is not None:
+            self._detector.sync()
+
+        with self._lock:
+            self._requested_version += 1
+            version = self._requested_version
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run_worker, name="rule-registry-reload", daemon=True)
+                self._worker.start()
+
+        logger.info(
+            "rule set invalidated", extra={"event": "rules_invalidated", "rules_version": version, "reason": reason}
+        )
+        return version
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """
+        要求されたバージョンへの切り替えが終わるまで待つ
+
+        Args:
+            timeout: 待つ秒数の上限（None の場合は無制限）
+
+        Returns:
+            切り替えが終わった場合 True、時間切れの場合 False
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self.pending:
+            worker = self._worker
+            if worker is None:
+                # 再コンパイルに失敗した
+                break
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                break
+            worker.join(remaining)
+        return not self.pending
+
+    def _run_worker(self) -> None:
+        # 要求されたバージョンに追いつくまで再コンパイルを繰り返す
+        while True:
+            with self._lock:
+                version = self._requested_version
+                if version <= self._current.version:
+                    self._worker = None
+                    return
+            try:
+                self._compile(version)
+            except Exception:
+                # 失敗した場合は以前のルール集合を使い続ける（次の invalidate で再試行）
+                logger.exception(
+                    "rule set reload failed", extra={"event": "rules_reload_failed", "rules_version": version}
+                )
+                with self._lock:
+                    self._worker = None
+                return
+
+    def _compile(self, version: int, visa_types: Optional[Iterable[str]] = None) -> RuleSetVersion:
+        """
+        ビザタイプのルールをコンパイルし、指定したバージョンとして切り替える
+
+        Args:
+            version: 切り替えるバージョン
+            visa_types: コンパイルするビザタイプ（省略時は読み込み済みのビザタイプ）
+
+        Returns:
+            切り替えた後のルール集合（より新しいバージョンが既にある場合はそれ）
+        """
+        with self._compile_lock:
+            if version <= self._current.version:
+                return self._current
+
+            self._run_prepare()
+            started = time.perf_counter()
+            previous = self._current.rule_sets
+            if visa_types is None:
+                visa_types = tuple(previous)
+            rule_sets = {}
+            for visa_type in visa_types:
+                rule_set = CompiledRuleSet(self._loader(visa_type))
+                unchanged = previous.get(visa_type)
+                if unchanged is not None and unchanged.content_hash == rule_set.content_hash:
+                    rule_set = unchanged
+                rule_sets[visa_type] = rule_set
+
+            # 参照の書き換えだけで切り替える
+            self._current = RuleSetVersion(version, rule_sets)
+            elapsed = time.perf_counter() - started
+            ENGINE_PHASE_DURATION.labels(phase="rules_compile").observe(elapsed)
+
+        logger.info(
+            "rule set version %d compiled: %s", version,
+            ", ".join(f"{visa_type}={len(rule_set)} rules" for visa_type, rule_set in rule_sets.items()),
+            extra={"event": "rules_compiled", "rules_version": version, "duration_ms": round(elapsed * 1000, 2)}
+        )
+        self._notify_compiled({
+            visa_type: rule_set for visa_type, rule_set in rule_sets.items() if rule_set is not previous.get(visa_type)
+        })
+        return self._current
+
+    def _notify_compiled(self, rule_sets) -> None:
+        """
+        新しいルール集合を on_compiled に通知する（失敗してもルール集合の切り替えは取り消さない）
+
+        Args:
+            rule_sets: ビザタイプ -> 新しくコンパイルしたルール集合
+        """
+        if self._on_compiled is None:
+            return
+        for visa_type, rule_set in rule_sets.items():
+            try:
+                self._on_compiled(visa_type, rule_set)
+            except Exception:
+                logger.exception(
+                    "on_compiled failed", extra={"event": "rules_on_compiled_failed", "visa_type": visa_type}
+                )
+
+    def __getitem__(self, visa_type: str) -> CompiledRuleSet:
+        rule_set, _ = self.lookup(visa_type)
+        if rule_set is None:
+            raise KeyError(visa_type)
+        return rule_set
+
+    def __contains__(self, visa_type) -> bool:
+        # 未読み込みのビザタイプも含む（読み込みは行わない）
+        return visa_type in self._visa_types
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._visa_types)
+
+    def __len__(self) -> int:
+        return len(self._visa_types)
+
+    def __repr__(self):
+        return f"RuleRegistry(version={self.version}, visa_types={list(self)})"
+
+
+def invalidate_rules_cache(reason: str = "") -> None:
+    """
+    アプリケーションのルールキャッシュ（main.py の RULES_CACHE）にルールの変更を通知
+    ルール管理APIの書き込み処理のコミット後に呼び出す
+
+    Args:
+        reason: 変更の内容（ログ用）
+    """
+    # main.py は API ルーターをインポートするため、循環インポートを避けて関数内でインポートする
+    from backend.main import RULES_CACHE
+    RULES_CACHE.invalidate(reason)
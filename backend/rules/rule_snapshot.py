@@ -0,0 +1,509 @@
+"""
+データベースのルールのスナップショット（バイナリ形式）
+起動時に ORM でルールを1件ずつ読み込んで JSON を解析する代わりに、1回の読み込みでルールを復元する
+
+データベースのルールの内容から計算したハッシュ値（database_hash）を一緒に保存し、
+データベースのハッシュ値と一致する場合だけ使う。一致しない場合（ルールの変更後など）は
+ORM で読み込み直してスナップショットを書き直す（SnapshotRuleLoader）
+
+形式（リトルエンディアン、format_version 1）:
+    ヘッダー: マジック "VRSS"、形式のバージョン、database_hash（SHA-256、32バイト）、
+              文字列の数、ルールの数、ビザタイプの数
+    文字列: 終端のオフセットの配列（uint32）と UTF-8 のバイト列
+            （条件・仮説を先に、ルール名・タイプなどを後に、すべての文字列を1つの表にまとめる）
+    ルール: ルールごとに [名前, タイプ, 条件の論理, 優先順位]（名前・タイプ・論理は文字列の番号、int32）
+    条件・アクション: ルールごとの終端のオフセットの配列と文字列の番号の配列（uint32）
+    ビザタイプ: ビザタイプごとに [文字列の番号, ルールの数] と、ルールの番号の配列（優先順位順、uint32）
+"""
+from array import array
+from typing import Dict, List, Optional, Sequence
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import struct
+import sys
+import tempfile
+import threading
+
+from backend.database import DATABASE_DIR, DATABASE_PATH, SessionLocal
+from backend.models.dynamic_rule import create_rule_from_values
+from backend.models.rule import Rule
+from backend.models.rule_db import RuleDB
+from backend.rules.rule_loader import COMPILE_RULES, get_rules_by_visa_type_from_db, get_rules_from_db
+
+logger = logging.getLogger(__name__)
+
+# スナップショットのファイル（空文字列でスナップショットを使わない）
+SNAPSHOT_PATH = os.getenv("RULES_SNAPSHOT_PATH", os.path.join(DATABASE_DIR, "visa_rules.snapshot"))
+
+SNAPSHOT_MAGIC = b"VRSS"
+SNAPSHOT_FORMAT_VERSION = 1
+
+_HEADER = struct.Struct("<4sH32sIII")
+_RULE_FIELDS = 4  # 名前, タイプ, 条件の論理, 優先順位
+
+
+def database_hash(path: str = DATABASE_PATH) -> Optional[str]:
+    """
+    データベースのルールの内容から SHA-256 のハッシュ値を計算（ORM を使わず SQL で読み込む）
+    JSON の列は解析せず、保存されている文字列のまま使う
+
+    Args:
+        path: データベースファイルのパス
+
+    Returns:
+        16進数のハッシュ値。読み込めない場合は None
+    """
+    try:
+        connection = sqlite3.connect(path)
+        try:
+            return _database_hash(connection)
+        finally:
+            connection.close()
+    except sqlite3.Error:
+        logger.exception("failed to hash rules", extra={"event": "rules_snapshot_failed"})
+        return None
+
+
+def _database_hash(connection: sqlite3.Connection) -> str:
+    rows = connection.execute(
+        f"SELECT id, name, visa_type, rule_type, condition_logic, conditions, actions, priority "
+        f"FROM {RuleDB.__tablename__} ORDER BY id"
+    ).fetchall()
+    encoded = json.dumps(rows, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+def _to_little_endian(values: array) -> array:
+    if sys.byteorder != "little":
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values
+
+
+class RuleSnapshot:
+    """
+    スナップショットの内容（文字列の表・ルール・ビザタイプごとのルールの番号）
+    生成後は変更しない。ルールは rules_for で呼び出すたびに新しく作成する
+    （ルール集合ごとにファクトIDを設定するため、ビザタイプ間でルールのオブジェクトを共有しない）
+    """
+
+    __slots__ = (
+        "database_hash", "strings", "rule_fields",
+        "condition_offsets", "condition_ids", "action_offsets", "action_ids", "visa_types"
+    )
+
+    def __init__(
+        self,
+        database_hash: str,
+        strings: Sequence[str],
+        rule_fields: array,
+        condition_offsets: array,
+        condition_ids: array,
+        action_offsets: array,
+        action_ids: array,
+        visa_types: Dict[str, array]
+    ):
+        self.database_hash = database_hash
+        self.strings = tuple(strings)
+        self.rule_fields = rule_fields
+        self.condition_offsets = condition_offsets
+        self.condition_ids = condition_ids
+        self.action_offsets = action_offsets
+        self.action_ids = action_ids
+        self.visa_types = visa_types
+
+    @classmethod
+    def from_rules(cls, database_hash: str, rules_by_visa_type: Dict[str, List[Rule]], rule_ids) -> "RuleSnapshot":
+        """
+        ビザタイプごとのルールからスナップショットを作成
+
+        Args:
+            database_hash: ルールを読み込んだときのデータベースのハッシュ値
+            rules_by_visa_type: ビザタイプ -> ルールのリスト（優先順位順）
+            rule_ids: ルール -> 同じルールを1つにまとめるためのキー（データベースのID）を返す関数
+
+        Returns:
+            RuleSnapshot
+        """
+        # 同じルール（visa_type が "ALL" のルールなど）は1つにまとめる
+        unique: Dict[object, int] = {}
+        rules: List[Rule] = []
+        visa_types: Dict[str, array] = {}
+        for visa_type, visa_rules in rules_by_visa_type.items():
+            indices = array("I")
+            for rule in visa_rules:
+                key = rule_ids(rule)
+                index = unique.get(key)
+                if index is None:
+                    index = unique[key] = len(rules)
+                    rules.append(rule)
+                indices.append(index)
+            visa_types[visa_type] = indices
+
+        # 条件・仮説を先に番号付けする（ファクト辞書と同じく最初に現れた順）
+        numbers: Dict[str, int] = {}
+
+        def number(text: str) -> int:
+            value = numbers.get(text)
+            if value is None:
+                value = numbers[text] = len(numbers)
+            return value
+
+        condition_offsets, condition_ids = array("I", [0]), array("I")
+        action_offsets, action_ids = array("I", [0]), array("I")
+        for rule in rules:
+            condition_ids.extend(number(condition) for condition in rule.conditions)
+            condition_offsets.append(len(condition_ids))
+            action_ids.extend(number(action) for action in rule.actions)
+            action_offsets.append(len(action_ids))
+
+        rule_fields = array("i")
+        for rule in rules:
+            rule_fields.extend((number(rule.name), number(rule.type), number(rule.condition_logic), rule.priority))
+        for visa_type in visa_types:
+            number(visa_type)
+
+        return cls(
+            database_hash, list(numbers), rule_fields,
+            condition_offsets, condition_ids, action_offsets, action_ids, visa_types
+        )
+
+    def rules_for(self, visa_type: str, compiled: bool = False) -> Optional[List[Rule]]:
+        """
+        ビザタイプのルールを作成
+
+        Args:
+            visa_type: ビザタイプ
+            compiled: 条件の評価を特化した CompiledDynamicRule にするか
+
+        Returns:
+            ルールのリスト（優先順位順）。スナップショットにないビザタイプの場合は None
+        """
+        indices = self.visa_types.get(visa_type)
+        if indices is None:
+            return None
+
+        strings = self.strings
+        fields = self.rule_fields
+        condition_offsets, condition_ids = self.condition_offsets, self.condition_ids
+        action_offsets, action_ids = self.action_offsets, self.action_ids
+        rules = []
+        for index in indices:
+            name, rule_type, logic, priority = fields[index * _RULE_FIELDS:(index + 1) * _RULE_FIELDS]
+            conditions = [strings[i] for i in condition_ids[condition_offsets[index]:condition_offsets[index + 1]]]
+            actions = [strings[i] for i in action_ids[action_offsets[index]:action_offsets[index + 1]]]
+            rules.append(create_rule_from_values(
+                strings[name], conditions, actions, strings[rule_type], strings[logic], priority, compiled=compiled
+            ))
+        return rules
+
+    def to_bytes(self) -> bytes:
+        """
+        バイナリ形式に変換
+
+        Returns:
+            スナップショットのバイト列
+        """
+        encoded = [text.encode("utf-8") for text in self.strings]
+        string_offsets = array("I")
+        end = 0
+        for data in encoded:
+            end += len(data)
+            string_offsets.append(end)
+
+        visa_fields = array("I")
+        visa_indices = array("I")
+        for visa_type, indices in self.visa_types.items():
+            visa_fields.extend((self.strings.index(visa_type), len(indices)))
+            visa_indices.extend(indices)
+
+        parts = [
+            _HEADER.pack(
+                SNAPSHOT_MAGIC, SNAPSHOT_FORMAT_VERSION, bytes.fromhex(self.database_hash),
+                len(self.strings), len(self.rule_fields) // _RULE_FIELDS, len(self.visa_types)
+            ),
+            _to_little_endian(string_offsets).tobytes(), b"".join(encoded),
+        ]
+        for values in (
+            self.rule_fields, self.condition_offsets, self.condition_ids,
+            self.action_offsets, self.action_ids, visa_fields, visa_indices
+        ):
+            parts.append(_to_little_endian(values).tobytes())
+        return b"".join(parts)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "RuleSnapshot":
+        """
+        バイナリ形式から復元
+
+        Args:
+            data: スナップショットのバイト列
+
+        Returns:
+            RuleSnapshot
+
+        Raises:
+            ValueError: 形式が正しくない場合（バージョンが異なる場合を含む）
+        """
+        view = memoryview(data)
+        if len(view) < _HEADER.size:
+            raise ValueError("スナップショットが短すぎます")
+        magic, format_version, digest, string_count, rule_count, visa_type_count = _HEADER.unpack_from(view)
+        if magic != SNAPSHOT_MAGIC or format_version != SNAPSHOT_FORMAT_VERSION:
+            raise ValueError(f"スナップショットの形式が異なります: {magic!r} version {format_version}")
+        position = _HEADER.size
+
+        def read_array(typecode: str, count: int) -> array:
+            nonlocal position
+            values = array(typecode)
+            end = position + count * values.itemsize
+            if end > len(view):
+                raise ValueError("スナップショットが途中で切れています")
+            values.frombytes(view[position:end])
+            if sys.byteorder != "little":
+                values.byteswap()
+            position = end
+            return values
+
+        string_offsets = read_array("I", string_count)
+        blob_size = string_offsets[-1] if string_count else 0
+        if position + blob_size > len(view):
+            raise ValueError("スナップショットが途中で切れています")
+        blob = bytes(view[position:position + blob_size])
+        position += blob_size
+        strings = []
+        start = 0
+        for end in string_offsets:
+            strings.append(blob[start:end].decode("utf-8"))
+            start = end
+
+        rule_fields = read_array("i", rule_count * _RULE_FIELDS)
+        condition_offsets = read_array("I", rule_count + 1)
+        condition_ids = read_array("I", condition_offsets[-1])
+        action_offsets = read_array("I", rule_count + 1)
+        action_ids = read_array("I", action_offsets[-1])
+        visa_fields = read_array("I", visa_type_count * 2)
+        visa_types: Dict[str, array] = {}
+        for i in range(visa_type_count):
+            visa_types[strings[visa_fields[i * 2]]] = read_array("I", visa_fields[i * 2 + 1])
+        if position != len(view):
+            raise ValueError("スナップショットの末尾に余分なデータがあります")
+
+        return cls(
+            digest.hex(), strings, rule_fields,
+            condition_offsets, condition_ids, action_offsets, action_ids, visa_types
+        )
+
+    def __repr__(self):
+        return (
+            f"RuleSnapshot(rules={len(self.rule_fields) // _RULE_FIELDS}, strings={len(self.strings)}, "
+            f"visa_types={list(self.visa_types)}, database_hash={self.database_hash[:12]})"
+        )
+
+
+def read_snapshot(path: str = SNAPSHOT_PATH) -> Optional[RuleSnapshot]:
+    """
+    スナップショットを読み込む（ファイル全体を1回で読み込む）
+
+    Args:
+        path: スナップショットのファイル
+
+    Returns:
+        RuleSnapshot。ファイルがない場合・形式が正しくない場合は None
+    """
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+    except FileNotFoundError:
+        return None
+    except OSError:
+        logger.exception("failed to read rules snapshot", extra={"event": "rules_snapshot_failed"})
+        return None
+
+    try:
+        return RuleSnapshot.from_bytes(data)
+    except (ValueError, UnicodeDecodeError, IndexError):
+        logger.warning("ignoring invalid rules snapshot %s", path, exc_info=True, extra={"event": "rules_snapshot_invalid"})
+        return None
+
+
+def build_snapshot(database_path: str = DATABASE_PATH) -> Optional[RuleSnapshot]:
+    """
+    データベースのルールを ORM で読み込んでスナップショットを作成
+    ビザタイプごとのルールの並びは get_rules_from_db と同じクエリで決める
+
+    Args:
+        database_path: データベースファイルのパス（ハッシュ値の計算用）
+
+    Returns:
+        RuleSnapshot。データベースを読み込めない場合は None
+    """
+    # 読み込みより前にハッシュ値を計算する（読み込み中に変更された場合は次回に書き直される）
+    db_hash = database_hash(database_path)
+    if db_hash is None:
+        return None
+
+    db = SessionLocal()
+    try:
+        visa_types = [
+            visa_type for (visa_type,) in db.query(RuleDB.visa_type).distinct().order_by(RuleDB.visa_type)
+            if visa_type != "ALL"
+        ]
+    finally:
+        db.close()
+
+    rules_by_visa_type = {visa_type: get_rules_from_db(visa_type, compiled=False) for visa_type in visa_types}
+    return RuleSnapshot.from_rules(db_hash, rules_by_visa_type, lambda rule: rule.rule_db.id)
+
+
+def write_snapshot(snapshot: RuleSnapshot, path: str = SNAPSHOT_PATH) -> None:
+    """
+    スナップショットをファイルに書き出す
+    一時ファイルに書いてから置き換えるため、読み込み側が書きかけのファイルを読むことはない
+
+    Args:
+        snapshot: スナップショット
+        path: スナップショットのファイル
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, temporary = tempfile.mkstemp(prefix=".rules-snapshot-", dir=directory)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(snapshot.to_bytes())
+        os.replace(temporary, path)
+    except BaseException:
+        try:
+            os.unlink(temporary)
+        except OSError:
+            pass
+        raise
+
+
+def refresh_snapshot(path: str = SNAPSHOT_PATH, database_path: str = DATABASE_PATH) -> Optional[RuleSnapshot]:
+    """
+    データベースのルールからスナップショットを作成して書き出す（ルールの移行の後などに呼び出す）
+
+    Args:
+        path: スナップショットのファイル
+        database_path: データベースファイルのパス
+
+    Returns:
+        作成したスナップショット。データベースを読み込めない場合は None
+    """
+    try:
+        snapshot = build_snapshot(database_path)
+    except (TypeError, OverflowError):
+        # 優先順位が整数でないルールなど、形式に入らない場合は ORM で読み込み続ける
+        logger.exception("failed to build rules snapshot", extra={"event": "rules_snapshot_failed"})
+        return None
+    if snapshot is None:
+        return None
+    try:
+        write_snapshot(snapshot, path)
+    except OSError:
+        # 書き出せない場合も作成したスナップショットは使える（次回の起動は ORM で読み込む）
+        logger.exception("failed to write rules snapshot", extra={"event": "rules_snapshot_failed"})
+    else:
+        logger.info(
+            "rules snapshot written: %s", path,
+            extra={"event": "rules_snapshot_written", "database_hash": snapshot.database_hash}
+        )
+    return snapshot
+
+
+class SnapshotRuleLoader:
+    """
+    スナップショットを使うルールの読み込み（RuleRegistry の loader）
+    get_rules_by_visa_type_from_db と同じルールを返す
+
+    呼び出すたびにデータベースのハッシュ値を SQL で計算してスナップショットと比べ、
+    一致しない場合（ルールの変更後・初回の起動など）はスナップショットを作り直す。
+    ハッシュ値は PRAGMA data_version が変わらない間は計算し直さない
+    """
+
+    def __init__(self, path: str = SNAPSHOT_PATH, database_path: str = DATABASE_PATH, compiled: Optional[bool] = None):
+        """
+        SnapshotRuleLoader の初期化（スナップショットはまだ読み込まない）
+
+        Args:
+            path: スナップショットのファイル
+            database_path: データベースファイルのパス
+            compiled: 条件の評価を特化した CompiledDynamicRule にするか（省略時は環境変数 COMPILED_DB_RULES に従う）
+        """
+        self.path = path
+        self.database_path = database_path
+        self.compiled = compiled
+        self._lock = threading.Lock()
+        self._connection: Optional[sqlite3.Connection] = None
+        self._data_version: Optional[int] = None
+        self._database_hash: Optional[str] = None
+        self._snapshot: Optional[RuleSnapshot] = None
+
+    def _current_database_hash(self) -> Optional[str]:
+        # 呼び出し元でロックを取ること
+        try:
+            if self._connection is None:
+                self._connection = sqlite3.connect(self.database_path, check_same_thread=False)
+            data_version = self._connection.execute("PRAGMA data_version").fetchone()[0]
+            if data_version != self._data_version or self._database_hash is None:
+                self._database_hash = _database_hash(self._connection)
+                self._data_version = data_version
+        except sqlite3.Error:
+            logger.exception("failed to hash rules", extra={"event": "rules_snapshot_failed"})
+            return None
+        return self._database_hash
+
+    def snapshot(self) -> Optional[RuleSnapshot]:
+        """
+        データベースと一致するスナップショットを取得（必要な場合はファイルから読み込む・作り直す）
+
+        Returns:
+            RuleSnapshot。データベースを読み込めない場合は None
+        """
+        with self._lock:
+            db_hash = self._current_database_hash()
+            if db_hash is None:
+                return None
+            if self._snapshot is not None and self._snapshot.database_hash == db_hash:
+                return self._snapshot
+
+            snapshot = read_snapshot(self.path)
+            if snapshot is not None and snapshot.database_hash == db_hash:
+                logger.info(
+                    "rules snapshot loaded: %s", self.path,
+                    extra={"event": "rules_snapshot_loaded", "database_hash": db_hash}
+                )
+            else:
+                snapshot = refresh_snapshot(self.path, self.database_path)
+            self._snapshot = snapshot
+            return snapshot
+
+    def __call__(self, visa_type: str) -> List[Rule]:
+        """
+        ビザタイプのルールを読み込む
+
+        Args:
+            visa_type: ビザタイプ
+
+        Returns:
+            指定されたビザタイプに関連するルールのリスト（優先順位順）
+        """
+        compiled = COMPILE_RULES if self.compiled is None else self.compiled
+        snapshot = self.snapshot()
+        rules = snapshot.rules_for(visa_type, compiled) if snapshot is not None else None
+        if rules is None:
+            # スナップショットにないビザタイプ（"ALL" のルールだけの場合など）は ORM で読み込む
+            return get_rules_by_visa_type_from_db(visa_type, compiled)
+        return rules
+
+    def close(self) -> None:
+        """
+        ハッシュ値の計算用の接続を閉じる
+        """
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
@@ -0,0 +1,31 @@
+"""
+テストの共通設定
+backend.database はインポート時にデータベースのディレクトリを作成するため、
+テストでは一時ディレクトリを使う（backend/data のデータベースには触れない）
+"""
+import os
+import tempfile
+
+os.environ["DATABASE_DIR"] = tempfile.mkdtemp(prefix="visa-rules-test-")
+
+from typing import Dict  # noqa: E402
+
+import pytest  # noqa: E402
+
+from backend.models.rule_set import CompiledRuleSet  # noqa: E402
+from backend.rules.visa_rules import get_rules_by_visa_type  # noqa: E402
+
+from .helpers import VISA_TYPES  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def rule_sets() -> Dict[str, CompiledRuleSet]:
+    return {visa_type: CompiledRuleSet(get_rules_by_visa_type(visa_type)) for visa_type in VISA_TYPES}
+
+
+@pytest.fixture(scope="session")
+def migrated_database():
+    # visa_rules.py のルールを一時ディレクトリのデータベースに移行する
+    from backend.migrate_rules import migrate_rules
+
+    migrate_rules()
@@ -0,0 +1,61 @@
+"""
+テストの共通処理
+乱数で決めた診断を実行して、各ステップのレスポンスと診断状態を記録する
+"""
+from typing import Any, List
+import json
+import random
+
+from backend.models.consultation import Consultation
+from backend.models.interview_tree import InterviewSession
+
+VISA_TYPES = ("E", "L", "B")
+SEEDS = range(30)
+
+
+def normalize(payload):
+    # タプルとリストなどの違いを除いて比較するため、JSON で複製する
+    return json.loads(json.dumps(payload, ensure_ascii=False))
+
+
+def live(session):
+    # 決定木のセッションは、木にない操作の前に推論エンジンに切り替える（API と同じ）
+    if isinstance(session, InterviewSession):
+        return session.consultation()
+    return session
+
+
+def run_interview(session, seed: int, steps: int = 40) -> List[Any]:
+    """
+    乱数で回答・スキップ・前の質問に戻るを選んで診断を進め、各ステップのレスポンスと診断状態を記録
+
+    Args:
+        session: Consultation または InterviewSession
+        seed: 乱数のシード
+        steps: 操作の最大数
+
+    Returns:
+        各ステップの (操作, レスポンス, 診断状態) のリスト
+    """
+    rng = random.Random(seed)
+    response = session.start_up()
+    transcript = [("start", normalize(response), normalize(session.get_status()))]
+    for _ in range(steps):
+        need_input = response.get("status") == "need_input"
+        choice = rng.random()
+        if choice < 0.15 or not need_input:
+            if not transcript[1:]:
+                break
+            action, response = "back", live(session).go_back()
+        elif choice < 0.2:
+            action, response = "skip", live(session).skip_question(response["question"])
+        else:
+            action, response = "answer", session.submit_answer(response["question"], rng.random() < 0.5)
+        transcript.append((action, normalize(response), normalize(session.get_status())))
+        if response.get("status") == "error":
+            break
+    return transcript
+
+
+def new_consultation(rules, flowchart_mode: bool = True, **options) -> Consultation:
+    return Consultation(rules, flowchart_mode=flowchart_mode, **options)
@@ -0,0 +1,79 @@
+"""
+一括回答（POST /api/consultation/answers:batch）のテスト
+まとめて記録した回答は1ステップとして扱われ、go_back で一度に取り消される
+"""
+import pytest
+from fastapi.testclient import TestClient
+
+from backend.api.consultation_api import get_interview_tree, session_manager
+from backend.main import RULES_CACHE, app
+from backend.models.consultation import Consultation
+from backend.models.interview_tree import InterviewSession
+
+from .helpers import normalize
+
+
+@pytest.fixture(scope="module")
+def client() -> TestClient:
+    return TestClient(app)
+
+
+def start(client: TestClient, visa_type: str = "E"):
+    response = client.post("/api/consultation/start", json={"visa_type": visa_type})
+    assert response.status_code == 200
+    body = response.json()
+    return body["session_id"], body
+
+
+def first_questions(rule_set, count: int):
+    # 「はい」と答え続けた場合に尋ねられる質問
+    consultation = Consultation(rule_set, flowchart_mode=True)
+    response = consultation.start_up()
+    questions = []
+    while response.get("status") == "need_input" and len(questions) < count:
+        questions.append(response["question"])
+        response = consultation.submit_answer(response["question"], True)
+    return questions
+
+
+def test_batch_records_all_answers_and_go_back_undoes_the_batch(client, rule_sets):
+    session_id, started = start(client)
+    headers = {"X-Session-ID": session_id}
+    before = client.get("/api/consultation/status", headers=headers).json()
+
+    questions = first_questions(rule_sets["E"], 3)
+    response = client.post(
+        "/api/consultation/answers:batch",
+        json={"answers": [{"key": question, "value": True} for question in questions]},
+        headers=headers
+    )
+    assert response.status_code == 200
+    findings = client.get("/api/consultation/status", headers=headers).json()["findings"]
+    assert findings == {question: True for question in questions}
+
+    # 一度の go_back で一括回答の前に戻る
+    back = client.post("/api/consultation/go_back", headers=headers)
+    assert back.status_code == 200 and back.json()["question"] == started["question"]
+    after = client.get("/api/consultation/status", headers=headers).json()
+    for key in ("findings", "hypotheses", "applied_rules"):
+        assert normalize(after[key]) == normalize(before[key])
+    assert client.post("/api/consultation/go_back", headers=headers).json()["status"] == "error"
+
+
+def test_empty_batch_is_rejected_before_the_session_is_touched(client):
+    # 決定木の完成を待ってから開始する（作成中の場合は推論エンジンのセッションになる）
+    assert get_interview_tree("E", RULES_CACHE["E"]) is not None
+    session_id, _ = start(client)
+    assert isinstance(session_manager.get(session_id), InterviewSession)
+
+    response = client.post("/api/consultation/answers:batch", json={"answers": []}, headers={"X-Session-ID": session_id})
+    assert response.status_code == 422
+    # 決定木をたどっているセッションは推論エンジンに切り替えない
+    assert isinstance(session_manager.get(session_id), InterviewSession)
+
+
+def test_batch_requires_a_session(client):
+    answers = {"answers": [{"key": "質問", "value": True}]}
+    assert client.post("/api/consultation/answers:batch", json=answers).status_code == 400
+    response = client.post("/api/consultation/answers:batch", json=answers, headers={"X-Session-ID": "unknown"})
+    assert response.status_code == 404
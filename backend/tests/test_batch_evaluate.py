@@ -0,0 +1,102 @@
+"""
+一括評価スクリプト（batch_evaluate）のテスト
+"""
+import csv
+import importlib.util
+import json
+import random
+
+import pytest
+
+from backend.batch_evaluate import evaluate_file, evaluate_profile, parse_answer
+from backend.models.consultation import Consultation
+
+from .helpers import SEEDS
+
+HAS_NUMPY = importlib.util.find_spec("numpy") is not None
+
+
+def interview_answers(rule_set, seed: int):
+    # 乱数で回答した対話の診断の回答と最終レスポンス
+    rng = random.Random(seed)
+    consultation = Consultation(rule_set, flowchart_mode=False)
+    response = consultation.start_up()
+    answers = {}
+    while response.get("status") == "need_input":
+        answers[response["question"]] = rng.random() < 0.7
+        response = consultation.submit_answer(response["question"], answers[response["question"]])
+    return answers, response
+
+
+def read_results(path):
+    with open(path, encoding="utf-8") as stream:
+        return [json.loads(line) for line in stream]
+
+
+def test_parse_answer():
+    assert parse_answer(" Yes ") is True and parse_answer("いいえ") is False and parse_answer("1") is True
+    assert parse_answer("") is None
+    with pytest.raises(ValueError):
+        parse_answer("たぶん")
+
+
+def test_completed_interview_is_completed_in_batch(rule_sets):
+    # 対話の診断は質問がなくなった場合も completed を返すため、終了ルールが発火した診断だけ比較する
+    rule_set = rule_sets["E"]
+    completed = 0
+    for seed in SEEDS:
+        answers, response = interview_answers(rule_set, seed)
+        applied = response.get("applied_rules") or []
+        if response["status"] != "completed" or not any(rule["rule_type"] == "#n!" for rule in applied):
+            continue
+        completed += 1
+        result = evaluate_profile(rule_set, answers)
+        assert result["status"] == "completed", f"seed={seed}"
+        for fact, value in response["results"].items():
+            assert result["results"].get(fact) == value, f"seed={seed}"
+    assert completed
+
+
+def test_jsonl_and_csv_give_the_same_results(rule_sets, tmp_path):
+    profiles = []
+    for seed in range(10):
+        visa_type = ("E", "L")[seed % 2]
+        answers, _ = interview_answers(rule_sets[visa_type], seed)
+        profiles.append({"id": str(seed), "visa_type": visa_type, "answers": answers})
+
+    jsonl_path = tmp_path / "profiles.jsonl"
+    jsonl_path.write_text("".join(json.dumps(p, ensure_ascii=False) + "\n" for p in profiles), encoding="utf-8")
+
+    csv_path = tmp_path / "profiles.csv"
+    questions = sorted({question for p in profiles for question in p["answers"]})
+    with open(csv_path, "w", encoding="utf-8", newline="") as stream:
+        writer = csv.DictWriter(stream, ["id", "visa_type"] + questions)
+        writer.writeheader()
+        for p in profiles:
+            row = {question: ("yes" if value else "no") for question, value in p["answers"].items()}
+            writer.writerow({"id": p["id"], "visa_type": p["visa_type"], **row})
+
+    assert evaluate_file(str(jsonl_path), str(tmp_path / "jsonl.out"), None, "hardcoded", "rete") == len(profiles)
+    assert evaluate_file(str(csv_path), str(tmp_path / "csv.out"), None, "hardcoded", "rete") == len(profiles)
+    jsonl_results = read_results(tmp_path / "jsonl.out")
+    assert jsonl_results == read_results(tmp_path / "csv.out")
+    assert [r["id"] for r in jsonl_results] == [p["id"] for p in profiles]
+
+    # 照合方式によらず同じ結果（numpy は missing_facts を出力しない）
+    engines = ["naive"] + (["numpy"] if HAS_NUMPY else [])
+    for engine in engines:
+        evaluate_file(str(jsonl_path), str(tmp_path / f"{engine}.out"), None, "hardcoded", engine)
+        for expected, actual in zip(jsonl_results, read_results(tmp_path / f"{engine}.out")):
+            if engine == "numpy":
+                expected = {key: value for key, value in expected.items() if key != "missing_facts"}
+            assert actual == expected, engine
+
+
+def test_visa_type_is_required(tmp_path):
+    path = tmp_path / "profiles.jsonl"
+    path.write_text(json.dumps({"answers": {}}) + "\n", encoding="utf-8")
+    assert evaluate_file(str(path), str(tmp_path / "out"), "B", "hardcoded", "rete") == 1
+    assert read_results(tmp_path / "out")[0]["visa_type"] == "B"
+    with pytest.raises(ValueError):
+        evaluate_file(str(path), str(tmp_path / "out"), None, "hardcoded", "rete")
+
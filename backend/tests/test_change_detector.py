@@ -0,0 +1,87 @@
+"""
+SQLiteChangeDetector のテスト
+他の接続（他のワーカー）がコミットした変更を PRAGMA data_version で検知する
+"""
+import sqlite3
+
+import pytest
+
+from backend.rules import change_detector
+from backend.rules.change_detector import SQLiteChangeDetector
+from backend.rules.rule_registry import RuleRegistry
+from backend.rules.visa_rules import get_rules_by_visa_type
+
+
+@pytest.fixture
+def database(tmp_path):
+    # 他のワーカーの接続の代わり（ビザタイプごとに使うルールの数を保存する）
+    path = str(tmp_path / "rules.db")
+    connection = sqlite3.connect(path)
+    connection.execute("CREATE TABLE rule_counts (visa_type TEXT PRIMARY KEY, count INTEGER)")
+    connection.execute("INSERT INTO rule_counts VALUES ('B', 7)")
+    connection.commit()
+    yield path, connection
+    connection.close()
+
+
+def test_detects_write_from_another_connection(database):
+    path, writer = database
+    detector = SQLiteChangeDetector(path, min_interval=0)
+    try:
+        assert not detector.changed()
+
+        writer.execute("UPDATE rule_counts SET count = 6")
+        writer.commit()
+        assert detector.changed()
+        # 検知した変更は一度だけ報告する
+        assert not detector.changed()
+
+        # sync() までの変更は検知済みとする
+        writer.execute("UPDATE rule_counts SET count = 5")
+        writer.commit()
+        detector.sync()
+        assert not detector.changed()
+    finally:
+        detector.close()
+
+
+def test_checks_at_most_once_per_interval(database, monkeypatch):
+    path, writer = database
+    now = [1000.0]
+    monkeypatch.setattr(change_detector.time, "monotonic", lambda: now[0])
+    detector = SQLiteChangeDetector(path, min_interval=10)
+    try:
+        writer.execute("UPDATE rule_counts SET count = 6")
+        writer.commit()
+        # 最小間隔内は確認しない
+        now[0] += 9
+        assert not detector.changed()
+        now[0] += 1
+        assert detector.changed()
+    finally:
+        detector.close()
+
+
+def test_registry_reloads_after_write_from_another_connection(database):
+    path, writer = database
+
+    def load_rules(visa_type):
+        with sqlite3.connect(path) as connection:
+            count = connection.execute("SELECT count FROM rule_counts WHERE visa_type = ?", (visa_type,)).fetchone()[0]
+        return get_rules_by_visa_type(visa_type)[:count]
+
+    registry = RuleRegistry(load_rules, ("B",))
+    detector = SQLiteChangeDetector(path, min_interval=0)
+    registry.watch(detector)
+    try:
+        registry.load()
+        assert len(registry["B"]) == 7 and registry.version == 1
+
+        writer.execute("UPDATE rule_counts SET count = 6")
+        writer.commit()
+        # 参照時に変更を検知して再読み込みを開始する（切り替えまでは現在のルール集合を返す）
+        registry.lookup("B")
+        assert registry.wait(10)
+        assert len(registry["B"]) == 6 and registry.version == 2
+    finally:
+        detector.close()
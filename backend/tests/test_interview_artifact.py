@@ -0,0 +1,42 @@
+"""
+決定木の書き出し形式（interview_artifact）のテスト
+書き出した決定木をフロントエンドと同じ手順でたどると、推論エンジンと同じレスポンス・診断状態になる
+"""
+import random
+
+import pytest
+
+from backend.models.consultation import Consultation
+from backend.models.interview_artifact import expand_response, expand_status
+from backend.models.interview_tree import ANSWER_VALUES, InterviewTree
+
+from .helpers import SEEDS, VISA_TYPES, normalize
+
+
+@pytest.mark.parametrize("visa_type", VISA_TYPES)
+def test_artifact_walk_matches_consultation(rule_sets, visa_type):
+    rule_set = rule_sets[visa_type]
+    tree = InterviewTree.compile(rule_set)
+    artifact = normalize(tree.to_artifact())
+    assert artifact["rule_set_hash"] == rule_set.content_hash and artifact["complete"]
+
+    for seed in SEEDS:
+        rng = random.Random(seed)
+        consultation = Consultation(rule_set, flowchart_mode=True, **tree.consultation_options)
+        expected = consultation.start_up()
+        node = artifact["nodes"][artifact["root"]]
+        while True:
+            assert expand_response(artifact, node[0]) == normalize(expected), f"seed={seed}"
+            assert expand_status(artifact, node[1]) == normalize(consultation.get_status()), f"seed={seed}"
+            if expected.get("status") != "need_input":
+                break
+            value = rng.random() < 0.5
+            child = node[2 + ANSWER_VALUES.index(value)]
+            assert child != -1, f"seed={seed}"
+            node = artifact["nodes"][child]
+            expected = consultation.submit_answer(expected["question"], value)
+
+
+def test_artifact_is_cached_per_tree(rule_sets):
+    tree = InterviewTree.compile(rule_sets["B"])
+    assert tree.to_artifact() is tree.to_artifact()
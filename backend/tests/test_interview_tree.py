@@ -0,0 +1,37 @@
+"""
+決定木（InterviewTree）のテスト
+決定木のセッションは推論エンジンと同じレスポンス・診断状態を返す
+"""
+import pytest
+
+from backend.api import consultation_api
+from backend.models.consultation import Consultation
+from backend.models.interview_tree import InterviewTree
+from backend.models.rule_set import CompiledRuleSet
+from backend.rules.visa_rules import get_rules_by_visa_type
+
+from .helpers import SEEDS, VISA_TYPES, run_interview
+
+
+@pytest.mark.parametrize("visa_type", VISA_TYPES)
+def test_interview_tree_matches_consultation(rule_sets, visa_type):
+    rule_set = rule_sets[visa_type]
+    tree = InterviewTree.compile(rule_set)
+    for seed in SEEDS:
+        expected = run_interview(Consultation(rule_set, flowchart_mode=True, **tree.consultation_options), seed)
+        assert run_interview(tree.new_session(), seed) == expected, f"seed={seed}"
+
+
+def test_interview_tree_is_built_per_rule_set(rule_sets):
+    build = consultation_api.schedule_interview_tree("B", rule_sets["B"])
+    tree = consultation_api.get_interview_tree("B", rule_sets["B"])
+    assert build.done.is_set() and tree is build.tree and tree.rule_set is rule_sets["B"]
+    # 同じルール集合は作り直さない
+    assert consultation_api.schedule_interview_tree("B", rule_sets["B"]) is build
+
+    # ルール集合が置き換わった場合は作り直す（他のビザタイプの作成には影響しない）
+    replaced = CompiledRuleSet(get_rules_by_visa_type("B"))
+    consultation_api.schedule_interview_tree("L", rule_sets["L"])
+    new_tree = consultation_api.get_interview_tree("B", replaced)
+    assert new_tree is not tree and new_tree.rule_set is replaced
+    assert consultation_api.get_interview_tree("L", rule_sets["L"]).rule_set is rule_sets["L"]
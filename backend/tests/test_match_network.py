@@ -0,0 +1,17 @@
+"""
+照合ネットワーク（rete）のテスト
+rete は naive と同じ競合集合を返す前提で入れ替えられるため、同じ診断で結果を比較する
+"""
+import pytest
+
+from .helpers import SEEDS, VISA_TYPES, new_consultation, run_interview
+
+
+@pytest.mark.parametrize("visa_type", VISA_TYPES)
+@pytest.mark.parametrize("flowchart_mode", [True, False])
+def test_rete_matches_naive(rule_sets, visa_type, flowchart_mode):
+    rule_set = rule_sets[visa_type]
+    for seed in SEEDS:
+        naive = run_interview(new_consultation(rule_set, flowchart_mode, match_engine="naive"), seed)
+        rete = run_interview(new_consultation(rule_set, flowchart_mode, match_engine="rete"), seed)
+        assert rete == naive, f"seed={seed}"
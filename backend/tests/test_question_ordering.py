@@ -0,0 +1,71 @@
+"""
+質問順序の戦略（information_gain）のテスト
+回答後に残る必要な質問数の期待値が小さい質問から尋ねる
+"""
+import pytest
+
+from backend.models.consultation import Consultation
+from backend.models.dynamic_rule import create_rule_from_values
+from backend.models.question_ordering import count_remaining_questions, rank_by_information_gain
+from backend.models.rule_set import CompiledRuleSet
+
+
+@pytest.fixture
+def chained_rules() -> CompiledRuleSet:
+    # x または y で h、h かつ z で結論（z が「いいえ」なら申請不可で終わる）
+    return CompiledRuleSet([
+        create_rule_from_values("1", ["x", "y"], ["h"], "#i", "OR"),
+        create_rule_from_values("2", ["h", "z"], ["結論"], "#n!", "AND"),
+    ])
+
+
+@pytest.fixture
+def parallel_rules() -> CompiledRuleSet:
+    return CompiledRuleSet([
+        create_rule_from_values("1", ["a", "b", "c"], ["結論"], "#n!", "AND"),
+    ])
+
+
+def test_count_remaining_questions(chained_rules):
+    fired = chained_rules.new_bitmap()
+    answers = {}
+    assert count_remaining_questions(chained_rules, fired, answers.get) == 3
+
+    # OR 条件の一方が成立すればもう一方は不要
+    answers["x"] = True
+    assert count_remaining_questions(chained_rules, fired, answers.get) == 1
+
+    # 終了ルールの条件が False なら申請不可で終わる
+    answers["z"] = False
+    assert count_remaining_questions(chained_rules, fired, answers.get) == 0
+
+
+def test_rank_prefers_question_that_ends_the_interview(chained_rules):
+    fired = chained_rules.new_bitmap()
+    # x, y: 0.5 × 1 + 0.5 × 2 = 1.5、z: 0.5 × 2 + 0.5 × 0 = 1.0
+    ranked = rank_by_information_gain(chained_rules, fired, {}.get, ["x", "y", "z"])
+    assert ranked == ["z", "x", "y"]
+
+
+def test_rank_uses_answer_frequencies(parallel_rules):
+    fired = parallel_rules.new_bitmap()
+    # 期待値が同じ場合はルールの並び順
+    assert rank_by_information_gain(parallel_rules, fired, {}.get, ["a", "b", "c"]) == ["a", "b", "c"]
+    # 「いいえ」になりやすい質問ほど先に尋ねる
+    frequencies = {"a": 0.9, "b": 0.5, "c": 0.1}
+    assert rank_by_information_gain(parallel_rules, fired, {}.get, ["a", "b", "c"], frequencies) == ["c", "b", "a"]
+
+
+def test_consultation_asks_by_strategy(chained_rules):
+    rule_order = Consultation(chained_rules, flowchart_mode=False)
+    assert rule_order.start_up()["question"] == "x"
+
+    information_gain = Consultation(chained_rules, flowchart_mode=False, question_strategy="information_gain")
+    response = information_gain.start_up()
+    assert response["question"] == "z"
+    assert information_gain.submit_answer("z", False)["status"] == "impossible"
+
+
+def test_unknown_strategy_is_rejected(chained_rules):
+    with pytest.raises(ValueError):
+        Consultation(chained_rules, question_strategy="random")
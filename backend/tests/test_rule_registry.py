@@ -0,0 +1,51 @@
+"""
+ルールレジストリ（RuleRegistry）のテスト
+ルールの変更後は内容が変わったビザタイプだけ切り替え、開始済みのセッションは開始時のルール集合を使い続ける
+"""
+from backend.models.consultation import Consultation
+from backend.models.rule_set import rule_set_hash
+from backend.rules.rule_registry import RuleRegistry
+from backend.rules.visa_rules import get_rules_by_visa_type
+
+from .helpers import VISA_TYPES
+
+
+def test_registry_swaps_versions_and_pins_sessions():
+    rules = {visa_type: get_rules_by_visa_type(visa_type) for visa_type in VISA_TYPES}
+    compiled = []
+    registry = RuleRegistry(
+        lambda visa_type: list(rules[visa_type]), VISA_TYPES,
+        on_compiled=lambda visa_type, rule_set: compiled.append(visa_type)
+    )
+    registry.load()
+    assert registry.version == 1 and registry.ready
+    assert sorted(compiled) == sorted(VISA_TYPES)
+
+    before_e, version = registry.lookup("E")
+    before_l = registry["L"]
+    session = Consultation(before_e, flowchart_mode=True)
+    session.start_up()
+
+    # E のルールだけ変更する
+    rules["E"] = get_rules_by_visa_type("E")[:-1]
+    compiled.clear()
+    registry.invalidate("test")
+    assert registry.wait(10)
+
+    after_e, new_version = registry.lookup("E")
+    assert new_version == version + 1
+    assert after_e is not before_e and len(after_e) == len(before_e) - 1
+    # 内容が変わらないビザタイプは同じルール集合を使い続ける
+    assert registry["L"] is before_l
+    assert compiled == ["E"]
+    # 開始済みのセッションは開始時のルール集合を使い続ける
+    assert session.rule_set is before_e and len(before_e) == len(rules["E"]) + 1
+
+
+def test_registry_lazy_load_starts_at_version_one():
+    registry = RuleRegistry(get_rules_by_visa_type, VISA_TYPES)
+    assert registry.loaded == () and registry.version == 0
+    rule_set, version = registry.lookup("B")
+    assert version == 1 and registry.loaded == ("B",)
+    assert rule_set.content_hash == rule_set_hash(get_rules_by_visa_type("B"))
+    assert registry.lookup("X") == (None, 1)
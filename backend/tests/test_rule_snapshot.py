@@ -0,0 +1,78 @@
+"""
+ルールのスナップショット（rule_snapshot）のテスト
+スナップショットから読み込んだルールは ORM で読み込んだルールと同じ診断結果になる
+"""
+import pytest
+
+from backend.models.consultation import Consultation
+from backend.models.rule_set import rule_set_hash
+from backend.rules.visa_rules import get_rules_by_visa_type
+
+from .helpers import VISA_TYPES, run_interview
+
+
+@pytest.mark.parametrize("compiled", [True, False])
+def test_snapshot_matches_orm(migrated_database, tmp_path, compiled):
+    from backend.rules.rule_loader import get_rules_by_visa_type_from_db
+    from backend.rules.rule_snapshot import SnapshotRuleLoader, read_snapshot
+
+    path = str(tmp_path / "rules.snapshot")
+    loader = SnapshotRuleLoader(path, compiled=compiled)
+    try:
+        for visa_type in VISA_TYPES + ("H", "J"):
+            from_snapshot = loader(visa_type)
+            from_orm = get_rules_by_visa_type_from_db(visa_type, compiled)
+            assert [type(rule) for rule in from_snapshot] == [type(rule) for rule in from_orm]
+            assert rule_set_hash(from_snapshot) == rule_set_hash(from_orm)
+
+            for seed in range(5):
+                expected = run_interview(Consultation(from_orm, flowchart_mode=True), seed)
+                assert run_interview(Consultation(from_snapshot, flowchart_mode=True), seed) == expected
+
+        snapshot = read_snapshot(path)
+        assert snapshot is not None and snapshot.database_hash == loader.snapshot().database_hash
+    finally:
+        loader.close()
+
+
+def test_snapshot_is_rewritten_after_rule_change(migrated_database, tmp_path):
+    from backend.database import SessionLocal
+    from backend.models.rule_db import RuleDB
+    from backend.rules.rule_loader import get_rules_by_visa_type_from_db
+    from backend.rules.rule_snapshot import SnapshotRuleLoader, read_snapshot
+
+    path = str(tmp_path / "rules.snapshot")
+    loader = SnapshotRuleLoader(path)
+    db = SessionLocal()
+    try:
+        loader("E")
+        old_hash = read_snapshot(path).database_hash
+
+        rule = db.query(RuleDB).filter(RuleDB.visa_type == "E").order_by(RuleDB.priority).first()
+        original = rule.priority
+        rule.priority = 10000
+        db.commit()
+        try:
+            assert rule_set_hash(loader("E")) == rule_set_hash(get_rules_by_visa_type_from_db("E"))
+            assert read_snapshot(path).database_hash != old_hash
+        finally:
+            rule.priority = original
+            db.commit()
+    finally:
+        db.close()
+        loader.close()
+
+
+def test_snapshot_rejects_corrupt_file(tmp_path):
+    from backend.rules.rule_snapshot import RuleSnapshot, read_snapshot
+
+    snapshot = RuleSnapshot.from_rules(
+        "00" * 32, {"B": get_rules_by_visa_type("B")}, lambda rule: rule.name
+    )
+    data = snapshot.to_bytes()
+    assert RuleSnapshot.from_bytes(data).rules_for("B") is not None
+
+    path = tmp_path / "rules.snapshot"
+    for corrupt in (data[:-1], data + b"\0", b"XXXX" + data[4:]):
+        path.write_bytes(corrupt)
+        assert read_snapshot(str(path)) is None
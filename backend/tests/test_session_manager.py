@@ -0,0 +1,69 @@
+"""
+SessionManager のテスト
+セッションは最大数を超えると最も長くアクセスされていないものから、最終アクセスから TTL を過ぎると削除される
+"""
+from backend.models.session_manager import SessionManager
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_sessions_are_isolated():
+    manager = SessionManager()
+    first = manager.create("first")
+    second = manager.create("second")
+    assert first != second
+    assert manager.get(first) == "first" and manager.get(second) == "second"
+    assert manager.get("unknown") is None
+
+
+def test_least_recently_used_session_is_evicted():
+    clock = FakeClock()
+    manager = SessionManager(max_sessions=2, clock=clock)
+    first = manager.create("first")
+    clock.now += 1
+    second = manager.create("second")
+    clock.now += 1
+    # 取得したセッションは最近使われたものになる
+    assert manager.get(first) == "first"
+
+    third = manager.create("third")
+    assert len(manager) == 2
+    assert manager.get(second) is None
+    assert manager.get(first) == "first" and manager.get(third) == "third"
+
+
+def test_idle_session_expires_after_ttl():
+    clock = FakeClock()
+    manager = SessionManager(ttl_seconds=10, clock=clock)
+    idle = manager.create("idle")
+    active = manager.create("active")
+
+    clock.now = 9
+    assert manager.get(active) == "active"
+    clock.now = 10
+    # 最終アクセスから TTL を過ぎたセッションだけ削除される
+    assert manager.get(idle) is None
+    assert manager.get(active) == "active"
+    assert len(manager) == 1
+
+    clock.now = 30
+    assert len(manager) == 0
+
+
+def test_remove_and_clear():
+    manager = SessionManager()
+    session_id = manager.create("session")
+    assert manager.remove(session_id)
+    assert not manager.remove(session_id)
+    assert manager.get(session_id) is None
+
+    manager.create("a")
+    manager.create("b")
+    manager.clear()
+    assert len(manager) == 0
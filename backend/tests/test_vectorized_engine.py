@@ -0,0 +1,52 @@
+"""
+NumPy による一括評価（VectorizedRuleSet）のテスト
+同じプロファイルを推論エンジン（evaluate_profile）で評価した結果と一致する
+"""
+import random
+
+import pytest
+
+from backend.batch_evaluate import evaluate_profile
+
+from .helpers import VISA_TYPES
+
+pytest.importorskip("numpy")
+
+from backend.models.vectorized_engine import VectorizedRuleSet  # noqa: E402
+
+# 回答値（True / False 以外の値は、推論エンジンでは真偽で条件を判定し、申請不可の判定には使わない）
+ANSWER_VALUES = (True, False, None, 0, 1)
+
+
+def random_profiles(vectorized: VectorizedRuleSet, seed: int, count: int):
+    # 質問だけでなく、導出される仮説にも回答する
+    rng = random.Random(seed)
+    facts = list(vectorized.fact_columns)
+    return [
+        {fact: rng.choice(ANSWER_VALUES) for fact in facts if rng.random() < 0.6}
+        for _ in range(count)
+    ]
+
+
+@pytest.mark.parametrize("visa_type", VISA_TYPES)
+@pytest.mark.parametrize("match_engine", ["naive", "rete"])
+def test_vectorized_matches_evaluate_profile(rule_sets, visa_type, match_engine):
+    rule_set = rule_sets[visa_type]
+    vectorized = VectorizedRuleSet(rule_set)
+    profiles = random_profiles(vectorized, seed=0, count=300)
+    result = vectorized.evaluate(*vectorized.encode(profiles))
+
+    for row, answers in enumerate(profiles):
+        expected = evaluate_profile(rule_set, answers, match_engine)
+        expected.pop("missing_facts")
+        assert vectorized.decode(result, row) == expected, answers
+
+
+def test_non_bool_answer_is_not_explicit_false(rule_sets):
+    vectorized = VectorizedRuleSet(rule_sets["E"])
+    question = next(iter(vectorized.fact_columns))
+    known, values, explicit_false = vectorized.encode([{question: None}, {question: False}, {question: 1}])
+    column = vectorized.fact_columns[question]
+    assert known[:, column].tolist() == [True, True, True]
+    assert values[:, column].tolist() == [False, False, True]
+    assert explicit_false[:, column].tolist() == [False, True, False]
@@ -1,5 +1,6 @@
-import React, { useState } from 'react';
+import React, { useState, useRef } from 'react';
 import axios from 'axios';
+import { createInterviewWalker, fetchInterviewTree } from '../interviewTree';
 import './ConsultationForm.css';
 
 const ConsultationForm = () => {
@@ -17,23 +18,112 @@ const ConsultationForm = () => {
   const [availableQuestions, setAvailableQuestions] = useState([]);  // 回答可能な代替質問
   const [showQuestionSelector, setShowQuestionSelector] = useState(false);  // 質問選択UIの表示状態
   const [currentRuleInfo, setCurrentRuleInfo] = useState(null);  // 現在評価中のルール情報（フローチャートモード）
+  const sessionIdRef = useRef(null);  // 診断開始時にバックエンドが発行するセッションID
+  // 決定木をブラウザ内でたどり、「はい」「いいえ」の回答ではサーバーに問い合わせない
+  // 木にない操作（スキップ・戻るなど）の前に、サーバーに送っていない回答を /answer に送ってから API を使う
+  const treeRef = useRef(null);  // 取得済みの決定木（取得前・取得できない場合は null）
+  const walkerRef = useRef(null);  // 決定木をたどっている場合 { walker, synced: サーバーに送った回答数 }
+  const treeUsableRef = useRef(false);  // 決定木を使えるか（木にない操作をした後は使わない）
+  const startQuestionRef = useRef(null);  // /start の最初の質問（決定木と同じルールか確認する）
+  const serverAnswersRef = useRef([]);  // サーバーに送った回答 [質問, 回答]
+
+  // セッションIDをヘッダーに付与したリクエスト設定
+  const sessionConfig = () => ({
+    headers: { 'X-Session-ID': sessionIdRef.current }
+  });
 
   // 推論状態を取得する関数
   const fetchDebugInfo = async () => {
     try {
-      const response = await axios.get('/api/consultation/status');
+      const response = await axios.get('/api/consultation/status', sessionConfig());
       setDebugInfo(response.data);
     } catch (error) {
       console.error('推論状態の取得に失敗しました:', error);
     }
   };
 
+  // 決定木をたどる準備（決定木を取得済みで、サーバーに送った回答を木でたどれる場合のみ）
+  const currentWalker = () => {
+    if (walkerRef.current) return walkerRef.current.walker;
+    if (!treeRef.current || !treeUsableRef.current) return null;
+
+    const walker = createInterviewWalker(treeRef.current);
+    if (walker.start().question !== startQuestionRef.current) {
+      // 決定木の取得中にルールが変わった
+      treeUsableRef.current = false;
+      return null;
+    }
+    for (const [question, answer] of serverAnswersRef.current) {
+      if (walker.question() !== question || walker.answer(answer) === null) {
+        treeUsableRef.current = false;
+        return null;
+      }
+    }
+    walkerRef.current = { walker, synced: serverAnswersRef.current.length };
+    return walker;
+  };
+
+  // 決定木でたどった回答のうちサーバーに送っていないものを /answer に送り、以降はサーバーの API を使う
+  const detachWalker = async () => {
+    treeUsableRef.current = false;
+    const current = walkerRef.current;
+    if (!current) return;
+    walkerRef.current = null;
+    for (const [question, answer] of current.walker.answers().slice(current.synced)) {
+      await axios.post('/api/consultation/answer', { key: question, value: answer }, sessionConfig());
+      serverAnswersRef.current.push([question, answer]);
+    }
+  };
+
+  // /start・/answer のレスポンス（または決定木の節点）を画面に反映
+  const applyResponse = (data) => {
+    if (data.status === 'need_input') {
+      setCurrentQuestion(data.question);
+      setReasoningChain(data.reasoning_chain || []);
+      setAvailableQuestions(data.available_questions || []);
+      // フローチャートモード情報を保存
+      if (data.current_rule) {
+        setCurrentRuleInfo({
+          rule: data.current_rule,
+          condition: data.current_condition,
+          total: data.total_conditions
+        });
+      } else {
+        setCurrentRuleInfo(null);
+      }
+    } else if (data.status === 'completed') {
+      setResults(data.results);
+      setAppliedRules(data.applied_rules || []);
+      setCompleted(true);
+      setCurrentQuestion('');
+      setReasoningChain([]);
+    } else if (data.status === 'impossible') {
+      setImpossible(true);
+      setCompleted(true);
+      setCurrentQuestion('');
+      setReasoningChain([]);
+    }
+  };
+
   const handleStart = async (visaType) => {
     setLoading(true);
     try {
       const response = await axios.post('/api/consultation/start', {
         visa_type: visaType
       });
+      const sessionId = response.data.session_id;
+      sessionIdRef.current = sessionId;
+      treeRef.current = null;
+      walkerRef.current = null;
+      treeUsableRef.current = true;
+      startQuestionRef.current = response.data.question;
+      serverAnswersRef.current = [];
+      // 決定木は待たずに取得し、取得できた時点から回答に使う
+      fetchInterviewTree(visaType).then((artifact) => {
+        if (sessionIdRef.current === sessionId) {
+          treeRef.current = artifact;
+        }
+      });
       setSelectedVisaType(visaType);
       setStarted(true);
       setCompleted(false);
@@ -42,30 +132,7 @@ const ConsultationForm = () => {
       setQuestionHistory([]);
       setShowQuestionSelector(false);
 
-      if (response.data.status === 'need_input') {
-        setCurrentQuestion(response.data.question);
-        setReasoningChain(response.data.reasoning_chain || []);
-        setAvailableQuestions(response.data.available_questions || []);
-        // フローチャートモード情報を保存
-        if (response.data.current_rule) {
-          setCurrentRuleInfo({
-            rule: response.data.current_rule,
-            condition: response.data.current_condition,
-            total: response.data.total_conditions
-          });
-        } else {
-          setCurrentRuleInfo(null);
-        }
-      } else if (response.data.status === 'completed') {
-        setResults(response.data.results);
-        setAppliedRules(response.data.applied_rules || []);
-        setCompleted(true);
-        setReasoningChain([]);
-      } else if (response.data.status === 'impossible') {
-        setImpossible(true);
-        setCompleted(true);
-        setReasoningChain([]);
-      }
+      applyResponse(response.data);
 
       // 推論状態を取得（デバッグ用）
       await fetchDebugInfo();
@@ -84,39 +151,28 @@ const ConsultationForm = () => {
     setQuestionHistory(prev => [...prev, { question: currentQuestion, answer }]);
 
     try {
+      // 決定木にある回答はブラウザ内で次の節点に進む
+      const walker = currentWalker();
+      if (walker && walker.question() === currentQuestion) {
+        const local = walker.answer(answer);
+        if (local) {
+          applyResponse(local);
+          setDebugInfo(walker.status());
+          return;
+        }
+      }
+      // 木にない回答は、たどった回答をサーバーに送ってから処理する
+      await detachWalker();
+
       // 回答をバックエンドに送信
       const response = await axios.post('/api/consultation/answer', {
         key: currentQuestion,
         value: answer
-      });
+      }, sessionConfig());
+      serverAnswersRef.current.push([currentQuestion, answer]);
 
       // 次の質問または結果を処理
-      if (response.data.status === 'need_input') {
-        setCurrentQuestion(response.data.question);
-        setReasoningChain(response.data.reasoning_chain || []);
-        setAvailableQuestions(response.data.available_questions || []);
-        // フローチャートモード情報を保存
-        if (response.data.current_rule) {
-          setCurrentRuleInfo({
-            rule: response.data.current_rule,
-            condition: response.data.current_condition,
-            total: response.data.total_conditions
-          });
-        } else {
-          setCurrentRuleInfo(null);
-        }
-      } else if (response.data.status === 'completed') {
-        setResults(response.data.results);
-        setAppliedRules(response.data.applied_rules || []);
-        setCompleted(true);
-        setCurrentQuestion('');
-        setReasoningChain([]);
-      } else if (response.data.status === 'impossible') {
-        setImpossible(true);
-        setCompleted(true);
-        setCurrentQuestion('');
-        setReasoningChain([]);
-      }
+      applyResponse(response.data);
 
       // 推論状態を取得（デバッグ用）
       await fetchDebugInfo();
@@ -131,7 +187,11 @@ const ConsultationForm = () => {
   const handleReset = async () => {
     setLoading(true);
     try {
-      await axios.post('/api/consultation/reset');
+      await axios.post('/api/consultation/reset', null, sessionConfig());
+      sessionIdRef.current = null;
+      treeRef.current = null;
+      walkerRef.current = null;
+      treeUsableRef.current = false;
       setSelectedVisaType('');
       setStarted(false);
       setCompleted(false);
@@ -155,9 +215,10 @@ const ConsultationForm = () => {
   const handleSkipQuestion = async () => {
     setLoading(true);
     try {
+      await detachWalker();
       const response = await axios.post('/api/consultation/skip-question', {
         question: currentQuestion
-      });
+      }, sessionConfig());
 
       // 次の質問または状態を処理
       if (response.data.status === 'need_input') {
@@ -193,10 +254,11 @@ const ConsultationForm = () => {
 
     setLoading(true);
     try {
+      await detachWalker();
       // 現在の質問をスキップして、選択した質問に切り替える
       const skipResponse = await axios.post('/api/consultation/skip-question', {
         question: currentQuestion
-      });
+      }, sessionConfig());
 
       // スキップ後に選択した質問が表示されているか確認
       if (skipResponse.data.question === selectedQuestion) {
@@ -214,7 +276,7 @@ const ConsultationForm = () => {
         while (currentQ !== selectedQuestion && attempts < maxAttempts) {
           const nextSkip = await axios.post('/api/consultation/skip-question', {
             question: currentQ
-          });
+          }, sessionConfig());
 
           if (nextSkip.data.status === 'need_input') {
             currentQ = nextSkip.data.question;
@@ -257,7 +319,8 @@ const ConsultationForm = () => {
   const handleGoBack = async () => {
     setLoading(true);
     try {
-      const response = await axios.post('/api/consultation/go_back');
+      await detachWalker();
+      const response = await axios.post('/api/consultation/go_back', null, sessionConfig());
 
       // 履歴から最後の質問を削除
       setQuestionHistory(prev => prev.slice(0, -1));
@@ -0,0 +1,129 @@
+// 診断の決定木（/api/consultation/interview-tree/{visa_type} または export_interview_tree の出力）を
+// ブラウザ内でたどるためのユーティリティ
+// 形式は backend/models/interview_artifact.py を参照
+import axios from 'axios';
+
+const CONDITION_STATUS_NAMES = { s: 'satisfied', n: 'unsatisfied', u: 'unknown', c: 'current' };
+
+// [[要素の番号, 値], ...] を {要素: 値} に戻す
+const expandPairs = (artifact, pairs) => {
+  const values = {};
+  pairs.forEach(([number, value]) => {
+    values[artifact.facts[number]] = value;
+  });
+  return values;
+};
+
+// 適用ルール・評価中ルールの情報を戻す
+const expandRuleInfo = (artifact, [ruleIndex, satisfied]) => {
+  const [name, type, logic, conditions, actions] = artifact.rules[ruleIndex];
+  return {
+    rule_name: name,
+    rule_type: type,
+    conditions: conditions.map((c) => artifact.facts[c]),
+    actions: actions.map((a) => artifact.facts[a]),
+    condition_logic: logic,
+    satisfied_conditions: expandPairs(artifact, satisfied)
+  };
+};
+
+// 推論チェーンの1ルールを戻す
+const expandChainEntry = (artifact, [ruleIndex, isFired, codes]) => {
+  const [name, type, logic, conditions, actions, priority] = artifact.rules[ruleIndex];
+  return {
+    rule_name: name,
+    rule_type: type,
+    condition_logic: logic,
+    conditions: conditions.map((c, i) => ({
+      text: artifact.facts[c],
+      status: CONDITION_STATUS_NAMES[codes[i]],
+      is_current: codes[i] === 'c'
+    })),
+    actions: actions.map((a) => artifact.facts[a]),
+    is_fired: Boolean(isFired),
+    priority
+  };
+};
+
+// /answer と同じ形のレスポンスに戻す
+export const expandResponse = (artifact, number) => {
+  const encoded = artifact.responses[number];
+  const response = { ...encoded };
+  if (encoded.question != null) response.question = artifact.facts[encoded.question];
+  if (encoded.results != null) response.results = expandPairs(artifact, encoded.results);
+  if (encoded.reasoning_chain != null) {
+    response.reasoning_chain = encoded.reasoning_chain.map((entry) => expandChainEntry(artifact, entry));
+  }
+  if (encoded.available_questions != null) {
+    response.available_questions = encoded.available_questions.map((q) => artifact.facts[q]);
+  }
+  if (encoded.applied_rules != null) {
+    response.applied_rules = encoded.applied_rules.map((info) => expandRuleInfo(artifact, info));
+  }
+  if (encoded.debug_pending_rules != null) {
+    response.debug_pending_rules = encoded.debug_pending_rules.map((index) => artifact.rules[index][0]);
+  }
+  return response;
+};
+
+// /status と同じ形の診断状態に戻す
+export const expandStatus = (artifact, number) => {
+  const encoded = artifact.statuses[number];
+  return {
+    findings: expandPairs(artifact, encoded.findings),
+    hypotheses: expandPairs(artifact, encoded.hypotheses),
+    conflict_set: encoded.conflict_set.map((info) => expandRuleInfo(artifact, info)),
+    applied_rules: encoded.applied_rules.map((info) => expandRuleInfo(artifact, info))
+  };
+};
+
+// 決定木をたどる診断セッションを作成
+// answer() は木にない回答（未展開の部分など）の場合 null を返すので、
+// その場合は answers() の回答をサーバーの /answer に順番に送って続行する
+export const createInterviewWalker = (artifact) => {
+  let node = artifact.root;
+  const history = [];  // これまでの回答 [質問, 回答]
+
+  return {
+    ruleSetHash: artifact.rule_set_hash,
+    start: () => expandResponse(artifact, artifact.nodes[artifact.root][0]),
+    // 現在の節点の質問（結果の節点では null）
+    question: () => {
+      const number = artifact.responses[artifact.nodes[node][0]].question;
+      return number == null ? null : artifact.facts[number];
+    },
+    status: () => expandStatus(artifact, artifact.nodes[node][1]),
+    answer: (value) => {
+      const [responseNumber, , yes, no] = artifact.nodes[node];
+      const child = value ? yes : no;
+      if (child < 0) return null;
+      history.push([artifact.facts[artifact.responses[responseNumber].question], value]);
+      node = child;
+      return expandResponse(artifact, artifact.nodes[node][0]);
+    },
+    answers: () => history.slice()
+  };
+};
+
+// ビザタイプ -> { etag, artifact }（取得済みの決定木）
+const treeCache = {};
+
+// ビザタイプの決定木を取得（取得済みの場合は ETag で変更を確認し、変わっていなければ再利用する）
+// 取得できない場合は null を返す（その場合はサーバーの API だけで診断を進める）
+export const fetchInterviewTree = async (visaType) => {
+  const cached = treeCache[visaType];
+  try {
+    const response = await axios.get(`/api/consultation/interview-tree/${visaType}`, {
+      headers: cached ? { 'If-None-Match': cached.etag } : {},
+      validateStatus: (status) => status === 200 || status === 304
+    });
+    if (response.status === 304 && cached) {
+      return cached.artifact;
+    }
+    treeCache[visaType] = { etag: response.headers.etag, artifact: response.data };
+    return response.data;
+  } catch (error) {
+    console.error('決定木の取得に失敗しました:', error);
+    return null;
+  }
+};